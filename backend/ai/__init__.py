@@ -1,25 +1,30 @@
 # AI Context Engine module
-from .models import PlannerOutput, NarratorOutput
-from .context_engine import run_turn
-from .planner import plan_turn
-from .narrator import narrate_turn
-from .prompts import SYSTEM_PROMPT
-from .validators import validate_plan, check_red_lines
-from .logger import log_turn
-from .markdown_utils import ensure_markdown_valid
-from .memory import get_openai_client
+#
+# Exports are resolved on first access so that importing one submodule
+# (e.g. ai.metrics) doesn't load the whole turn pipeline and the OpenAI SDK.
+from importlib import import_module
 
-__all__ = [
-    "PlannerOutput",
-    "NarratorOutput",
-    "run_turn",
-    "plan_turn",
-    "narrate_turn",
-    "SYSTEM_PROMPT",
-    "validate_plan",
-    "check_red_lines",
-    "log_turn",
-    "ensure_markdown_valid",
-    "get_openai_client",
-]
+_EXPORTS = {
+    "PlannerOutput": ".models",
+    "NarratorOutput": ".models",
+    "run_turn": ".context_engine",
+    "plan_turn": ".planner",
+    "narrate_turn": ".narrator",
+    "SYSTEM_PROMPT": ".prompts",
+    "validate_plan": ".validators",
+    "check_red_lines": ".validators",
+    "log_turn": ".logger",
+    "ensure_markdown_valid": ".markdown_utils",
+    "get_openai_client": ".memory",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,20 +1,32 @@
 # AI Context Engine - Main orchestration
-from typing import Dict, Any
-from openai import OpenAI
+from typing import TYPE_CHECKING, Dict, Any, Iterator, Optional, Tuple
+import time
 from sqlalchemy.orm import Session
 
 from .models import PlannerOutput, NarratorOutput
 from .planner import plan_turn
-from .narrator import narrate_turn
-from .prompts import SYSTEM_PROMPT
-from .validators import validate_plan, check_red_lines
+from .narrator import (
+    narrate_turn, narrate_turn_streaming, narrate_fast_turn_streaming, parse_plan_block, _extract_next_actions
+)
+from .intent import classify_intent, TURN_MODE_FAST
+from .validators import validate_plan, check_red_lines, plan_destinations
 from .logger import log_turn
 from .markdown_utils import ensure_markdown_valid
-from .memory import retrieve_context
+from .memory import retrieve_facts, get_index, embed
+from .prompt_builder import pack_facts
+from .plan_cache import plan_cache, planner_cache_key
+from .intent_cache import intent_cache, semantic_state_key
+from .metrics import metrics
+from .prefetch import prefetcher
+from .routing import route_model, run_with_escalation
+from app.config import settings
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 def run_turn(
-    openai_client: OpenAI,
+    openai_client: "OpenAI",
     player_intent: str,
     snapshot: Dict[str, Any],
     db: Session,
@@ -27,6 +39,9 @@ def run_turn(
     1. Planner (Pass A) - Low temperature, structured JSON output
     2. Narrator (Pass B) - Higher temperature, Markdown narrative
     
+    With model routing enabled, simple intents run each pass on the small
+    model and a pass whose output fails validation is redone on the large one.
+    
     Args:
         openai_client: OpenAI client instance
         player_intent: Player's command/intent
@@ -37,25 +52,20 @@ def run_turn(
     Returns:
         NarratorOutput with markdown narrative
     """
-    # Retrieve relevant facts from memory
-    relevant_facts = retrieve_context(player_intent)
-    system_prompt = SYSTEM_PROMPT.format(relevant_facts=relevant_facts if relevant_facts else "(No relevant facts found)")
-    
     # Pass A: Planning
-    planner_output = plan_turn(openai_client, system_prompt, player_intent, snapshot)
-    validate_plan(planner_output)
+    relevant_facts, planner_output = prepare_turn(openai_client, player_intent, snapshot)
     
-    # Pass B: Narration
-    narrator_output = narrate_turn(openai_client, system_prompt, planner_output, snapshot)
-    
-    # Validate Markdown format
-    if not ensure_markdown_valid(narrator_output.markdown):
-        raise ValueError("Narrator output is not valid Markdown")
-    
-    # Check red-line rules
-    red_line_errors = check_red_lines(narrator_output.markdown, snapshot)
-    if red_line_errors:
-        raise ValueError(f"Red-line violations: {', '.join(red_line_errors)}")
+    # Pass B: Narration (possibly already prefetched)
+    narrator_output = None
+    if settings.PREFETCH_ENABLED:
+        narrator_output = _prefetched_narration(player_intent, snapshot, planner_output)
+    if narrator_output is None:
+        narrator_output = run_with_escalation(
+            "narrator",
+            player_intent,
+            lambda model: narrate_turn(openai_client, relevant_facts, planner_output, snapshot, model=model),
+            lambda output: _check_narration(output, snapshot),
+        )
     
     # Log to filesystem
     log_turn(turn_id, planner_output, narrator_output)
@@ -63,9 +73,271 @@ def run_turn(
     # Insert into transcript_events table
     _save_transcript_event(db, turn_id, player_intent, planner_output, narrator_output, snapshot)
     
+    if settings.PREFETCH_ENABLED:
+        prefetcher.schedule(
+            openai_client, _player_id(snapshot), narrator_output.next_actions,
+            _post_turn_snapshot(db, snapshot, planner_output)
+        )
+    
+    return narrator_output
+
+
+def prepare_turn(
+    openai_client: "OpenAI",
+    player_intent: str,
+    snapshot: Dict[str, Any],
+    relevant_facts: Optional[str] = None,
+    index=None,
+    allow_fast_turn: bool = False
+) -> Tuple[str, Optional[PlannerOutput]]:
+    """
+    Run retrieval and Pass A (planning) for a turn.
+    
+    With prefetch enabled, a command the previous turn suggested may already
+    be planned in the background; sending any command also cancels the
+    prefetches for the other suggestions. Otherwise see plan_with_caches().
+    
+    Returns:
+        Tuple of (packed relevant facts, validated planner output or None
+        for a fast turn)
+    """
+    if settings.PREFETCH_ENABLED:
+        prefetched = prefetcher.claim(_player_id(snapshot), player_intent, snapshot)
+        if prefetched is not None:
+            return prefetched
+    return plan_with_caches(openai_client, player_intent, snapshot, relevant_facts, index, allow_fast_turn)
+
+
+def plan_with_caches(
+    openai_client: "OpenAI",
+    player_intent: str,
+    snapshot: Dict[str, Any],
+    relevant_facts: Optional[str] = None,
+    index=None,
+    allow_fast_turn: bool = False
+) -> Tuple[str, Optional[PlannerOutput]]:
+    """
+    Retrieve facts and plan a turn, reusing cached plans where possible.
+    
+    Validated plans are cached by (intent, location, inventory, facts,
+    prompt version), so repeated commands in an unchanged state skip the
+    planner call. On an exact miss, the intent embedding computed for
+    retrieval is matched against recent intents in the same state so
+    paraphrases can reuse a plan too.
+    
+    When fast turns are enabled and allowed by the caller, a low-risk
+    intent with no cached plan skips Pass A: the plan is returned as None
+    and stream_narration_events() narrates and plans in a single call.
+    
+    Args:
+        openai_client: OpenAI client instance
+        player_intent: Player's command/intent
+        snapshot: Current game state snapshot
+        relevant_facts: Pre-retrieved facts; retrieved from memory if None
+        index: Already loaded FAISS index (the shared one if None)
+        allow_fast_turn: Caller can stream a fast turn (streaming transports only)
+    
+    Returns:
+        Tuple of (packed relevant facts, validated planner output or None
+        for a fast turn)
+    """
+    query_vector = None
+    if relevant_facts is None:
+        if index is None:
+            index = get_index()
+        dense = index is not None
+        if dense:
+            # Embed once: used for retrieval and the semantic intent cache
+            try:
+                query_vector = embed([player_intent])
+            except Exception as exc:
+                if not settings.RETRIEVAL_HYBRID_ENABLED:
+                    raise
+                # Embeddings API unavailable: lexical retrieval works offline
+                metrics.inc("retrieval_dense_failures_total")
+                print(f"Query embedding failed, using lexical retrieval only: {exc}", flush=True)
+                dense = False
+        facts = retrieve_facts(
+            player_intent,
+            top_k=settings.RETRIEVAL_TOP_K,
+            index=index,
+            query_vector=query_vector,
+            dense=dense,
+            player_id=_player_id(snapshot),
+        )
+        # Pack by relevance and importance; each stage trims them to what its prompt has left
+        relevant_facts = pack_facts(facts, settings.PROMPT_FACTS_TOKEN_BUDGET)
+    
+    cache_key = None
+    if settings.PLANNER_CACHE_ENABLED:
+        cache_key = planner_cache_key(player_intent, snapshot, relevant_facts)
+        cached_plan = plan_cache.get(cache_key)
+        if cached_plan is not None:
+            return relevant_facts, cached_plan
+    
+    state_key = None
+    if settings.SEMANTIC_CACHE_ENABLED and query_vector is not None:
+        state_key = semantic_state_key(snapshot)
+        similar = intent_cache.lookup(state_key, query_vector, player_intent)
+        if similar is not None:
+            return relevant_facts, similar[0]
+    
+    if allow_fast_turn and settings.FAST_TURN_ENABLED and classify_intent(player_intent) == TURN_MODE_FAST:
+        return relevant_facts, None
+    
+    start = time.monotonic()
+    planner_output = run_with_escalation(
+        "planner",
+        player_intent,
+        lambda model: plan_turn(openai_client, relevant_facts, player_intent, snapshot, model=model),
+        lambda plan: validate_plan(plan, snapshot),
+    )
+    planner_seconds = time.monotonic() - start
+    
+    if cache_key is not None:
+        plan_cache.put(cache_key, planner_output, planner_seconds)
+    if state_key is not None:
+        intent_cache.add(state_key, query_vector, planner_output, planner_seconds, player_intent)
+    
+    return relevant_facts, planner_output
+
+
+def stream_narration_events(
+    openai_client: "OpenAI",
+    relevant_facts: str,
+    planner_output: Optional[PlannerOutput],
+    player_intent: str,
+    snapshot: Dict[str, Any],
+    db: Session,
+    turn_id: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run Pass B (narration) with streaming and persist the finished turn.
+    
+    Yields transport-neutral events shared by the SSE and WebSocket endpoints:
+    ``chunk`` for each piece of narration, ``metadata`` with the extracted
+    next actions, and ``done`` once the transcript event has been saved.
+    
+    A fast turn streams narration and plan from one call; its plan is
+    validated once the stream ends and the turn isn't saved if it fails.
+    A prefetched narration that passes the narration checks is sent as a
+    single chunk, and with prefetch enabled the turn's next actions are
+    prefetched against the post-turn state once it is saved.
+    
+    Args:
+        openai_client: OpenAI client instance
+        relevant_facts: Packed facts returned by prepare_turn()
+        planner_output: Validated plan from Pass A, or None for a fast turn
+        player_intent: Player's command/intent
+        snapshot: Current game state snapshot
+        db: Database session
+        turn_id: Turn number for the transcript
+    
+    Yields:
+        Dict events with a "type" key
+    """
+    player_id = _player_id(snapshot)
+    full_text = ""
+    prefetched = None
+    if planner_output is not None and settings.PREFETCH_ENABLED:
+        prefetched = _prefetched_narration(player_intent, snapshot, planner_output)
+    
+    if prefetched is not None:
+        full_text = prefetched.markdown
+        yield {"type": "chunk", "content": full_text}
+    elif planner_output is None:
+        plan_text = ""
+        for kind, content in narrate_fast_turn_streaming(
+            openai_client, relevant_facts, player_intent, snapshot, model=route_model("narrator", player_intent)
+        ):
+            if kind == "plan":
+                plan_text = content
+                continue
+            full_text += content
+            yield {"type": "chunk", "content": content}
+        try:
+            planner_output = parse_plan_block(plan_text)
+            validate_plan(planner_output, snapshot)
+        except (ValueError, AssertionError):
+            metrics.inc("fast_turn_plan_failures_total")
+            raise
+    else:
+        # Streamed narration can't be retried once sent, so it is routed but not escalated
+        model = route_model("narrator", player_intent)
+        for chunk in narrate_turn_streaming(openai_client, relevant_facts, planner_output, snapshot, model=model):
+            full_text += chunk
+            yield {"type": "chunk", "content": chunk}
+    
+    # Extract next actions from complete markdown
+    next_actions = _extract_next_actions(full_text)
+    yield {"type": "metadata", "next_actions": next_actions}
+    
+    # Save to database after streaming completes
+    narrator_output = NarratorOutput(markdown=full_text, next_actions=next_actions)
+    _save_transcript_event(db, turn_id, player_intent, planner_output, narrator_output, snapshot)
+    
+    if settings.PREFETCH_ENABLED:
+        prefetcher.schedule(openai_client, player_id, next_actions, _post_turn_snapshot(db, snapshot, planner_output))
+    
+    yield {"type": "done"}
+
+
+def _check_narration(narrator_output: NarratorOutput, snapshot: Dict[str, Any]) -> None:
+    """
+    Validate Markdown format and red-line rules.
+    
+    Raises:
+        ValueError: If the narration is unusable
+    """
+    if not ensure_markdown_valid(narrator_output.markdown):
+        raise ValueError("Narrator output is not valid Markdown")
+    
+    red_line_errors = check_red_lines(narrator_output.markdown, snapshot)
+    if red_line_errors:
+        raise ValueError(f"Red-line violations: {', '.join(red_line_errors)}")
+
+
+def _prefetched_narration(
+    player_intent: str,
+    snapshot: Dict[str, Any],
+    planner_output: PlannerOutput
+) -> Optional[NarratorOutput]:
+    """Prefetched narration for this turn's plan, or None if there is none or it fails the checks"""
+    narrator_output = prefetcher.narration(_player_id(snapshot), player_intent, snapshot, planner_output)
+    if narrator_output is None:
+        return None
+    try:
+        _check_narration(narrator_output, snapshot)
+    except ValueError as exc:
+        metrics.inc("prefetch_narration_rejected_total")
+        print(f"Prefetched narration of {player_intent!r} rejected, narrating afresh: {exc}", flush=True)
+        return None
     return narrator_output
 
 
+def _post_turn_snapshot(db: Session, snapshot: Dict[str, Any], planner_output: PlannerOutput) -> Dict[str, Any]:
+    """
+    The state the next turn will start from, for prefetching: re-read now
+    that the turn is committed, at the location the plan moved the player
+    to (the frontend applies moves and reports the location with the next
+    command).
+    """
+    from db.saves import create_save_snapshot
+    
+    player_id = _player_id(snapshot)
+    post_turn = create_save_snapshot(db, player_id) or {"player": {"id": player_id}}
+    destinations = plan_destinations(planner_output)
+    location_id = destinations[-1] if destinations else snapshot.get("player", {}).get("current_location_id")
+    if location_id:
+        post_turn.setdefault("player", {})["current_location_id"] = location_id
+    return post_turn
+
+
+def _player_id(snapshot: Dict[str, Any]) -> str:
+    """Get player_id from snapshot"""
+    return snapshot.get("player", {}).get("id", "unknown")
+
+
 def _save_transcript_event(
     db: Session,
     turn_id: int,
@@ -78,8 +350,7 @@ def _save_transcript_event(
     from db.models import TranscriptEvent
     from db.json_utils import dumps
     
-    # Get player_id from snapshot
-    player_id = snapshot.get("player", {}).get("id", "unknown")
+    player_id = _player_id(snapshot)
     
     # Create payload with planner data and snapshot context
     payload = {
@@ -0,0 +1,155 @@
+# Memory doc store - bounded cache of memory_docs text and metadata
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+
+
+class MemoryRecord(NamedTuple):
+    """What retrieval needs to know about a memory doc"""
+    id: int
+    kind: Optional[str]
+    entity_id: Optional[str]
+    player_id: Optional[str]
+    text: str
+    importance: int
+    stale: bool
+    created_at: Optional[datetime]
+
+
+def _record(doc: MemoryDoc) -> MemoryRecord:
+    return MemoryRecord(
+        id=doc.id,
+        kind=doc.kind,
+        entity_id=doc.entity_id,
+        player_id=doc.player_id,
+        text=doc.text or "",
+        importance=doc.importance or 0,
+        stale=bool(doc.stale),
+        created_at=doc.created_at,
+    )
+
+
+def matches_filter(
+    record: MemoryRecord,
+    kinds: Optional[Iterable[str]] = None,
+    entity_ids: Optional[Iterable[str]] = None,
+    player_id: Optional[str] = None
+) -> bool:
+    """
+    True if a doc may be retrieved under a filter.
+
+    Stale docs never match, and player-scoped docs only match for their own
+    player; shared docs (player_id None) match for everyone.
+    """
+    if record.stale:
+        return False
+    if record.player_id is not None and record.player_id != player_id:
+        return False
+    if kinds is not None and record.kind not in kinds:
+        return False
+    if entity_ids is not None and record.entity_id not in entity_ids:
+        return False
+    return True
+
+
+class DocStore:
+    """
+    Bounded read-through cache of memory doc records, keyed by id.
+
+    Retrieval looks up the text and metadata of each turn's hits here
+    instead of querying memory_docs for all of them; ids it doesn't hold are
+    fetched in one query. Only the most recently used ``max_entries`` docs
+    are kept, so a worker never holds the whole table. promote_fact() and
+    mark_stale() update it in place, and a new index snapshot clears it.
+    Docs marked stale by other processes are caught by
+    get_many(check_stale=True), which re-reads the flag of just the cached
+    docs being returned.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._records: "OrderedDict[int, MemoryRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, record: MemoryRecord) -> None:
+        self._records[record.id] = record
+        self._records.move_to_end(record.id)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    def get_many(
+        self,
+        doc_ids: Iterable[int],
+        db: Optional[Session] = None,
+        check_stale: bool = False
+    ) -> Dict[int, MemoryRecord]:
+        """
+        Records for the given ids (unknown ids are left out).
+
+        Args:
+            doc_ids: MemoryDoc ids
+            db: Session for loading; a short-lived one is opened if needed
+            check_stale: Re-read the stale flag of the cached records not
+                already stale (one primary-key lookup), for docs another
+                worker process marked stale since they were cached
+        """
+        found: Dict[int, MemoryRecord] = {}
+        missing = []
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self._records:
+                    self._records.move_to_end(doc_id)
+                    found[doc_id] = self._records[doc_id]
+                else:
+                    missing.append(doc_id)
+            cached = [doc_id for doc_id, record in found.items() if not record.stale]
+            if not missing and not (check_stale and cached):
+                return found
+            session = db if db is not None else SessionLocal()
+            try:
+                if missing:
+                    for doc in session.query(MemoryDoc).filter(MemoryDoc.id.in_(missing)).all():
+                        found[doc.id] = _record(doc)
+                        self._remember(found[doc.id])
+                if check_stale and cached:
+                    stale = session.query(MemoryDoc.id).filter(MemoryDoc.id.in_(cached), MemoryDoc.stale == True)
+                    for (doc_id,) in stale.all():
+                        found[doc_id] = found[doc_id]._replace(stale=True)
+                        self._remember(found[doc_id])
+            except OperationalError as exc:
+                session.rollback()
+                print(f"Memory doc store unavailable, database not initialized: {exc}", flush=True)
+            finally:
+                if db is None:
+                    session.close()
+        return found
+
+    def put(self, doc: MemoryDoc) -> None:
+        """Add or refresh a doc after it was written"""
+        with self._lock:
+            self._remember(_record(doc))
+
+    def mark_stale(self, doc_id: int) -> None:
+        with self._lock:
+            record = self._records.get(doc_id)
+            if record is not None:
+                self._records[doc_id] = record._replace(stale=True)
+
+    def invalidate(self) -> None:
+        """Drop everything; records are fetched again on their next lookup"""
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+doc_store = DocStore(max_entries=settings.MEMORY_DOC_CACHE_MAX_ENTRIES)
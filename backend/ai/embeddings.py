@@ -0,0 +1,158 @@
+# Embedding backends - turn texts into L2-normalized vectors for the FAISS index
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import OpenAI
+
+# Vector size of the local backend when EMBED_DIMENSIONS is 0
+LOCAL_EMBED_DIMENSIONS = 512
+# Character n-gram lengths hashed by the local backend
+LOCAL_NGRAM_SIZES = (3, 4, 5)
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Odd 64-bit constant (2^64 / golden ratio) for multiplicative hashing
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class EmbeddingBackend(ABC):
+    """
+    Where embeddings come from (selected by EMBED_BACKEND).
+
+    ``model`` names the vector space: it is saved with the index, and an
+    index built by one backend can't be searched with another's vectors.
+    """
+
+    name = ""
+    model = ""
+
+    @abstractmethod
+    def embed(
+        self,
+        texts: List[str],
+        dimensions: Optional[int] = None,
+        timeout: Optional[float] = None,
+        openai_client: Optional["OpenAI"] = None
+    ) -> "np.ndarray":
+        """
+        Embed texts, one vector each.
+
+        Args:
+            texts: Texts to embed
+            dimensions: Vector size (the backend's full size if None or 0)
+            timeout: Request timeout in seconds, for remote backends
+            openai_client: Client to use, for the OpenAI backend
+
+        Returns:
+            L2-normalized float32 vectors, one row per text
+        """
+
+
+class OpenAIEmbeddings(EmbeddingBackend):
+    """The OpenAI embeddings API; ``dimensions`` shortens vectors server-side"""
+
+    name = "openai"
+    model = "text-embedding-3-large"
+
+    def embed(
+        self,
+        texts: List[str],
+        dimensions: Optional[int] = None,
+        timeout: Optional[float] = None,
+        openai_client: Optional["OpenAI"] = None
+    ) -> "np.ndarray":
+        import faiss
+        import numpy as np
+
+        from .memory import get_openai_client
+
+        client = openai_client or get_openai_client()
+        options: Dict[str, Any] = {"timeout": timeout} if timeout is not None else {}
+        if dimensions:
+            options["dimensions"] = dimensions
+        response = client.embeddings.create(model=self.model, input=texts, **options)
+        vectors = np.array([d.embedding for d in response.data]).astype("float32")
+        faiss.normalize_L2(vectors)
+        return vectors
+
+
+class HashingEmbeddings(EmbeddingBackend):
+    """
+    CPU-only embeddings from hashed character n-grams, using NumPy alone.
+
+    Text is lowercased and reduced to words separated by single spaces;
+    every 3- to 5-character window (spaces included, so short words and
+    word boundaries count) is hashed to a signed bucket, and bucket counts
+    are damped with log1p. Texts sharing words and word stems land close
+    together, which is enough for retrieval over the game's memory docs
+    without network access, and the output depends only on the text and
+    the vector size: the same corpus always gives the same index.
+    """
+
+    name = "local"
+    model = "local-ngram-hash-v1"
+
+    def embed(
+        self,
+        texts: List[str],
+        dimensions: Optional[int] = None,
+        timeout: Optional[float] = None,
+        openai_client: Optional["OpenAI"] = None
+    ) -> "np.ndarray":
+        import numpy as np
+
+        dim = dimensions or LOCAL_EMBED_DIMENSIONS
+        if not texts:
+            return np.zeros((0, dim), dtype="float32")
+        encoded = [f" {_NON_WORD.sub(' ', text.lower()).strip()} ".encode() for text in texts]
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        rows = np.repeat(np.arange(len(texts)), [len(e) for e in encoded])
+
+        cells, signs = [], []
+        for n in LOCAL_NGRAM_SIZES:
+            count = len(data) - n + 1
+            if count <= 0:
+                continue
+            # Pack the n bytes (and n itself) into one integer per window
+            code = np.full(count, n, dtype=np.uint64)
+            for k in range(n):
+                code = (code << np.uint64(8)) | data[k:k + count]
+            inside = rows[:count] == rows[n - 1:]  # windows don't span two texts
+            hashed = code[inside] * np.uint64(_HASH_MULTIPLIER)
+            cells.append(rows[:count][inside] * dim + ((hashed >> np.uint64(32)) % np.uint64(dim)).astype(np.int64))
+            signs.append(np.where((hashed >> np.uint64(31)) & np.uint64(1), 1.0, -1.0))
+
+        counts = np.zeros(len(texts) * dim)
+        if cells:
+            counts = np.bincount(np.concatenate(cells), weights=np.concatenate(signs), minlength=len(texts) * dim)
+        vectors = (np.sign(counts) * np.log1p(np.abs(counts))).reshape(len(texts), dim).astype("float32")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    OpenAIEmbeddings.name: OpenAIEmbeddings,
+    HashingEmbeddings.name: HashingEmbeddings,
+}
+
+_backend_lock = threading.Lock()
+_backend: Optional[EmbeddingBackend] = None
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """The configured EMBED_BACKEND, created on first use (and when the setting changes)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None or _backend.name != settings.EMBED_BACKEND:
+            backend = BACKENDS.get(settings.EMBED_BACKEND)
+            if backend is None:
+                raise ValueError(
+                    f"Unknown EMBED_BACKEND {settings.EMBED_BACKEND!r} (expected one of {', '.join(BACKENDS)})"
+                )
+            _backend = backend()
+        return _backend
@@ -0,0 +1,94 @@
+# Intent classifier - decide how much pipeline a command needs
+import re
+from typing import List
+
+from app.config import settings
+from .metrics import metrics
+from .plan_cache import normalize_intent
+
+TURN_MODE_FAST = "fast"
+TURN_MODE_TWO_PASS = "two_pass"
+
+COMPLEXITY_SIMPLE = "simple"
+COMPLEXITY_COMPLEX = "complex"
+
+# Commands that only describe the world or move the player around
+LOW_RISK_VERBS = {
+    "look", "l", "examine", "x", "inspect", "observe", "read", "listen", "smell",
+    "search", "study", "check", "wait", "go", "walk", "move", "enter", "leave",
+    "exit", "head", "return", "follow", "inventory", "i",
+}
+DIRECTIONS = {"north", "south", "east", "west", "up", "down", "in", "out", "n", "s", "e", "w"}
+
+# Anything touching items, characters or the plot gets the full planner pass
+HIGH_RISK_WORDS = {
+    "take", "get", "pick", "grab", "steal", "drop", "give", "use", "open", "unlock",
+    "break", "burn", "combine", "buy", "sell", "ask", "tell", "say", "talk", "show",
+    "question", "interrogate", "accuse", "arrest", "attack", "kill", "shoot", "save", "load",
+}
+COMPOUND_WORDS = {"and", "then"}
+
+# Reasoning about the case: worth the large model
+DEDUCTION_WORDS = {
+    "deduce", "deduction", "conclude", "infer", "reason", "explain", "why", "who",
+    "motive", "suspect", "theory", "alibi", "solve", "accuse", "compare", "reconstruct",
+}
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def classify_intent(player_intent: str) -> str:
+    """
+    Choose the turn mode for a command.
+
+    Short look/examine/movement commands are low risk: a bad plan can't
+    change items, characters or the plot, so they may run as a single
+    fast call. Everything else, including compound commands, keeps the
+    separate planner pass.
+
+    Args:
+        player_intent: Player's command/intent
+
+    Returns:
+        TURN_MODE_FAST or TURN_MODE_TWO_PASS
+    """
+    words = _words(player_intent)
+    fast = (
+        bool(words)
+        and len(words) <= settings.FAST_TURN_MAX_WORDS
+        and (words[0] in LOW_RISK_VERBS or words[0] in DIRECTIONS)
+        and not HIGH_RISK_WORDS.intersection(words)
+        and not COMPOUND_WORDS.intersection(words)
+    )
+    mode = TURN_MODE_FAST if fast else TURN_MODE_TWO_PASS
+    metrics.inc("turn_mode_total", mode=mode)
+    return mode
+
+
+def intent_complexity(player_intent: str) -> str:
+    """
+    Rate how much reasoning a command needs, for model routing.
+
+    Deduction about the case, compound commands and long commands are
+    complex; everything else is simple.
+
+    Args:
+        player_intent: Player's command/intent
+
+    Returns:
+        COMPLEXITY_SIMPLE or COMPLEXITY_COMPLEX
+    """
+    words = _words(player_intent)
+    complex_intent = (
+        len(words) > settings.ROUTING_SIMPLE_MAX_WORDS
+        or bool(DEDUCTION_WORDS.intersection(words))
+        or bool(COMPOUND_WORDS.intersection(words))
+    )
+    return COMPLEXITY_COMPLEX if complex_intent else COMPLEXITY_SIMPLE
+
+
+def _words(player_intent: str) -> List[str]:
+    words = _WORD_RE.findall(normalize_intent(player_intent))
+    if words[:1] == ["i"] and len(words) > 1:
+        words = words[1:]  # "I look around"
+    return words
@@ -0,0 +1,176 @@
+# Semantic intent cache - reuse plans for paraphrased commands
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Tuple
+
+import orjson
+
+from app.config import settings
+from .lexical import STOPWORDS
+from .metrics import metrics
+from .models import PlannerOutput
+from .plan_cache import state_fingerprint
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def semantic_state_key(snapshot: Dict[str, Any]) -> str:
+    """Bucket key: plans are only shared between intents in the same state"""
+    return hashlib.sha256(orjson.dumps(state_fingerprint(snapshot))).hexdigest()
+
+
+def intent_targets(player_intent: str) -> FrozenSet[str]:
+    """
+    Words naming what a command acts on: its non-stopword words after the verb.
+
+    Commands are imperative, so the first word is taken as the verb; the
+    rest ("take the knife" -> {"knife"}) must match for a paraphrase to
+    share a plan, since embeddings alone put "take the key" close to it.
+    """
+    words = [w for w in re.findall(r"\w+", player_intent.lower()) if w not in STOPWORDS]
+    return frozenset(words[1:])
+
+
+class _StateBucket:
+    """Recent intents for one game state, as a matrix of unit vectors"""
+
+    def __init__(self, dim: int):
+        import numpy as np
+
+        self.vectors = np.empty((0, dim), dtype="float32")
+        self.entries: List[Tuple[float, PlannerOutput, float, str, FrozenSet[str]]] = []
+
+
+class SemanticIntentCache:
+    """
+    Small in-memory vector index of recent player intents per game state.
+
+    Vectors are the L2-normalized query embeddings that retrieve_context()
+    already computes, so a lookup is one matrix-vector product and costs no
+    extra API call. The cached PlannerOutput of the most similar intent is
+    reused when its cosine similarity reaches ``threshold`` and it names the
+    same targets (see intent_targets()).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        ttl_seconds: float = 600.0,
+        max_per_state: int = 64,
+        max_states: int = 512
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_state = max_per_state
+        self.max_states = max_states
+        self._buckets: "OrderedDict[str, _StateBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(
+        self,
+        state_key: str,
+        query_vector: "np.ndarray",
+        player_intent: str
+    ) -> Optional[Tuple[PlannerOutput, float, str]]:
+        """
+        Find a cached plan for a paraphrase of this intent.
+
+        Args:
+            state_key: Key from semantic_state_key()
+            query_vector: Normalized embedding, shape (dim,) or (1, dim)
+            player_intent: The intent itself, whose targets must match
+
+        Returns:
+            (plan copy, similarity, cached intent) or None
+        """
+        import numpy as np
+
+        query = np.asarray(query_vector, dtype="float32").reshape(-1)
+        with self._lock:
+            bucket = self._buckets.get(state_key)
+            if bucket is None or not bucket.entries or bucket.vectors.shape[1] != query.shape[0]:
+                metrics.inc("intent_cache_misses_total")
+                return None
+            self._expire(bucket)
+            if not bucket.entries:
+                metrics.inc("intent_cache_misses_total")
+                return None
+
+            similarities = bucket.vectors @ query
+            targets = intent_targets(player_intent)
+            best = None
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.threshold:
+                    break
+                if bucket.entries[position][4] == targets:
+                    best = int(position)
+                    break
+                metrics.inc("intent_cache_target_mismatches_total")
+            if best is None:
+                metrics.inc("intent_cache_misses_total")
+                return None
+
+            similarity = float(similarities[best])
+            self._buckets.move_to_end(state_key)
+            _, plan, planner_seconds, intent, _ = bucket.entries[best]
+
+        metrics.inc("intent_cache_hits_total")
+        metrics.inc("intent_cache_saved_seconds_total", planner_seconds)
+        metrics.observe("intent_cache_hit_similarity", similarity)
+        return plan.model_copy(deep=True), similarity, intent
+
+    def add(
+        self,
+        state_key: str,
+        query_vector: "np.ndarray",
+        plan: PlannerOutput,
+        planner_seconds: float,
+        player_intent: str
+    ) -> None:
+        """Remember a validated plan under its intent embedding"""
+        import numpy as np
+
+        vector = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+        with self._lock:
+            bucket = self._buckets.get(state_key)
+            if bucket is None or bucket.vectors.shape[1] != vector.shape[1]:
+                bucket = _StateBucket(vector.shape[1])
+                self._buckets[state_key] = bucket
+            self._buckets.move_to_end(state_key)
+
+            bucket.vectors = np.vstack([bucket.vectors, vector])
+            bucket.entries.append((
+                time.monotonic() + self.ttl_seconds,
+                plan.model_copy(deep=True),
+                planner_seconds,
+                player_intent,
+                intent_targets(player_intent),
+            ))
+            if len(bucket.entries) > self.max_per_state:
+                bucket.vectors = bucket.vectors[1:]
+                bucket.entries.pop(0)
+
+            while len(self._buckets) > self.max_states:
+                self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    @staticmethod
+    def _expire(bucket: _StateBucket) -> None:
+        now = time.monotonic()
+        keep = [i for i, entry in enumerate(bucket.entries) if entry[0] >= now]
+        if len(keep) != len(bucket.entries):
+            bucket.vectors = bucket.vectors[keep]
+            bucket.entries = [bucket.entries[i] for i in keep]
+
+
+intent_cache = SemanticIntentCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.PLANNER_CACHE_TTL_SECONDS,
+)
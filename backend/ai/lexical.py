@@ -0,0 +1,143 @@
+# Lexical memory search - SQLite FTS5 index over MemoryDoc text, ranked by BM25
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from db.engine import SessionLocal, get_engine
+from .metrics import metrics
+
+FTS_TABLE = "memory_docs_fts"
+
+# External-content FTS5 table: it stores only the index, and triggers keep it
+# in step with memory_docs whoever writes to it (seeding, promote_fact, ...)
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, entity_id, content='memory_docs', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON memory_docs BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text, entity_id) VALUES (new.id, new.text, new.entity_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON memory_docs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, entity_id) VALUES ('delete', old.id, old.text, old.entity_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text, entity_id ON memory_docs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, entity_id) VALUES ('delete', old.id, old.text, old.entity_id);
+        INSERT INTO {FTS_TABLE}(rowid, text, entity_id) VALUES (new.id, new.text, new.entity_id);
+    END""",
+]
+
+# Words that match most docs and would only add noise to the ranking
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from", "has", "have", "he",
+    "her", "his", "i", "in", "is", "it", "its", "me", "my", "of", "on", "or", "she", "so",
+    "that", "the", "their", "them", "then", "there", "they", "this", "to", "up", "was", "we",
+    "what", "where", "which", "who", "with", "you",
+}
+
+
+def ensure_lexical_index() -> bool:
+    """
+    Create the FTS5 table and its sync triggers if missing.
+
+    A newly created table is filled from the existing memory_docs.
+
+    Returns:
+        True if the index had to be created
+    """
+    with get_engine().begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        for statement in FTS_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return not exists
+
+
+def rebuild_lexical_index() -> None:
+    """Re-index every memory doc (after bulk changes made with the triggers missing)"""
+    ensure_lexical_index()
+    with get_engine().begin() as connection:
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def fts_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: any of its (quoted) non-stopword terms.
+
+    Returns:
+        The MATCH expression, or None if the text has no searchable terms
+    """
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t not in STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def lexical_search(
+    query: str,
+    top_k: int = 3,
+    db: Optional[Session] = None,
+    kinds: Optional[Iterable[str]] = None,
+    entity_ids: Optional[Iterable[str]] = None,
+    player_id: Optional[str] = None
+) -> List[Tuple[float, int]]:
+    """
+    BM25-ranked search over non-stale memory docs.
+
+    Runs entirely in SQLite, so it keeps working when the embeddings API
+    doesn't. Doc text and entity ids are both indexed, so exact names and
+    item ids ("brass_charity_token") match. Filters are applied in the
+    query, so they never cost result slots.
+
+    Args:
+        query: Free-text query (player intent)
+        top_k: Maximum number of results
+        db: Session to query with; a short-lived one is opened if None
+        kinds: Only docs of these kinds
+        entity_ids: Only docs about these entities
+        player_id: Include this player's docs (shared docs always are)
+
+    Returns:
+        List of (BM25 score, higher is better, MemoryDoc id) in rank order
+    """
+    match = fts_query(query)
+    if match is None:
+        return []
+
+    conditions = [f"{FTS_TABLE} MATCH :match", "m.stale = 0", "(m.player_id IS NULL OR m.player_id = :player_id)"]
+    params = {"match": match, "top_k": top_k, "player_id": player_id}
+    expanding = []
+    if kinds is not None:
+        conditions.append("m.kind IN :kinds")
+        params["kinds"] = list(kinds)
+        expanding.append(bindparam("kinds", expanding=True))
+    if entity_ids is not None:
+        conditions.append("m.entity_id IN :entity_ids")
+        params["entity_ids"] = list(entity_ids)
+        expanding.append(bindparam("entity_ids", expanding=True))
+    statement = text(
+        f"SELECT m.id, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+        f"JOIN memory_docs m ON m.id = {FTS_TABLE}.rowid "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY rank LIMIT :top_k"
+    ).bindparams(*expanding)
+
+    session = db if db is not None else SessionLocal()
+    try:
+        rows = session.execute(statement, params).all()
+    except OperationalError as exc:
+        # No FTS table yet (database created before it existed): dense-only
+        session.rollback()
+        metrics.inc("retrieval_lexical_failures_total")
+        print(f"Lexical search unavailable: {exc}", flush=True)
+        return []
+    finally:
+        if db is None:
+            session.close()
+    # SQLite's bm25() is negative, more negative meaning a better match
+    return [(-float(rank), int(doc_id)) for doc_id, rank in rows]
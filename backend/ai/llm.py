@@ -0,0 +1,169 @@
+# LLM call helpers - single entry point for chat completions
+import itertools
+import threading
+import time
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Any, Optional
+
+from app.config import settings
+from .metrics import metrics
+from .resilience import CircuitBreaker, RetryPolicy, call_with_resilience
+from .scheduler import current_limiter
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+retry_policy = RetryPolicy(
+    max_retries=settings.LLM_MAX_RETRIES,
+    base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+    max_delay=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+)
+
+# One breaker for the chat completions upstream: an outage affects every stage
+chat_breaker = CircuitBreaker(
+    "openai_chat",
+    failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.LLM_BREAKER_RESET_SECONDS,
+)
+
+
+def create_chat_completion(openai_client: "OpenAI", stage: str, **kwargs: Any) -> Any:
+    """
+    Call ``chat.completions.create`` under admission control and the resilience layer.
+
+    Each attempt takes a global LLM slot and gets a timeout bounded by the
+    call's remaining deadline. Retryable failures are retried with jittered
+    backoff, slow calls may be hedged, and the circuit breaker fails fast
+    during an upstream outage.
+
+    Args:
+        openai_client: OpenAI client instance
+        stage: Pipeline stage making the call ("planner", "narrator", ...)
+        **kwargs: Passed through to ``chat.completions.create``
+
+    Returns:
+        The completion, or for ``stream=True`` a generator of chunks that
+        holds its LLM slot until the stream is exhausted or closed, or at
+        most until the call's deadline
+    """
+    client = _without_sdk_retries(openai_client)
+    if kwargs.get("stream"):
+        return _stream_completion(client, stage, kwargs)
+
+    def attempt(timeout: float) -> Any:
+        with current_limiter().slot(stage):
+            start = time.monotonic()
+            response = client.chat.completions.create(timeout=timeout, **kwargs)
+            _record_model_latency(stage, kwargs.get("model"), time.monotonic() - start)
+            return response
+
+    response = call_with_resilience(
+        attempt,
+        stage=stage,
+        policy=retry_policy,
+        breaker=chat_breaker,
+        deadline_seconds=settings.LLM_DEADLINE_SECONDS,
+        attempt_timeout=settings.LLM_TIMEOUT_SECONDS,
+        hedge_delay=_hedge_delay(stage),
+    )
+    record_usage(stage, getattr(response, "usage", None))
+    return response
+
+
+def _stream_completion(client: "OpenAI", stage: str, kwargs: dict):
+    """
+    Streamed completion: only opening the stream (up to the first chunk) is
+    retried, since chunks already yielded can't be taken back. Not hedged.
+
+    The LLM slot is released at LLM_DEADLINE_SECONDS even if the reader
+    stops pulling chunks without closing the generator (e.g. a stalled
+    client); the stream then ends with TimeoutError at the next chunk.
+    """
+    deadline = time.monotonic() + settings.LLM_DEADLINE_SECONDS
+
+    def attempt(timeout: float):
+        stack = ExitStack()
+        try:
+            stack.enter_context(current_limiter().slot(stage))
+            start = time.monotonic()
+            iterator = iter(client.chat.completions.create(timeout=timeout, **kwargs))
+            first = next(iterator, None)
+            _record_model_latency(f"{stage}_stream", kwargs.get("model"), time.monotonic() - start)
+        except BaseException:
+            stack.close()
+            raise
+        return stack, first, iterator
+
+    stack, first, iterator = call_with_resilience(
+        attempt,
+        stage=f"{stage}_stream",
+        policy=retry_policy,
+        breaker=chat_breaker,
+        deadline_seconds=settings.LLM_DEADLINE_SECONDS,
+        attempt_timeout=settings.LLM_TIMEOUT_SECONDS,
+    )
+    release_lock = threading.Lock()
+    expired = threading.Event()
+
+    def release() -> None:
+        # Runs on the timer's thread or the reader's; ExitStack.close() is idempotent
+        with release_lock:
+            stack.close()
+
+    def expire() -> None:
+        expired.set()
+        release()
+
+    timer = threading.Timer(max(0.0, deadline - time.monotonic()), expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        for chunk in itertools.chain([first] if first is not None else [], iterator):
+            if expired.is_set():
+                metrics.inc("llm_stream_deadline_total", stage=stage)
+                raise TimeoutError(f"{stage} stream ran past its {settings.LLM_DEADLINE_SECONDS:.0f}s deadline")
+            # Only sent with stream_options={"include_usage": True}
+            if getattr(chunk, "usage", None) is not None:
+                record_usage(stage, chunk.usage)
+            yield chunk
+    finally:
+        timer.cancel()
+        release()
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def record_usage(stage: str, usage: Any) -> None:
+    """
+    Export prompt token usage, including how much the provider served from
+    its prompt-prefix cache (``usage.prompt_tokens_details.cached_tokens``).
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    if not prompt_tokens:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, stage=stage)
+    metrics.inc("llm_cached_prompt_tokens_total", cached_tokens, stage=stage)
+    metrics.observe("llm_prompt_cache_ratio", cached_tokens / prompt_tokens, stage=stage)
+
+
+def _record_model_latency(stage: str, model: Optional[str], seconds: float) -> None:
+    """Per-model latency of successful attempts (time to first chunk for streams)"""
+    metrics.observe("llm_model_latency_seconds", seconds, stage=stage, model=model or "default")
+
+
+def _hedge_delay(stage: str) -> Optional[float]:
+    """Hedge after the stage's recent latency percentile, once enough samples exist"""
+    if not settings.LLM_HEDGE_ENABLED:
+        return None
+    if metrics.get_sample_count("llm_latency_seconds", stage=stage) < settings.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return metrics.get_percentile("llm_latency_seconds", settings.LLM_HEDGE_PERCENTILE, stage=stage)
+
+
+def _without_sdk_retries(openai_client: "OpenAI") -> "OpenAI":
+    """Disable the SDK's built-in retries so they don't multiply with ours"""
+    with_options = getattr(openai_client, "with_options", None)
+    return with_options(max_retries=0) if with_options else openai_client
@@ -1,133 +1,1043 @@
 # Memory module - FAISS vector storage and retrieval
-import faiss
-import numpy as np
-from openai import OpenAI
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import TYPE_CHECKING, Any, Iterable, List, NamedTuple, Tuple, Dict, Optional
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 import json
+import math
 import os
-from dotenv import load_dotenv
+import threading
+import time
 
+try:
+    import fcntl
+except ImportError:  # Windows: index writes are only serialized within a process
+    fcntl = None
+
+from app.config import PROJECT_ROOT, settings
 from db.engine import SessionLocal
 from db.models import MemoryDoc
+from .doc_store import MemoryRecord, doc_store, matches_filter
+from .embeddings import OpenAIEmbeddings, get_embedding_backend
+from .lexical import lexical_search
+from .metrics import metrics
+from .rerank import rerank
 
-# Load environment variables from .env file
-# Load from project root (two levels up from backend/ai/)
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-load_dotenv(dotenv_path=PROJECT_ROOT / ".env")
+# faiss, numpy and openai are imported where they're used: together they are
+# most of the app's cold-start time and most requests never touch them
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
+    from openai import OpenAI
 
-EMBED_MODEL = "text-embedding-3-large"
-INDEX_PATH = Path(__file__).parent.parent.parent / "data" / "faiss.index"
-MAPPING_PATH = Path(__file__).parent.parent.parent / "data" / "faiss_mapping.json"
+INDEX_PATH = PROJECT_ROOT / "data" / "faiss.index"
+DOC_IDS_PATH = PROJECT_ROOT / "data" / "faiss_doc_ids.npy"
+# Model, dimensions and quantization the index was built with
+INDEX_CONFIG_PATH = PROJECT_ROOT / "data" / "faiss_index.json"
+# Float32 rows (one per position) for re-scoring quantized search results
+VECTORS_PATH = PROJECT_ROOT / "data" / "faiss_vectors.f32"
+# Position -> doc id mapping as saved by older versions, converted on first load
+LEGACY_MAPPING_PATH = PROJECT_ROOT / "data" / "faiss_mapping.json"
 
-# Ensure data directory exists
-INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+QUANTIZATIONS = ("none", "int8", "binary")
+# Sample size for fitting the int8 quantizer's per-dimension ranges
+QUANTIZER_TRAIN_SIZE = 10000
 
 
-def get_openai_client() -> OpenAI:
+def get_openai_client() -> "OpenAI":
     """Get OpenAI client instance"""
-    # OpenAI() automatically reads from OPENAI_API_KEY environment variable
-    # which is loaded via load_dotenv() above
+    from openai import OpenAI
+
+    # OPENAI_API_KEY is loaded from the project .env by app.config
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY not found in environment variables. Please check your .env file.")
     return OpenAI(api_key=api_key)
 
 
-def embed(texts: List[str]) -> np.ndarray:
-    """Embed texts using OpenAI embeddings API"""
-    client = get_openai_client()
-    response = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    vectors = np.array([d.embedding for d in response.data]).astype("float32")
-    faiss.normalize_L2(vectors)
+_client_lock = threading.Lock()
+_shared_client: Optional["OpenAI"] = None
+
+
+def get_shared_openai_client() -> "OpenAI":
+    """
+    Process-wide OpenAI client, created on first use.
+
+    Reusing one client keeps its HTTP connection pool warm across turns
+    instead of opening new connections for every request.
+    """
+    global _shared_client
+    with _client_lock:
+        if _shared_client is None:
+            _shared_client = get_openai_client()
+        return _shared_client
+
+
+def embed(
+    texts: List[str],
+    openai_client: Optional["OpenAI"] = None,
+    timeout: Optional[float] = None,
+    dimensions: Optional[int] = None
+) -> "np.ndarray":
+    """
+    Embed texts with the configured EMBED_BACKEND (see ai.embeddings).
+
+    Args:
+        texts: Texts to embed, one vector each
+        openai_client: Client to use for the OpenAI backend (a new one by default)
+        timeout: Request timeout in seconds (the client's default if None)
+        dimensions: Vector size; defaults to the saved index's (queries
+            must match it whatever the settings say now), else
+            EMBED_DIMENSIONS (0 = the backend's full size)
+
+    Returns:
+        L2-normalized float32 vectors, one row per text
+    """
+    if dimensions is None:
+        index = get_index()
+        dimensions = index.d if index is not None else settings.EMBED_DIMENSIONS or None
+    return get_embedding_backend().embed(
+        texts, dimensions=dimensions, timeout=timeout, openai_client=openai_client
+    )
+
+
+def new_index(sample: "np.ndarray", quantization: Optional[str] = None) -> "faiss.Index":
+    """
+    Create an empty index for vectors like ``sample`` with the given (or the
+    configured EMBED_QUANTIZATION) encoding:
+
+    - none: exact float32 inner product (IndexFlatIP)
+    - int8: one byte per dimension, ranges fitted on the sample (4x smaller)
+    - binary: one sign bit per dimension, Hamming distance (32x smaller)
+
+    Quantized indexes are searched for extra candidates which are then
+    re-scored with the float vectors (see search()).
+    """
+    import faiss
+
+    quantization = quantization or settings.EMBED_QUANTIZATION
+    dim = sample.shape[1]
+    if quantization == "none":
+        return faiss.IndexFlatIP(dim)
+    if quantization == "int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(sample[:QUANTIZER_TRAIN_SIZE])
+        return index
+    if quantization == "binary":
+        if dim % 8:
+            raise ValueError(f"Binary quantization needs a multiple of 8 dimensions, not {dim}")
+        return faiss.IndexBinaryFlat(dim)
+    raise ValueError(f"Unknown quantization {quantization!r} (expected one of {', '.join(QUANTIZATIONS)})")
+
+
+def quantization_of(index: "faiss.Index") -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexBinary):
+        return "binary"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "int8"
+    return "none"
+
+
+def index_codes(index: "faiss.Index", vectors: "np.ndarray") -> "np.ndarray":
+    """What to add to or search the index for float vectors: sign bits for a binary index"""
+    import numpy as np
+
+    if quantization_of(index) == "binary":
+        return np.packbits(vectors > 0, axis=1)
     return vectors
 
 
-def build_index(vectors: np.ndarray, doc_ids: List[int]) -> faiss.IndexFlatIP:
+def build_index(vectors: "np.ndarray", doc_ids: List[int]) -> "faiss.Index":
     """Build FAISS index from vectors and save to disk"""
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
-    if INDEX_PATH.exists():
-        INDEX_PATH.unlink()  # Remove old index
-    faiss.write_index(index, str(INDEX_PATH))
-    
-    # Save mapping from FAISS index position to MemoryDoc ID
-    mapping = {str(i): doc_id for i, doc_id in enumerate(doc_ids)}
-    with open(MAPPING_PATH, 'w') as f:
-        json.dump(mapping, f)
-    
+    index = new_index(vectors)
+    index.add(index_codes(index, vectors))
+    with index_write_lock():
+        save_index(index, doc_ids, vectors)
     return index
 
 
-def search(query: str, top_k: int = 3) -> List[Tuple[float, int]]:
-    """Search FAISS index for similar documents"""
+_index_write_lock = threading.Lock()
+
+
+@contextmanager
+def index_write_lock():
+    """
+    Serialize writers of the index files across threads and worker processes.
+
+    Appends read, modify and rewrite several files; two writers interleaving
+    could pair one's index with the other's doc id table, or lose an append.
+    Other processes are excluded with an flock on a lock file beside the
+    index. save_index() callers hold this lock.
+    """
+    with _index_write_lock:
+        INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(INDEX_PATH.with_name(INDEX_PATH.name + ".lock"), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            # Closing the file releases the flock
+            yield
+
+
+def save_index(
+    index: "faiss.Index",
+    doc_ids: List[int],
+    vectors: Optional["np.ndarray"] = None,
+    vectors_path: Optional[Path] = None
+) -> None:
+    """
+    Save the index, its position -> MemoryDoc id table (data/faiss_doc_ids.npy)
+    and its config (data/faiss_index.json).
+
+    A quantized index also needs its float vectors for re-scoring: pass
+    them (or ``vectors_path``, a finished file of them to move into place)
+    to (re)write data/faiss_vectors.f32, or leave them out if that file is
+    already up to date.
+
+    Hold index_write_lock() around the call. Each file is written beside
+    its target and renamed over it, so workers that memory-mapped the old
+    files keep reading them intact. The config is rewritten first to mark
+    the files as being written and last with a new generation stamp:
+    readers only pair an index with the table saved with it (see
+    get_index_snapshot()).
+    """
+    import uuid
+
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    quantization = quantization_of(index)
+    config = {
+        "embed_model": get_embedding_backend().model,
+        "dimensions": index.d,
+        "quantization": quantization,
+        "generation": uuid.uuid4().hex,
+    }
+    _begin_index_write()
+    if quantization == "none":
+        if VECTORS_PATH.exists():
+            VECTORS_PATH.unlink()
+    elif vectors_path is not None:
+        os.replace(vectors_path, VECTORS_PATH)
+    elif vectors is not None:
+        tmp_vectors = VECTORS_PATH.with_name(VECTORS_PATH.name + ".tmp")
+        vectors.astype("float32").tofile(str(tmp_vectors))
+        os.replace(tmp_vectors, VECTORS_PATH)
+
+    tmp_index = INDEX_PATH.with_name(INDEX_PATH.name + ".tmp")
+    write_index_file(index, tmp_index)
+    os.replace(tmp_index, INDEX_PATH)
+
+    _save_doc_ids(doc_ids)
+    _save_index_config(config)
+
+
+def _save_index_config(config: Dict[str, Any]) -> None:
+    tmp_config = INDEX_CONFIG_PATH.with_name(INDEX_CONFIG_PATH.name + ".tmp")
+    with open(tmp_config, 'w') as f:
+        json.dump(config, f)
+    os.replace(tmp_config, INDEX_CONFIG_PATH)
+
+
+def _begin_index_write() -> None:
+    """Mark the index files as being rewritten until save_index() stamps the new generation"""
+    INDEX_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    _save_index_config(dict(load_index_config(), writing=True))
+
+
+def write_index_file(index: "faiss.Index", path: Path) -> None:
+    import faiss
+
+    if quantization_of(index) == "binary":
+        faiss.write_index_binary(index, str(path))
+    else:
+        faiss.write_index(index, str(path))
+
+
+def read_index_file(path: Path, flags: int = 0) -> "faiss.Index":
+    """Read a float or binary FAISS index, telling them apart by the file header"""
+    import faiss
+
+    with open(path, 'rb') as f:
+        binary = f.read(2) == b"IB"
+    if binary:
+        return faiss.read_index_binary(str(path), flags)
+    return faiss.read_index(str(path), flags)
+
+
+def load_index_config() -> Dict[str, Any]:
+    """The saved index's config, or {} for an index saved before configs were"""
+    if not INDEX_CONFIG_PATH.exists():
+        return {}
+    with open(INDEX_CONFIG_PATH, 'r') as f:
+        return json.load(f)
+
+
+def index_embed_model() -> str:
+    """The embedding model the saved index was built with"""
+    # Indexes saved without a config were all built with the OpenAI model
+    return load_index_config().get("embed_model", OpenAIEmbeddings.model)
+
+
+def load_vectors(index: "faiss.Index") -> Optional["np.ndarray"]:
+    """
+    The float vectors for re-scoring the index's results, memory-mapped
+    read-only (only the rows of candidates being re-scored are paged in),
+    or None if the file is missing or doesn't cover the index.
+    """
+    import numpy as np
+
+    if not VECTORS_PATH.exists() or VECTORS_PATH.stat().st_size == 0:
+        return None
+    vectors = np.memmap(VECTORS_PATH, dtype="float32", mode="r")
+    if vectors.size % index.d:
+        return None
+    vectors = vectors.reshape(-1, index.d)
+    return vectors if len(vectors) >= index.ntotal else None
+
+
+def _save_doc_ids(doc_ids: Iterable[int]) -> None:
+    """Write the binary doc id table: one int64 per index position, memory-mapped by readers"""
+    import numpy as np
+
+    DOC_IDS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_ids = DOC_IDS_PATH.with_name(DOC_IDS_PATH.name + ".tmp")
+    with open(tmp_ids, 'wb') as f:
+        np.save(f, np.asarray(list(doc_ids), dtype="int64"))
+    os.replace(tmp_ids, DOC_IDS_PATH)
+
+
+def load_index(mmap: Optional[bool] = None) -> Optional["faiss.Index"]:
+    """
+    Read the FAISS index from disk, or None if it has not been built yet.
+    
+    With MEMORY_INDEX_MMAP (or mmap=True) the vectors are memory-mapped
+    read-only instead of copied onto the heap, so every worker process
+    serves searches from the same page-cache pages. Such an index can't be
+    modified; pass mmap=False for a private, writable copy.
+    """
     if not INDEX_PATH.exists():
+        return None
+    import faiss
+
+    if mmap is None:
+        mmap = settings.MEMORY_INDEX_MMAP
+    if not mmap:
+        return read_index_file(INDEX_PATH)
+    # IO_FLAG_MMAP_IFC maps flat codes without copying them; older FAISS
+    # builds only have IO_FLAG_MMAP, which maps inverted lists only
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return read_index_file(INDEX_PATH, flags)
+
+
+class IndexSnapshot(NamedTuple):
+    """The index with the doc id table and re-scoring vectors saved with it"""
+    index: "faiss.Index"
+    table: "DocIdTable"
+    vectors: Optional["np.ndarray"]
+    embed_model: str
+
+
+class _IndexBeingWritten(Exception):
+    pass
+
+
+def _load_snapshot() -> Optional[IndexSnapshot]:
+    """
+    Read the index files as one consistent set, like a seqlock: the config
+    must show the same finished generation before and after the other files
+    are read, and the table must have one doc id per index position.
+
+    Returns:
+        The snapshot, or None if there is no index (or its files disagree)
+
+    Raises:
+        _IndexBeingWritten: If save_index() is replacing the files meanwhile
+    """
+    config = load_index_config()
+    if config.get("writing"):
+        raise _IndexBeingWritten()
+    index = load_index()
+    if index is None:
+        return None
+    doc_ids = load_doc_ids()
+    vectors = load_vectors(index) if quantization_of(index) != "none" else None
+    if load_index_config() != config:
+        raise _IndexBeingWritten()
+    if len(doc_ids) != index.ntotal:
+        print(f"{DOC_IDS_PATH.name} has {len(doc_ids)} doc ids for {index.ntotal} index positions: "
+              f"dense retrieval is off until a reindex", flush=True)
+        return None
+    # Indexes saved without a config were all built with the OpenAI model
+    return IndexSnapshot(index, DocIdTable(doc_ids), vectors, config.get("embed_model", OpenAIEmbeddings.model))
+
+
+_index_lock = threading.Lock()
+_snapshot: Optional[IndexSnapshot] = None
+# The snapshot before the last reload, for callers still holding its index
+_previous_snapshot: Optional[IndexSnapshot] = None
+_snapshot_key: Optional[Tuple] = None
+
+
+def get_index_snapshot() -> Optional[IndexSnapshot]:
+    """
+    Return the shared index with its doc id table, re-reading them together
+    only if any of the index files changed. A new snapshot means a reindex or
+    an append, so the doc store is cleared too.
+
+    While another worker is rewriting the files the current snapshot is kept
+    (its files stay mapped) and the read is retried on the next call.
+
+    Returns:
+        The loaded snapshot, or None if no index has been built yet (or it
+        doesn't match its doc id table)
+    """
+    global _snapshot, _previous_snapshot, _snapshot_key
+    with _index_lock:
+        key = tuple(
+            path.stat().st_mtime_ns if path.exists() else None
+            for path in (INDEX_CONFIG_PATH, INDEX_PATH, DOC_IDS_PATH)
+        )
+        if key != _snapshot_key:
+            try:
+                snapshot = _load_snapshot()
+            except _IndexBeingWritten:
+                return _snapshot
+            embed_model = get_embedding_backend().model
+            if snapshot is not None and snapshot.embed_model != embed_model:
+                print(f"FAISS index was built with {snapshot.embed_model}, not {embed_model}: "
+                      f"dense retrieval is off until a reindex", flush=True)
+            _previous_snapshot, _snapshot, _snapshot_key = _snapshot, snapshot, key
+            doc_store.invalidate()
+        return _snapshot
+
+
+def get_index() -> Optional["faiss.Index"]:
+    """
+    Return the shared FAISS index (see get_index_snapshot()).
+
+    An index built with another embedding model than EMBED_BACKEND's is
+    treated as missing: its vectors can't be compared with this backend's
+    query embeddings, so retrieval stays lexical until a reindex.
+
+    Returns:
+        The loaded index, or None if it has not been built yet (or was
+        built with another embedding model)
+    """
+    snapshot = get_index_snapshot()
+    if snapshot is None or snapshot.embed_model != get_embedding_backend().model:
+        return None
+    return snapshot.index
+
+
+def _snapshot_of(index: "faiss.Index") -> Optional[IndexSnapshot]:
+    """The shared snapshot ``index`` was loaded in, if it's one of the last two"""
+    for snapshot in (_snapshot, _previous_snapshot):
+        if snapshot is not None and snapshot.index is index:
+            return snapshot
+    return None
+
+
+def _rescore_vectors(index: "faiss.Index") -> Optional["np.ndarray"]:
+    if quantization_of(index) == "none":
+        return None
+    snapshot = _snapshot_of(index)
+    if snapshot is not None:
+        return snapshot.vectors
+    return load_vectors(index)
+
+
+def add_to_index(vectors: "np.ndarray", doc_ids: List[int]) -> Optional["faiss.Index"]:
+    """
+    Append vectors for new docs to the saved index without rebuilding it.
+
+    The files are replaced as in build_index(); the shared index picks up
+    the new file on its next get_index(). Docs already in the index (e.g.
+    appended by another worker meanwhile) are skipped.
+
+    Returns:
+        The updated index, or None if no index has been built yet (the docs
+        are then only found lexically until the next reindex)
+
+    Raises:
+        ValueError: If the vectors don't fit the index (another embedding
+            model or size), or the saved doc id table doesn't cover it
+    """
+    with index_write_lock():
+        # A private copy from disk: searches on the shared index are unaffected
+        index = load_index(mmap=False)
+        if index is None:
+            return None
+        built_with, embed_model = index_embed_model(), get_embedding_backend().model
+        if built_with != embed_model:
+            raise ValueError(f"The index was built with {built_with}; vectors from {embed_model} can't be added")
+        if vectors.shape[1] != index.d:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} doesn't match the index ({index.d})")
+        existing = load_doc_ids()
+        if len(existing) != index.ntotal:
+            raise ValueError(f"{DOC_IDS_PATH.name} has {len(existing)} doc ids for {index.ntotal} index positions; "
+                             f"reindex before appending")
+        new = DocIdTable(existing).positions_of(doc_ids) < 0
+        if not new.any():
+            return index
+        vectors = vectors[new]
+        all_doc_ids = existing.tolist() + [doc_id for doc_id, keep in zip(doc_ids, new) if keep]
+        if quantization_of(index) != "none":
+            _begin_index_write()
+            _append_vectors(index, vectors)
+        index.add(index_codes(index, vectors))
+        save_index(index, all_doc_ids)
+        return index
+
+
+def _append_vectors(index: "faiss.Index", vectors: "np.ndarray") -> None:
+    """Add rows for new positions to the re-scoring vectors (readers ignore rows past their index)"""
+    existing = load_vectors(index)
+    if existing is None or len(existing) != index.ntotal:
+        # Misaligned rows would re-score the wrong docs: fall back to quantized scores
+        print(f"{VECTORS_PATH.name} doesn't match the index; re-scoring disabled until the next reindex", flush=True)
+        if VECTORS_PATH.exists():
+            VECTORS_PATH.unlink()
+        return
+    with open(VECTORS_PATH, 'ab') as f:
+        vectors.astype("float32").tofile(f)
+
+
+def search(
+    query: str,
+    top_k: int = 3,
+    index: Optional["faiss.Index"] = None,
+    query_vector: Optional["np.ndarray"] = None,
+    allowed_positions: Optional["np.ndarray"] = None
+) -> List[Tuple[float, int]]:
+    """
+    Search FAISS index for similar documents.
+    
+    Uses the shared index (see get_index()) unless one is passed; pass an
+    already computed query embedding to skip the embeddings call. With
+    ``allowed_positions`` only those index positions are searched, and up
+    to top_k of them are still returned.
+
+    A quantized index is searched for RETRIEVAL_RESCORE_FACTOR x top_k
+    candidates, which are re-scored by exact inner product with their float
+    vectors, so scores stay comparable to an unquantized index.
+    """
+    if index is None:
+        index = get_index()
+    if index is None:
         return []
     
-    index = faiss.read_index(str(INDEX_PATH))
-    q_vec = embed([query])
-    D, I = index.search(q_vec, top_k)
+    q_vec = query_vector if query_vector is not None else embed([query])
+    vectors = _rescore_vectors(index)
+    k = top_k * max(1, settings.RETRIEVAL_RESCORE_FACTOR) if vectors is not None else top_k
+    if allowed_positions is None:
+        D, I = _index_search(index, q_vec, k)
+    else:
+        D, I = _filtered_search(index, q_vec, k, allowed_positions)
     
     # Filter out invalid indices (-1 means no match)
-    results = [(float(d), int(i)) for d, i in zip(D[0], I[0]) if i >= 0]
-    return results
+    positions = I[0][I[0] >= 0]
+    if vectors is not None:
+        scores = vectors[positions] @ q_vec[0]
+        order = scores.argsort()[::-1][:top_k]
+        return [(float(scores[n]), int(positions[n])) for n in order]
+    scores = D[0][I[0] >= 0]
+    if quantization_of(index) == "binary":
+        # Hamming distance -> approximate cosine similarity of sign patterns
+        scores = [math.cos(math.pi * d / index.d) for d in scores]
+    return [(float(d), int(i)) for d, i in zip(scores, positions)]
 
 
-def load_mapping() -> Dict[int, int]:
-    """Load FAISS index to MemoryDoc ID mapping"""
-    if not MAPPING_PATH.exists():
-        return {}
-    with open(MAPPING_PATH, 'r') as f:
-        return {int(k): int(v) for k, v in json.load(f).items()}
+def _index_search(index: "faiss.Index", q_vec: "np.ndarray", k: int, params: Optional[Any] = None):
+    if params is None:
+        return index.search(index_codes(index, q_vec), k)
+    return index.search(index_codes(index, q_vec), k, params=params)
 
 
-def retrieve_context(player_intent: str) -> str:
-    """Retrieve relevant facts from memory based on player intent"""
+def _filtered_search(index: "faiss.Index", q_vec: "np.ndarray", top_k: int, allowed_positions: "np.ndarray"):
+    """
+    Search only the allowed index positions.
+    
+    Uses a FAISS ID selector, which is exact. FAISS builds without selectors
+    over-fetch in proportion to the filter's selectivity and double the
+    depth until top_k allowed hits survive (or the whole index was searched).
+    """
+    import faiss
+    import numpy as np
+    
+    allowed_positions = np.asarray(allowed_positions, dtype="int64")
+    if len(allowed_positions) == 0:
+        return np.empty((1, 0), dtype="float32"), np.empty((1, 0), dtype="int64")
+    top_k = min(top_k, len(allowed_positions))
+    if hasattr(faiss, "SearchParameters"):
+        return _index_search(index, q_vec, top_k, params=_selector_params(allowed_positions))
+    
+    k = min(index.ntotal, math.ceil(top_k * index.ntotal / len(allowed_positions)))
+    while True:
+        D, I = _index_search(index, q_vec, k)
+        keep = np.isin(I[0], allowed_positions)
+        if keep.sum() >= top_k or k >= index.ntotal:
+            return D[:, keep][:, :top_k], I[:, keep][:, :top_k]
+        metrics.inc("retrieval_overfetch_retries_total")
+        k = min(index.ntotal, k * 2)
+
+
+_selector_lock = threading.Lock()
+_selectors: "OrderedDict[int, Tuple]" = OrderedDict()
+
+
+def _selector_params(allowed_positions: "np.ndarray") -> Any:
+    """
+    FAISS search parameters selecting the allowed positions. Building the
+    selector hashes every position, so it's kept for the last few arrays
+    (DocFilterTable hands out the same array while a filter is unchanged).
+    """
+    import faiss
+
+    with _selector_lock:
+        entry = _selectors.get(id(allowed_positions))
+        if entry is not None and entry[0] is allowed_positions:
+            _selectors.move_to_end(id(allowed_positions))
+            return entry[2]
+    selector = faiss.IDSelectorBatch(allowed_positions)
+    params = faiss.SearchParameters(sel=selector)
+    with _selector_lock:
+        # The array is kept with its selector, so its id isn't reused meanwhile
+        _selectors[id(allowed_positions)] = (allowed_positions, selector, params)
+        while len(_selectors) > 8:
+            _selectors.popitem(last=False)
+    return params
+
+
+class DocIdTable:
+    """
+    Index position -> MemoryDoc id table with vectorized lookups both ways.
+
+    ``doc_ids`` is the memory-mapped int64 array saved with the index. The
+    reverse direction uses a sorted copy of it (built on first use) and a
+    binary search per id; unknown positions and ids map to -1.
+    """
+
+    def __init__(self, doc_ids: "np.ndarray"):
+        self.doc_ids = doc_ids
+        self._sorted_ids: Optional["np.ndarray"] = None
+        self._order: Optional["np.ndarray"] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def doc_ids_at(self, positions: "np.ndarray") -> "np.ndarray":
+        """MemoryDoc ids of index positions (-1 for invalid positions, e.g. FAISS's -1 padding)"""
+        import numpy as np
+
+        positions = np.asarray(positions, dtype="int64")
+        doc_ids = np.full(len(positions), -1, dtype="int64")
+        valid = (positions >= 0) & (positions < len(self.doc_ids))
+        doc_ids[valid] = self.doc_ids[positions[valid]]
+        return doc_ids
+
+    def positions_of(self, doc_ids: Iterable[int]) -> "np.ndarray":
+        """Index positions of MemoryDoc ids (-1 for docs that aren't indexed)"""
+        import numpy as np
+
+        if isinstance(doc_ids, (list, tuple, np.ndarray)):
+            doc_ids = np.asarray(doc_ids, dtype="int64")
+        else:
+            doc_ids = np.fromiter(doc_ids, dtype="int64")
+        if not len(self.doc_ids):
+            return np.full(len(doc_ids), -1, dtype="int64")
+        with self._lock:
+            if self._order is None:
+                if (self.doc_ids[1:] > self.doc_ids[:-1]).all():
+                    # Built in id order, as reindexing and appends do
+                    self._order = np.arange(len(self.doc_ids), dtype="int64")
+                    self._sorted_ids = self.doc_ids
+                else:
+                    self._order = np.argsort(self.doc_ids, kind="stable")
+                    self._sorted_ids = self.doc_ids[self._order]
+        # Searching in sorted order keeps the binary searches cache-friendly
+        query_order = np.argsort(doc_ids)
+        found = np.empty(len(doc_ids), dtype="int64")
+        found[query_order] = np.searchsorted(self._sorted_ids, doc_ids[query_order])
+        np.minimum(found, len(self._sorted_ids) - 1, out=found)
+        return np.where(self._sorted_ids[found] == doc_ids, self._order[found], -1)
+
+
+def load_doc_ids() -> "np.ndarray":
+    """
+    The MemoryDoc id of every index position, memory-mapped read-only from
+    the binary table (empty if no index has been built).
+
+    A JSON mapping saved by older versions is converted to the table once
+    (and left in place; it is no longer read or updated).
+    """
+    import numpy as np
+
+    if not DOC_IDS_PATH.exists() and LEGACY_MAPPING_PATH.exists():
+        with open(LEGACY_MAPPING_PATH, 'r') as f:
+            mapping = {int(k): int(v) for k, v in json.load(f).items()}
+        _save_doc_ids([mapping[position] for position in range(len(mapping))])
+        print(f"Converted {LEGACY_MAPPING_PATH.name} to {DOC_IDS_PATH.name}", flush=True)
+    if not DOC_IDS_PATH.exists():
+        return np.empty(0, dtype="int64")
+    return np.load(DOC_IDS_PATH, mmap_mode="r")
+
+
+def get_doc_id_table(index: Optional["faiss.Index"] = None) -> DocIdTable:
+    """
+    Position <-> MemoryDoc id table saved with ``index`` (by default the
+    shared index, see get_index_snapshot()). Pass the index whose search
+    results are being mapped: after a reindex, positions in the old index
+    mean other docs than in the new one.
+    """
+    if index is not None:
+        snapshot = _snapshot_of(index)
+        if snapshot is not None:
+            return snapshot.table
+    snapshot = get_index_snapshot()
+    if snapshot is not None:
+        return snapshot.table
+    return DocIdTable(load_doc_ids())
+
+
+class DocFilterTable:
+    """
+    Retrieval metadata of every index position, for filtered dense search.
+
+    Holds a small code per position for the doc's kind, entity and owning
+    player, and its stale flag (no text), read with one query per index
+    snapshot. A filter's allowed positions are then a vectorized mask over
+    these arrays; the last few filters' positions are kept, since a player's
+    turns repeat theirs. Positions without a doc row are never allowed.
+    """
+
+    def __init__(self, table: DocIdTable, rows: Iterable[Tuple], max_filters: int = 8):
+        import numpy as np
+
+        self.table = table
+        self.max_filters = max_filters
+        self._kinds: Dict[Optional[str], int] = {}
+        self._entities: Dict[Optional[str], int] = {}
+        self._players: Dict[Optional[str], int] = {None: 0}
+        self._allowed: "OrderedDict[Tuple, Optional[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        rows = list(rows)
+        size = len(table)
+        self.kind = np.full(size, -1, dtype="int32")
+        self.entity = np.full(size, -1, dtype="int32")
+        self.owner = np.full(size, -1, dtype="int32")
+        self.stale = np.ones(size, dtype=bool)
+        positions = table.positions_of([row[0] for row in rows])
+        for position, (_, kind, entity_id, player_id, stale) in zip(positions.tolist(), rows):
+            if position < 0:
+                continue  # not embedded yet
+            self.kind[position] = self._kinds.setdefault(kind, len(self._kinds))
+            self.entity[position] = self._entities.setdefault(entity_id, len(self._entities))
+            self.owner[position] = self._players.setdefault(player_id, len(self._players))
+            self.stale[position] = bool(stale)
+
+    def allowed_positions(
+        self,
+        kinds: Optional[Iterable[str]] = None,
+        entity_ids: Optional[Iterable[str]] = None,
+        player_id: Optional[str] = None
+    ) -> Optional["np.ndarray"]:
+        """
+        Index positions a filter may retrieve (see matches_filter()), or None
+        if it allows every position.
+        """
+        import numpy as np
+
+        key = (
+            frozenset(kinds) if kinds is not None else None,
+            frozenset(entity_ids) if entity_ids is not None else None,
+            player_id,
+        )
+        with self._lock:
+            if key in self._allowed:
+                self._allowed.move_to_end(key)
+                return self._allowed[key]
+            mask = ~self.stale & ((self.owner == 0) | (self.owner == self._players.get(player_id, -1)))
+            if kinds is not None:
+                mask &= np.isin(self.kind, [self._kinds[kind] for kind in key[0] if kind in self._kinds])
+            if entity_ids is not None:
+                mask &= np.isin(self.entity, [self._entities[e] for e in key[1] if e in self._entities])
+            allowed = None if mask.all() else np.flatnonzero(mask)
+            self._allowed[key] = allowed
+            while len(self._allowed) > self.max_filters:
+                self._allowed.popitem(last=False)
+            return allowed
+
+    def mark_stale(self, doc_ids: Iterable[int]) -> None:
+        """Exclude docs marked stale since the table was read"""
+        positions = self.table.positions_of(doc_ids)
+        positions = positions[positions >= 0]
+        with self._lock:
+            if not self.stale[positions].all():
+                self.stale[positions] = True
+                self._allowed.clear()
+
+
+_filter_lock = threading.Lock()
+_filter_table: Optional[DocFilterTable] = None
+
+
+def get_doc_filter_table(index: Optional["faiss.Index"], db: Session) -> DocFilterTable:
+    """
+    Filter metadata for the positions of ``index`` (see get_doc_id_table()),
+    read from memory_docs when the index snapshot changes.
+    """
+    global _filter_table
+    table = get_doc_id_table(index)
+    with _filter_lock:
+        if _filter_table is not None and _filter_table.table is table:
+            return _filter_table
+        columns = (MemoryDoc.id, MemoryDoc.kind, MemoryDoc.entity_id, MemoryDoc.player_id, MemoryDoc.stale)
+        try:
+            rows = db.query(*columns).all()
+        except OperationalError as exc:
+            db.rollback()
+            print(f"Memory docs unavailable, database not initialized: {exc}", flush=True)
+            return DocFilterTable(table, [])
+        _filter_table = DocFilterTable(table, rows)
+        return _filter_table
+
+
+def _mark_filtered_stale(doc_ids: List[int]) -> None:
+    with _filter_lock:
+        filter_table = _filter_table
+    if filter_table is not None and doc_ids:
+        filter_table.mark_stale(doc_ids)
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[float, int]]:
+    """
+    Fuse ranked doc id lists by reciprocal rank: a doc scores the sum of
+    1 / (k + rank) over the lists it appears in (rank starting at 1).
+
+    Scores are rescaled so a doc ranked first in every list scores 1.0.
+
+    Returns:
+        List of (fused score, doc id), best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    scale = (k + 1) / max(1, len(rankings))
+    return sorted(((score * scale, doc_id) for doc_id, score in fused.items()), key=lambda r: (-r[0], r[1]))
+
+
+def _dense_doc_matches(
+    player_intent: str,
+    top_k: int,
+    index: Optional["faiss.Index"],
+    query_vector: Optional["np.ndarray"],
+    db: Session,
+    kinds: Optional[Iterable[str]] = None,
+    entity_ids: Optional[Iterable[str]] = None,
+    player_id: Optional[str] = None
+) -> List[Tuple[float, int]]:
+    """Dense search restricted to the docs the filter allows, as (similarity, MemoryDoc id)"""
+    if index is None:
+        index = get_index()
+    if index is None:
+        return []
+    filter_table = get_doc_filter_table(index, db)
+    table = filter_table.table
+    allowed_positions = filter_table.allowed_positions(kinds, entity_ids, player_id)
+    matches = search(
+        player_intent, top_k=top_k, index=index, query_vector=query_vector, allowed_positions=allowed_positions
+    )
+    doc_ids = table.doc_ids_at([idx for _, idx in matches])
+    return [(score, int(doc_id)) for (score, _), doc_id in zip(matches, doc_ids) if doc_id >= 0]
+
+
+def retrieve_facts(
+    player_intent: str,
+    top_k: int = 3,
+    index: Optional["faiss.Index"] = None,
+    query_vector: Optional["np.ndarray"] = None,
+    dense: bool = True,
+    kinds: Optional[Iterable[str]] = None,
+    entity_ids: Optional[Iterable[str]] = None,
+    player_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve relevant facts with their scores and metadata.
+    
+    Stale docs, other players' docs and docs outside the kind/entity filters
+    are excluded inside the searches themselves, so they never take one of
+    the top_k slots: lexical search filters in SQL, dense search hands FAISS
+    only the positions allowed by the index's filter table. Text and
+    metadata come from the doc store, which caches recently retrieved docs;
+    the stale flags of the candidates are re-read from the database, so a
+    doc marked stale by another worker process is dropped on its next turn
+    (and from then on excluded from the search).
+    
+    With RETRIEVAL_HYBRID_ENABLED, dense (FAISS) and lexical (BM25) results
+    are each fetched RETRIEVAL_CANDIDATES deep and fused by reciprocal rank,
+    so exact names and ids are found even when embeddings rank them poorly.
+    If the embeddings call fails, retrieval falls back to lexical results.
+    
+    Args:
+        player_intent: Query text
+        top_k: Number of facts to return
+        index: Already loaded FAISS index (the shared one if None)
+        query_vector: Already computed query embedding
+        dense: Set False to skip dense search (e.g. embeddings unavailable)
+        kinds: Only docs of these kinds (e.g. ["lore_rule", "known_fact"])
+        entity_ids: Only docs about these entities
+        player_id: Include this player's own docs (shared docs always are)
+    
+    With RERANK_ENABLED, the candidates are re-ranked by relevance,
+    importance and recency, and top_k of them picked by maximal marginal
+    relevance so near-duplicate facts don't crowd out the rest.
+    
+    Returns:
+        List of {"id", "text", "kind", "entity_id", "importance", "score"}
+        dicts, best first. The score is the inner product, or the fused
+        rank score (0-1) in hybrid mode; re-ranked facts also carry their
+        combined "rank_score" (0-1).
+    """
+    kinds = set(kinds) if kinds is not None else None
+    entity_ids = set(entity_ids) if entity_ids is not None else None
+    hybrid = settings.RETRIEVAL_HYBRID_ENABLED
+    rerank_enabled = settings.RERANK_ENABLED
+    depth = max(top_k, settings.RETRIEVAL_CANDIDATES) if hybrid or rerank_enabled else top_k
+    
     db = SessionLocal()
     try:
-        matches = search(player_intent, top_k=3)
-        if not matches:
-            return ""
+        dense_matches: List[Tuple[float, int]] = []
+        if dense:
+            try:
+                dense_matches = _dense_doc_matches(
+                    player_intent, depth, index, query_vector, db, kinds, entity_ids, player_id
+                )
+            except Exception as exc:
+                if not hybrid:
+                    raise
+                metrics.inc("retrieval_dense_failures_total")
+                print(f"Dense retrieval failed, using lexical results only: {exc}", flush=True)
         
-        # Map FAISS indices to MemoryDoc IDs
-        mapping = load_mapping()
-        doc_ids = [mapping.get(idx) for _, idx in matches if idx in mapping]
+        if hybrid:
+            lexical_matches = lexical_search(
+                player_intent, top_k=depth, db=db, kinds=kinds, entity_ids=entity_ids, player_id=player_id
+            )
+            ranked = reciprocal_rank_fusion(
+                [[doc_id for _, doc_id in dense_matches], [doc_id for _, doc_id in lexical_matches]],
+                k=settings.RETRIEVAL_RRF_K,
+            )
+        else:
+            ranked = dense_matches
+        if not ranked:
+            return []
         
-        # Fetch documents by ID
-        docs = db.query(MemoryDoc).filter(
-            MemoryDoc.id.in_(doc_ids),
-            MemoryDoc.stale == False
-        ).all()
-        
-        # Create a lookup dict for quick access
-        doc_dict = {doc.id: doc.text for doc in docs}
-        
-        # Return facts in order of match relevance
-        facts = []
-        for _, idx in matches:
-            doc_id = mapping.get(idx)
-            if doc_id and doc_id in doc_dict:
-                facts.append(doc_dict[doc_id])
-        
-        return "\n".join(facts)
+        # Another worker may have marked some of them stale since the search tables were read
+        records = doc_store.get_many([doc_id for _, doc_id in ranked], db, check_stale=True)
+        _mark_filtered_stale([doc_id for doc_id, record in records.items() if record.stale])
     finally:
         db.close()
+    
+    candidates = [
+        (score, records[doc_id]) for score, doc_id in ranked
+        if doc_id in records and matches_filter(records[doc_id], kinds, entity_ids, player_id)
+    ]
+    if not rerank_enabled:
+        # Return facts in order of match relevance
+        return [_fact(record, score) for score, record in candidates[:top_k]]
+    
+    start = time.perf_counter()
+    picked = rerank(
+        [score for score, _ in candidates],
+        [record.importance for _, record in candidates],
+        [record.created_at for _, record in candidates],
+        [record.text for _, record in candidates],
+        top_k,
+        vectors=_doc_vectors(index, [record.id for _, record in candidates]),
+    )
+    metrics.observe("retrieval_rerank_seconds", time.perf_counter() - start)
+    return [_fact(candidates[i][1], candidates[i][0], rank_score) for i, rank_score in picked]
+
+
+def _fact(record: MemoryRecord, score: float, rank_score: Optional[float] = None) -> Dict[str, Any]:
+    fact = {
+        "id": record.id,
+        "text": record.text,
+        "kind": record.kind,
+        "entity_id": record.entity_id,
+        "importance": record.importance,
+        "score": score,
+    }
+    if rank_score is not None:
+        fact["rank_score"] = rank_score
+    return fact
+
+
+def _doc_vectors(index: Optional["faiss.Index"], doc_ids: List[int]) -> Optional["np.ndarray"]:
+    """
+    The docs' embeddings, read from the re-scoring vectors of a quantized
+    index or back from the FAISS index, or None if the index is missing,
+    can't reconstruct vectors or lacks one of the docs.
+    """
+    if index is None:
+        index = get_index()
+    if index is None:
+        return None
+    positions = get_doc_id_table(index).positions_of(doc_ids)
+    if (positions < 0).any():
+        return None
+    vectors = _rescore_vectors(index)
+    if vectors is not None:
+        return vectors[positions]
+    if quantization_of(index) == "binary":
+        return None  # sign bits only
+    try:
+        return index.reconstruct_batch(positions)
+    except RuntimeError:
+        return None
+
+
+def retrieve_context(
+    player_intent: str,
+    index: Optional["faiss.Index"] = None,
+    query_vector: Optional["np.ndarray"] = None,
+    kinds: Optional[Iterable[str]] = None,
+    entity_ids: Optional[Iterable[str]] = None,
+    player_id: Optional[str] = None
+) -> str:
+    """Retrieve relevant facts from memory based on player intent"""
+    facts = retrieve_facts(
+        player_intent, index=index, query_vector=query_vector, kinds=kinds, entity_ids=entity_ids, player_id=player_id
+    )
+    return "\n".join(fact["text"] for fact in facts)
 
 
-def promote_fact(text: str, kind: str = "known_fact", entity_id: str = None, importance: int = 0):
-    """Store a new known fact in memory"""
+def promote_fact(
+    text: str,
+    kind: str = "known_fact",
+    entity_id: str = None,
+    importance: int = 0,
+    player_id: Optional[str] = None
+):
+    """Store a new known fact in memory (scoped to one player if player_id is given)"""
     db = SessionLocal()
     try:
         doc = MemoryDoc(
             kind=kind,
             text=text,
             entity_id=entity_id,
+            player_id=player_id,
             importance=importance,
             stale=False
         )
         db.add(doc)
         db.commit()
+        # Load the committed row so the returned doc is usable after close
+        db.refresh(doc)
+        doc_store.put(doc)
         return doc
     finally:
         db.close()
@@ -141,6 +1051,8 @@ def mark_stale(doc_id: int):
         if doc:
             doc.stale = True
             db.commit()
+            doc_store.mark_stale(doc_id)
+            _mark_filtered_stale([doc_id])
     finally:
         db.close()
 
@@ -154,13 +1066,13 @@ if __name__ == "__main__":
     
     # Show detailed results if index exists
     if results:
-        mapping = load_mapping()
+        table = get_doc_id_table()
         db = SessionLocal()
         try:
             print("\nTop matches:")
             for score, idx in results[:3]:
-                doc_id = mapping.get(idx)
-                if doc_id:
+                doc_id = int(table.doc_ids_at([idx])[0])
+                if doc_id >= 0:
                     doc = db.query(MemoryDoc).filter(MemoryDoc.id == doc_id).first()
                     if doc:
                         print(f"  Score: {score:.3f} | {doc.kind} | {doc.text[:80]}...")
@@ -0,0 +1,112 @@
+# In-process metrics registry (counters, gauges, latency histograms)
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List
+
+
+def metric_name(name: str, **labels: Any) -> str:
+    """Build a Prometheus-style series name, e.g. llm_latency_seconds{model="gpt-4"}"""
+    if not labels:
+        return name
+    label_str = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Metrics:
+    """
+    Thread-safe metrics registry.
+
+    Histograms keep running count/sum plus a bounded window of recent samples
+    for percentiles, so memory stays constant under sustained load.
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = defaultdict(float)
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[metric_name(name, **labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[metric_name(name, **labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels: Any) -> None:
+        """Move a gauge up or down"""
+        with self._lock:
+            self._gauges[metric_name(name, **labels)] += delta
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a histogram sample (typically a latency in seconds)"""
+        key = metric_name(name, **labels)
+        with self._lock:
+            self._samples[key].append(value)
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += value
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._counters.get(metric_name(name, **labels), 0.0)
+
+    def get_gauge(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            return self._gauges.get(metric_name(name, **labels), 0.0)
+
+    def get_sample_count(self, name: str, **labels: Any) -> int:
+        """Number of samples currently in the histogram window"""
+        with self._lock:
+            return len(self._samples.get(metric_name(name, **labels), ()))
+
+    def get_percentile(self, name: str, pct: float, **labels: Any) -> float:
+        """Percentile over the recent sample window (0.0 if no samples)"""
+        with self._lock:
+            samples = sorted(self._samples.get(metric_name(name, **labels), ()))
+        return _percentile(samples, pct)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all metrics as a JSON-serializable dict"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+            totals = {key: tuple(values) for key, values in self._totals.items()}
+
+        histograms = {}
+        for key, values in samples.items():
+            count, total = totals[key]
+            histograms[key] = {
+                "count": int(count),
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+            }
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def reset(self) -> None:
+        """Clear everything (used by scripts between benchmark runs)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+            self._totals.clear()
+
+
+metrics = Metrics()
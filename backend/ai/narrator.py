@@ -1,15 +1,27 @@
 # Narrator module - Pass B: Markdown narrative generation
-from openai import OpenAI
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple
+from app.config import settings
+from .llm import create_chat_completion
 from .models import PlannerOutput, NarratorOutput
+from .metrics import metrics
+from .planner import _format_context as format_planner_context, build_intent_messages
+from .prompt_builder import (
+    build_messages, fit_turn_sections, format_location_context, format_relevant_facts, record_prompt_tokens,
+    tokens_left
+)
+from .prompts import FAST_TURN_INSTRUCTIONS, NARRATOR_INSTRUCTIONS, PLAN_MARKER
 import re
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 def narrate_turn(
-    openai_client: OpenAI,
-    system_prompt: str,
+    openai_client: "OpenAI",
+    relevant_facts: str,
     validated_plan: PlannerOutput,
-    context_snapshot: Dict[str, Any]
+    context_snapshot: Dict[str, Any],
+    model: Optional[str] = None
 ) -> NarratorOutput:
     """
     Generate Markdown-formatted narrative prose.
@@ -19,32 +31,23 @@ def narrate_turn(
     
     Args:
         openai_client: OpenAI client instance
-        system_prompt: System prompt template
+        relevant_facts: Packed facts from memory retrieval
         validated_plan: Validated plan from Pass A
         context_snapshot: Current game state snapshot
+        model: Chat model to use (defaults to settings.NARRATOR_MODEL)
     
     Returns:
         NarratorOutput with Markdown narrative
     """
-    composed_prompt = f"""{system_prompt}
-
-[VALIDATED_PLAN]
-{validated_plan.model_dump_json(indent=2)}
-
-[CONTEXT]
-{_format_context(context_snapshot)}
-
-Generate a Markdown-formatted narrative following the formatting rules.
-Must start with ### Scene Header.
-End with **Next actions:** section with suggested commands.
-"""
+    messages = _build_narrator_messages(relevant_facts, validated_plan, context_snapshot)
+    record_prompt_tokens("narrator", messages)
     
-    response = openai_client.chat.completions.create(
-        model="gpt-4-turbo-preview",
+    response = create_chat_completion(
+        openai_client,
+        "narrator",
+        model=model or settings.NARRATOR_MODEL,
         temperature=0.6,
-        messages=[
-            {"role": "system", "content": composed_prompt}
-        ],
+        messages=messages,
     )
     
     markdown_text = response.choices[0].message.content
@@ -58,12 +61,32 @@ End with **Next actions:** section with suggested commands.
     )
 
 
+def _build_narrator_messages(
+    relevant_facts: str,
+    validated_plan: PlannerOutput,
+    context_snapshot: Dict[str, Any]
+) -> List[Dict[str, str]]:
+    """
+    Static prefix first, then this turn's facts, plan and context, fitted
+    into the prompt budget: the plan is sent in full (its free-text notes
+    are dropped first if it crowds out the context), then context, then facts.
+    """
+    context = _format_context(context_snapshot)
+    plan_section = f"[VALIDATED_PLAN]\n{validated_plan.model_dump_json()}\n\n[CONTEXT]\n"
+    if validated_plan.notes and tokens_left(NARRATOR_INSTRUCTIONS, plan_section, context) < 0:
+        metrics.inc("prompt_lines_dropped_total", stage="narrator", section="plan_notes")
+        plan = validated_plan.model_copy(update={"notes": ""})
+        plan_section = f"[VALIDATED_PLAN]\n{plan.model_dump_json()}\n\n[CONTEXT]\n"
+    context, facts = fit_turn_sections("narrator", NARRATOR_INSTRUCTIONS, plan_section, context, relevant_facts)
+    return build_messages(NARRATOR_INSTRUCTIONS, f"{format_relevant_facts(facts)}\n{plan_section}{context}\n")
+
+
 def _format_context(snapshot: Dict[str, Any]) -> str:
     """Format context snapshot for prompt"""
     lines = []
     if "player" in snapshot:
         lines.append(f"Player: {snapshot['player'].get('profile_name', 'Unknown')}")
-        lines.append(f"Current Location: {snapshot['player'].get('current_location_id', 'Unknown')}")
+        lines.extend(format_location_context(snapshot["player"].get("current_location_id")))
     if "inventory" in snapshot:
         inventory = snapshot['inventory']
         if isinstance(inventory, list):
@@ -106,10 +129,11 @@ def _extract_next_actions(markdown: str) -> List[str]:
 
 
 def narrate_turn_streaming(
-    openai_client: OpenAI,
-    system_prompt: str,
+    openai_client: "OpenAI",
+    relevant_facts: str,
     validated_plan: PlannerOutput,
-    context_snapshot: Dict[str, Any]
+    context_snapshot: Dict[str, Any],
+    model: Optional[str] = None
 ):
     """
     Generate Markdown-formatted narrative prose with streaming.
@@ -118,37 +142,112 @@ def narrate_turn_streaming(
     
     Args:
         openai_client: OpenAI client instance
-        system_prompt: System prompt template
+        relevant_facts: Packed facts from memory retrieval
         validated_plan: Validated plan from Pass A
         context_snapshot: Current game state snapshot
+        model: Chat model to use (defaults to settings.NARRATOR_MODEL)
     
     Yields:
         str: Chunks of markdown text as they're generated
     """
-    composed_prompt = f"""{system_prompt}
-
-[VALIDATED_PLAN]
-{validated_plan.model_dump_json(indent=2)}
-
-[CONTEXT]
-{_format_context(context_snapshot)}
-
-Generate a Markdown-formatted narrative following the formatting rules.
-Must start with ### Scene Header.
-End with **Next actions:** section with suggested commands.
-"""
+    messages = _build_narrator_messages(relevant_facts, validated_plan, context_snapshot)
+    record_prompt_tokens("narrator", messages)
     
-    stream = openai_client.chat.completions.create(
-        model="gpt-4-turbo-preview",
+    stream = create_chat_completion(
+        openai_client,
+        "narrator",
+        model=model or settings.NARRATOR_MODEL,
         temperature=0.6,
-        messages=[
-            {"role": "system", "content": composed_prompt}
-        ],
+        messages=messages,
         stream=True,  # Enable streaming
+        stream_options={"include_usage": True},  # final chunk carries usage (cached tokens)
     )
     
     for chunk in stream:
-        if chunk.choices[0].delta.content:
+        # The usage chunk has no choices
+        if chunk.choices and chunk.choices[0].delta.content:
             content = chunk.choices[0].delta.content
             yield content
 
+
+def narrate_fast_turn_streaming(
+    openai_client: "OpenAI",
+    relevant_facts: str,
+    player_intent: str,
+    context_snapshot: Dict[str, Any],
+    model: Optional[str] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    Narrate and plan a low-risk turn in a single streamed call.
+    
+    The model writes the narration first and then a [PLAN] block with the
+    JSON plan. Narration is yielded as it arrives; the plan block is held
+    back and yielded once at the end for the caller to validate.
+    
+    Args:
+        openai_client: OpenAI client instance
+        relevant_facts: Packed facts from memory retrieval
+        player_intent: Player's command/intent
+        context_snapshot: Current game state snapshot
+        model: Chat model to use (defaults to settings.NARRATOR_MODEL)
+    
+    Yields:
+        ("chunk", markdown text) pieces, then a single ("plan", raw plan text)
+    """
+    # Same context as the planner, since this call plans too
+    messages = build_intent_messages(
+        "fast_turn", FAST_TURN_INSTRUCTIONS, relevant_facts, player_intent, format_planner_context(context_snapshot)
+    )
+    record_prompt_tokens("fast_turn", messages)
+    
+    stream = create_chat_completion(
+        openai_client,
+        "fast_turn",
+        model=model or settings.NARRATOR_MODEL,
+        temperature=0.6,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    
+    pending = ""
+    plan_text = None
+    for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        content = chunk.choices[0].delta.content
+        if plan_text is not None:
+            plan_text += content
+            continue
+        
+        pending += content
+        marker_at = pending.find(PLAN_MARKER)
+        if marker_at >= 0:
+            plan_text = pending[marker_at + len(PLAN_MARKER):]
+            pending = pending[:marker_at].rstrip()
+            if pending:
+                yield "chunk", pending
+            continue
+        
+        # Hold back a tail that could be the start of a split marker
+        safe = len(pending) - (len(PLAN_MARKER) - 1)
+        if safe > 0:
+            yield "chunk", pending[:safe]
+            pending = pending[safe:]
+    
+    if plan_text is None and pending:
+        yield "chunk", pending
+    yield "plan", plan_text or ""
+
+
+def parse_plan_block(plan_text: str) -> PlannerOutput:
+    """
+    Parse the plan block of a fast turn.
+    
+    Raises:
+        ValueError: If there is no plan or it doesn't match the schema
+    """
+    match = re.search(r"\{.*\}", plan_text, re.DOTALL)  # tolerate ```json fences
+    if not match:
+        raise ValueError("Fast turn returned no plan")
+    return PlannerOutput.model_validate_json(match.group(0))
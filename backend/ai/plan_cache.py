@@ -0,0 +1,131 @@
+# Planner output cache - reuse plans for repeated intents in identical game states
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.config import settings
+from db.location_cards import location_card_digest
+from .metrics import metrics
+from .models import PlannerOutput
+from .prompts import PROMPT_VERSION
+
+
+def normalize_intent(player_intent: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    intent = re.sub(r"\s+", " ", player_intent.strip().lower())
+    return intent.rstrip(".!?")
+
+
+def state_fingerprint(snapshot: Dict[str, Any]) -> List[Any]:
+    """
+    The parts of the game state a plan depends on: everything the planner's
+    [CONTEXT] section shows (location and the contents of its card, player
+    name, inventory set, number of seen entities)
+    """
+    player = snapshot.get("player", {})
+    location_id = player.get("current_location_id")
+    inventory = sorted(
+        item.get("item_id", "") if isinstance(item, dict) else str(item)
+        for item in snapshot.get("inventory", []) or []
+    )
+    return [
+        PROMPT_VERSION,
+        location_id,
+        location_card_digest(location_id),
+        player.get("profile_name"),
+        inventory,
+        len(snapshot.get("seen_flags", []) or []),
+    ]
+
+
+def planner_cache_key(player_intent: str, snapshot: Dict[str, Any], relevant_facts: str) -> str:
+    """
+    Canonical hash of everything the plan depends on.
+
+    Covers the normalized intent, the game state (see state_fingerprint()),
+    the retrieved facts and the prompt version, so a change to any of them
+    (or a prompt edit that bumps PROMPT_VERSION) misses the cache.
+    """
+    canonical = orjson.dumps([
+        *state_fingerprint(snapshot),
+        normalize_intent(player_intent),
+        relevant_facts or "",
+    ])
+    return hashlib.sha256(canonical).hexdigest()
+
+
+class PlanCache:
+    """
+    TTL + LRU cache of validated PlannerOutput.
+
+    Safe because planning runs at temperature 0.2 and only plans that passed
+    validate_plan() are stored. Each entry remembers how long the original
+    planner call took so hits can report latency saved.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, PlannerOutput, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[PlannerOutput]:
+        """Return a copy of the cached plan, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                hit = False
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            hit_rate = self.hits / (self.hits + self.misses)
+
+        metrics.set_gauge("planner_cache_hit_rate", hit_rate)
+        if not hit:
+            metrics.inc("planner_cache_misses_total")
+            return None
+
+        _, plan, planner_seconds = entry
+        metrics.inc("planner_cache_hits_total")
+        metrics.inc("planner_cache_saved_seconds_total", planner_seconds)
+        return plan.model_copy(deep=True)
+
+    def put(self, key: str, plan: PlannerOutput, planner_seconds: float) -> None:
+        """Store a validated plan and the latency it took to produce"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, plan.model_copy(deep=True), planner_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+plan_cache = PlanCache(
+    ttl_seconds=settings.PLANNER_CACHE_TTL_SECONDS,
+    max_entries=settings.PLANNER_CACHE_MAX_ENTRIES,
+)
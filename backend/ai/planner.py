@@ -1,14 +1,23 @@
 # Planner module - Pass A: Structured planning
-from openai import OpenAI
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from app.config import settings
+from .llm import create_chat_completion
 from .models import PlannerOutput
+from .prompt_builder import (
+    build_messages, fit_turn_sections, format_location_context, format_relevant_facts, record_prompt_tokens
+)
+from .prompts import PLANNER_INSTRUCTIONS
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 def plan_turn(
-    openai_client: OpenAI,
-    system_prompt: str,
+    openai_client: "OpenAI",
+    relevant_facts: str,
     player_intent: str,
-    context_snapshot: Dict[str, Any]
+    context_snapshot: Dict[str, Any],
+    model: Optional[str] = None
 ) -> PlannerOutput:
     """
     Generate a structured plan for the player's turn.
@@ -18,50 +27,53 @@ def plan_turn(
     
     Args:
         openai_client: OpenAI client instance
-        system_prompt: System prompt template
+        relevant_facts: Packed facts from memory retrieval
         player_intent: Player's command/intent
         context_snapshot: Current game state snapshot
+        model: Chat model to use (defaults to settings.PLANNER_MODEL)
     
     Returns:
         PlannerOutput with structured plan
     """
-    prompt = f"""{system_prompt}
-
-[PLAYER_INTENT]
-{player_intent}
-
-[CONTEXT]
-{_format_context(context_snapshot)}
-
-Generate a plan as JSON with:
-- "action": string describing the action
-- "targets": array of entity IDs involved
-- "state_changes": array of {{"entity": "...", "op": "...", "value": ...}}
-- "notes": string with any additional notes
-"""
+    messages = build_intent_messages(
+        "planner", PLANNER_INSTRUCTIONS, relevant_facts, player_intent, _format_context(context_snapshot)
+    )
+    record_prompt_tokens("planner", messages)
     
-    response = openai_client.chat.completions.create(
-        model="gpt-4-turbo-preview",
+    response = create_chat_completion(
+        openai_client,
+        "planner",
+        model=model or settings.PLANNER_MODEL,
         temperature=0.2,
         response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": prompt}
-        ],
+        messages=messages,
     )
     
     json_content = response.choices[0].message.content
     return PlannerOutput.model_validate_json(json_content)
 
 
+def build_intent_messages(
+    stage: str,
+    instructions: str,
+    relevant_facts: str,
+    player_intent: str,
+    context: str
+) -> List[Dict[str, str]]:
+    """Messages for a stage that plans from the player's intent, fitted into the prompt budget"""
+    intent_section = f"[PLAYER_INTENT]\n{player_intent}\n\n[CONTEXT]\n"
+    context, facts = fit_turn_sections(stage, instructions, intent_section, context, relevant_facts)
+    return build_messages(instructions, f"{format_relevant_facts(facts)}\n{intent_section}{context}\n")
+
+
 def _format_context(snapshot: Dict[str, Any]) -> str:
     """Format context snapshot for prompt"""
     lines = []
     if "player" in snapshot:
         lines.append(f"Player: {snapshot['player'].get('profile_name', 'Unknown')}")
-        lines.append(f"Location: {snapshot['player'].get('current_location_id', 'Unknown')}")
+        lines.extend(format_location_context(snapshot["player"].get("current_location_id")))
     if "inventory" in snapshot:
         lines.append(f"Inventory: {len(snapshot['inventory'])} items")
     if "seen_flags" in snapshot:
         lines.append(f"Seen: {len(snapshot['seen_flags'])} entities")
     return "\n".join(lines)
-
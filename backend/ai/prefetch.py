@@ -0,0 +1,216 @@
+# Speculative prefetch - plan (and narrate) suggested next actions ahead of time
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from .metrics import metrics
+from .models import NarratorOutput, PlannerOutput
+from .plan_cache import normalize_intent, state_fingerprint
+from .scheduler import TokenBucket, speculative_limiter, use_limiter
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# (expires_at, state fingerprint, relevant facts, plan, narration or None)
+_Entry = Tuple[float, List[Any], str, PlannerOutput, Optional[NarratorOutput]]
+
+
+class SpeculativePrefetcher:
+    """
+    Background planner for the "Next actions" a turn just suggested.
+
+    After each turn the candidate commands are planned (and optionally
+    narrated) against the post-turn snapshot on a small thread pool.
+    Results live in a short-lived per-player cache, keyed by the
+    normalized command and only valid while location and inventory are
+    unchanged. Speculative LLM calls draw from a token bucket so prefetch
+    cost is capped, and take their slots from speculative_limiter rather
+    than the turns' llm_limiter; when the player sends a command, pending
+    work for the other candidates is cancelled and the rest is dropped
+    after the turn.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 120.0,
+        max_actions: int = 3,
+        max_workers: int = 2,
+        calls_per_minute: float = 30.0,
+        narrate: bool = False
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_actions = max_actions
+        self.narrate = narrate
+        self._budget = TokenBucket(rate=calls_per_minute / 60.0, capacity=max(1.0, max_actions * (2 if narrate else 1)))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._entries: Dict[str, Dict[str, _Entry]] = {}
+        self._pending: Dict[str, Dict[str, Tuple[Future, threading.Event]]] = {}
+        self._lock = threading.Lock()
+
+    def schedule(
+        self,
+        openai_client: "OpenAI",
+        player_id: str,
+        next_actions: List[str],
+        snapshot: Dict[str, Any]
+    ) -> int:
+        """
+        Start prefetching a turn's suggested actions, replacing older ones.
+
+        Args:
+            openai_client: OpenAI client instance
+            player_id: Player the actions were suggested to
+            next_actions: Commands from the narration's Next actions list
+            snapshot: Post-turn game state snapshot
+
+        Returns:
+            Number of actions scheduled
+        """
+        self.cancel(player_id)
+        candidates = list(dict.fromkeys(normalize_intent(a) for a in next_actions if a.strip()))
+        candidates = candidates[:self.max_actions]
+        snapshot = _copy_snapshot(snapshot)
+
+        with self._lock:
+            pending = self._pending.setdefault(player_id, {})
+            for action in candidates:
+                cancelled = threading.Event()
+                future = self._executor.submit(
+                    self._prefetch, openai_client, player_id, action, snapshot, cancelled
+                )
+                pending[action] = (future, cancelled)
+        metrics.inc("prefetch_scheduled_total", len(candidates))
+        return len(candidates)
+
+    def claim(
+        self,
+        player_id: str,
+        player_intent: str,
+        snapshot: Dict[str, Any]
+    ) -> Optional[Tuple[str, PlannerOutput]]:
+        """
+        The player sent a command: cancel prefetches for every other
+        candidate and return the prefetched plan for this one, if ready.
+
+        Returns:
+            (relevant facts, plan copy) or None
+        """
+        action = normalize_intent(player_intent)
+        self.cancel(player_id, keep=action)
+        entry = self._get(player_id, action, snapshot)
+        if entry is None:
+            metrics.inc("prefetch_misses_total")
+            return None
+
+        metrics.inc("prefetch_hits_total", kind="narration" if entry[4] is not None else "plan")
+        return entry[2], entry[3].model_copy(deep=True)
+
+    def narration(
+        self,
+        player_id: str,
+        player_intent: str,
+        snapshot: Dict[str, Any],
+        plan: PlannerOutput
+    ) -> Optional[NarratorOutput]:
+        """Prefetched narration for a claimed command, only if it narrates this plan"""
+        entry = self._get(player_id, normalize_intent(player_intent), snapshot)
+        if entry is None or entry[4] is None or entry[3] != plan:
+            return None
+        return entry[4].model_copy(deep=True)
+
+    def cancel(self, player_id: str, keep: Optional[str] = None) -> None:
+        """Drop a player's pending and cached prefetches, except the ``keep`` action"""
+        with self._lock:
+            pending = self._pending.get(player_id, {})
+            entries = self._entries.get(player_id, {})
+            dropped = [action for action in pending if action != keep]
+            jobs = [pending.pop(action) for action in dropped]
+            for action in [action for action in entries if action != keep]:
+                del entries[action]
+
+        cancelled = 0
+        for future, cancel_event in jobs:
+            cancel_event.set()
+            cancelled += future.cancel() or future.running()
+        if cancelled:
+            metrics.inc("prefetch_cancelled_total", cancelled)
+
+    def _get(self, player_id: str, action: str, snapshot: Dict[str, Any]) -> Optional[_Entry]:
+        with self._lock:
+            entries = self._entries.get(player_id, {})
+            entry = entries.get(action)
+            if entry is not None and (entry[0] < time.monotonic() or entry[1] != state_fingerprint(snapshot)):
+                del entries[action]
+                entry = None
+            return entry
+
+    def _spend(self) -> bool:
+        """Take one speculative LLM call from the cost budget"""
+        if self._budget.try_acquire() > 0:
+            metrics.inc("prefetch_skipped_total", reason="budget")
+            return False
+        metrics.inc("prefetch_llm_calls_total")
+        return True
+
+    def _prefetch(
+        self,
+        openai_client: "OpenAI",
+        player_id: str,
+        action: str,
+        snapshot: Dict[str, Any],
+        cancelled: threading.Event
+    ) -> None:
+        # Imported here: the context engine consults this module on every turn
+        from .context_engine import plan_with_caches
+        from .narrator import narrate_turn
+        from .routing import route_model
+
+        try:
+            if cancelled.is_set() or not self._spend():
+                return
+            with use_limiter(speculative_limiter):
+                relevant_facts, plan = plan_with_caches(openai_client, action, snapshot)
+
+                narration = None
+                if self.narrate and not cancelled.is_set() and self._spend():
+                    model = route_model("narrator", action)
+                    narration = narrate_turn(openai_client, relevant_facts, plan, snapshot, model=model)
+
+            with self._lock:
+                if cancelled.is_set():
+                    metrics.inc("prefetch_skipped_total", reason="cancelled")
+                    return
+                self._entries.setdefault(player_id, {})[action] = (
+                    time.monotonic() + self.ttl_seconds,
+                    state_fingerprint(snapshot),
+                    relevant_facts,
+                    plan,
+                    narration,
+                )
+        except Exception as exc:
+            metrics.inc("prefetch_failures_total")
+            print(f"Prefetch of {action!r} for {player_id} failed: {exc}", flush=True)
+        finally:
+            with self._lock:
+                pending = self._pending.get(player_id, {})
+                if action in pending and pending[action][1] is cancelled:
+                    del pending[action]
+
+
+def _copy_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Shallow-copy the parts a turn may mutate so background work sees a stable state"""
+    copied = dict(snapshot)
+    if isinstance(copied.get("player"), dict):
+        copied["player"] = dict(copied["player"])
+    return copied
+
+
+prefetcher = SpeculativePrefetcher(
+    ttl_seconds=settings.PREFETCH_TTL_SECONDS,
+    max_actions=settings.PREFETCH_MAX_ACTIONS,
+    max_workers=settings.PREFETCH_MAX_WORKERS,
+    calls_per_minute=settings.PREFETCH_MAX_CALLS_PER_MINUTE,
+    narrate=settings.PREFETCH_NARRATION,
+)
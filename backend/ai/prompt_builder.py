@@ -0,0 +1,175 @@
+# Token-budgeted prompt assembly
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character heuristic
+    tiktoken = None
+
+from app.config import settings
+from db.location_cards import get_location_card
+from .metrics import metrics
+from .prompts import RELEVANT_FACTS_TEMPLATE, SYSTEM_PROMPT
+
+NO_FACTS = "(No relevant facts found)"
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count prompt tokens locally.
+
+    Uses tiktoken's cl100k_base encoding (GPT-4 family), a declared
+    dependency; without it (e.g. a trimmed-down install) the ~4 characters
+    per token estimate is close enough for budgeting English prompts.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def fact_priority(fact: Dict[str, Any]) -> float:
+    """Re-ranked score if retrieval computed one, else similarity boosted by the doc's importance"""
+    if "rank_score" in fact:
+        return fact["rank_score"]
+    return fact.get("score", 0.0) + settings.PROMPT_FACT_IMPORTANCE_WEIGHT * fact.get("importance", 0)
+
+
+def pack_facts(facts: List[Dict[str, Any]], budget_tokens: int) -> str:
+    """
+    Pack retrieved facts into a token budget.
+
+    Facts are taken in priority order (relevance plus importance) and each
+    one is kept only if it still fits, so a single long fact can't crowd out
+    several short relevant ones.
+
+    Args:
+        facts: Facts from retrieve_facts()
+        budget_tokens: Maximum tokens for the facts section
+
+    Returns:
+        Fact texts one per line, highest priority first (empty string if
+        none fit), for each stage to trim further with fit_turn_sections()
+    """
+    packed = []
+    used = 0
+    for fact in sorted(facts, key=fact_priority, reverse=True):
+        text = " ".join(fact["text"].split())  # one line per fact
+        cost = count_tokens(text) + 1  # newline separator
+        if used + cost > budget_tokens:
+            metrics.inc("prompt_facts_dropped_total")
+            continue
+        packed.append(text)
+        used += cost
+    return "\n".join(packed)
+
+
+def tokens_left(instructions: str, *turn_parts: str) -> int:
+    """PROMPT_TOKEN_BUDGET minus a stage's static prefix and the given per-turn parts (may be negative)"""
+    used = sum(count_tokens(part) for part in (SYSTEM_PROMPT, instructions) + turn_parts)
+    return settings.PROMPT_TOKEN_BUDGET - used
+
+
+def fit_lines(text: str, budget_tokens: int, stage: str, section: str) -> str:
+    """
+    Keep the lines of a section (ordered most important first) that fit in
+    budget_tokens. A line that doesn't fit is dropped and later, shorter
+    ones may still fit; drops are counted in prompt_lines_dropped_total.
+    """
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1  # newline separator
+        if used + cost > budget_tokens:
+            metrics.inc("prompt_lines_dropped_total", stage=stage, section=section)
+            continue
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def fit_turn_sections(stage: str, instructions: str, fixed: str, context: str, facts: str) -> Tuple[str, str]:
+    """
+    Fit a stage's context and facts sections into PROMPT_TOKEN_BUDGET by priority.
+
+    The static prefix and ``fixed`` (the intent or plan, with the section
+    headers) are always sent in full. Context lines come next, up to
+    PROMPT_CONTEXT_TOKEN_BUDGET, and facts get what is left, up to
+    PROMPT_FACTS_TOKEN_BUDGET; both are ordered most important first, and
+    the lowest-priority lines are dropped.
+
+    Args:
+        stage: Pipeline stage, for metrics
+        instructions: The stage's static instructions
+        fixed: Per-turn text that can't be trimmed
+        context: Context section, one line per entry
+        facts: Packed facts (see pack_facts())
+
+    Returns:
+        Tuple of (context, facts) to send
+    """
+    remaining = tokens_left(instructions, fixed, RELEVANT_FACTS_TEMPLATE.format(relevant_facts=""))
+    context = fit_lines(context, max(0, min(settings.PROMPT_CONTEXT_TOKEN_BUDGET, remaining)), stage, "context")
+    remaining -= count_tokens(context)
+    facts = fit_lines(facts, max(0, min(settings.PROMPT_FACTS_TOKEN_BUDGET, remaining)), stage, "facts")
+    return context, facts
+
+
+def format_relevant_facts(relevant_facts: str) -> str:
+    """Render (already packed) facts as the [RELEVANT FACTS] section"""
+    return RELEVANT_FACTS_TEMPLATE.format(relevant_facts=relevant_facts if relevant_facts else NO_FACTS)
+
+
+def build_messages(instructions: str, turn_content: str) -> List[Dict[str, str]]:
+    """
+    Lay out a stage's chat messages with the static prefix first.
+
+    SYSTEM_PROMPT and the stage instructions never change between turns, so
+    they form a byte-identical prefix the provider can cache. Everything that
+    varies per turn (facts, intent, plan, context) goes in the final message.
+
+    Args:
+        instructions: Static instructions for the stage
+        turn_content: Per-turn sections
+
+    Returns:
+        Messages for ``chat.completions.create``
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": turn_content},
+    ]
+
+
+def format_location_context(location_id: Optional[str]) -> List[str]:
+    """
+    Context lines for the player's location from its cached context card:
+    name, atmosphere, characters and items present, and exits. Exits carry
+    their ids so plans can name a destination.
+    """
+    card = get_location_card(location_id)
+    if card is None:
+        return [f"Location: {location_id or 'Unknown'}"]
+
+    lines = [f"Location: {card['name']} ({card['id']})"]
+    if card["atmosphere"]:
+        lines.append(f"Atmosphere: {card['atmosphere']}")
+    for label, key in (("Characters here", "characters"), ("Items here", "items"), ("Exits", "exits")):
+        if card[key]:
+            lines.append(f"{label}: " + ", ".join(f"{e['name'] or e['id']} ({e['id']})" for e in card[key]))
+    return lines
+
+
+def record_prompt_tokens(stage: str, messages: List[Dict[str, str]]) -> int:
+    """Count a stage's prompt and export it as a metric"""
+    tokens = sum(count_tokens(message["content"]) for message in messages)
+    metrics.observe("prompt_tokens", tokens, stage=stage)
+    return tokens
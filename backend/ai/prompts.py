@@ -1,4 +1,10 @@
 # AI prompt templates
+
+# Bump whenever a prompt changes so cached planner outputs are invalidated
+PROMPT_VERSION = "4"
+
+# Static prefix shared by every call. Keep it free of per-turn content so it
+# stays byte-identical and the provider can serve it from its prompt cache.
 SYSTEM_PROMPT = """You are the Narrator of a Victorian detective text adventure.
 Voice: Doyle‑inspired, concise, modern readability.
 Always respond in **valid Markdown**.
@@ -14,9 +20,58 @@ End every turn with:
 **Next actions:**
 - [suggested command 1]
 - [suggested command 2]
+"""
+
+# Per-stage instructions, also static: sent right after SYSTEM_PROMPT
+PLANNER_INSTRUCTIONS = """Plan the player's turn from the facts, intent and context in the next message.
+
+Generate a plan as JSON with:
+- "action": string describing the action
+- "targets": array of entity IDs involved
+- "state_changes": array of {"entity": "...", "op": "...", "value": ...}
+- "notes": string with any additional notes
 
-[RELEVANT FACTS]
+To move the player, use {"entity": "player", "op": "set", "value": {"current_location_id": "..."}}
+with one of the listed exits; the player can only move one exit at a time.
+"""
+
+NARRATOR_INSTRUCTIONS = """Narrate the validated plan in the next message.
+
+Generate a Markdown-formatted narrative following the formatting rules.
+Must start with ### Scene Header.
+End with **Next actions:** section with suggested commands.
+"""
+
+# Marks the end of the narration and the start of the plan in a fast turn
+PLAN_MARKER = "[PLAN]"
+
+FAST_TURN_INSTRUCTIONS = """Narrate the player's intent from the facts and context in the next message, then plan it.
+
+First generate a Markdown-formatted narrative following the formatting rules.
+Must start with ### Scene Header.
+End with **Next actions:** section with suggested commands.
+
+Then output a line containing only [PLAN], followed by the plan as JSON with:
+- "action": string describing the action
+- "targets": array of entity IDs involved
+- "state_changes": array of {"entity": "...", "op": "...", "value": ...}
+- "notes": string with any additional notes
+
+To move the player, use {"entity": "player", "op": "set", "value": {"current_location_id": "..."}}
+with one of the listed exits; the player can only move one exit at a time.
+"""
+
+# Variable content: always goes in the last message, after the static prefix
+RELEVANT_FACTS_TEMPLATE = """[RELEVANT FACTS]
 {relevant_facts}
 """
 
+# Transcript summarizer (background, not part of a turn's prompt prefix)
+SUMMARIZER_INSTRUCTIONS = """You keep the case notes of a Victorian detective text adventure.
 
+Condense the player's turns in the next message into a short third-person summary
+(at most 120 words) of what the player did, learned and decided, and who and what
+they met. Keep names, places, items and clues exact. Leave out atmosphere, the
+suggested next actions and anything that didn't happen.
+Plain prose only, no Markdown.
+"""
@@ -0,0 +1,429 @@
+# Bulk reindexing - streams memory docs through batched, rate-limited embedding into a new FAISS index
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.config import settings
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+from . import memory
+from .embeddings import get_embedding_backend
+from .metrics import metrics
+from .prompt_builder import count_tokens
+from .resilience import CircuitBreaker, RetryPolicy, call_with_resilience
+from .scheduler import TokenBucket
+
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
+
+# The embeddings API rejects longer inputs (text-embedding-3 models)
+EMBED_MAX_INPUT_TOKENS = 8191
+
+# Seconds between progress lines
+PROGRESS_SECONDS = 5.0
+
+# Separate from the chat breaker: a bulk run shouldn't shed player turns
+embeddings_breaker = CircuitBreaker(
+    "openai_embeddings",
+    failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.LLM_BREAKER_RESET_SECONDS,
+)
+
+EmbedFn = Callable[[List[str], float], "np.ndarray"]
+
+
+def iter_docs(after_id: int = 0, page_size: int = 1000) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (id, text) of every non-stale memory doc after ``after_id``, in id order.
+
+    Reads a page at a time with a fresh session, so no transaction stays
+    open while batches are being embedded.
+    """
+    while True:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(MemoryDoc.id, MemoryDoc.text)
+                .filter(MemoryDoc.stale == False, MemoryDoc.id > after_id)
+                .order_by(MemoryDoc.id)
+                .limit(page_size)
+                .all()
+            )
+        finally:
+            db.close()
+        if not rows:
+            return
+        for doc_id, text in rows:
+            yield doc_id, text
+        after_id = rows[-1][0]
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens (by count_tokens()), at a word boundary where possible"""
+    tokens = count_tokens(text)
+    while tokens > max_tokens:
+        cut = text[:max(1, int(len(text) * max_tokens / tokens * 0.98))]
+        text = cut.rsplit(" ", 1)[0] if " " in cut else cut
+        tokens = count_tokens(text)
+    return text
+
+
+def batch_by_tokens(
+    docs: Iterable[Tuple[int, str]],
+    max_tokens: int,
+    max_docs: int,
+    max_input_tokens: int = EMBED_MAX_INPUT_TOKENS
+) -> Iterator[Tuple[List[int], List[str], int]]:
+    """
+    Group docs into embedding requests bounded by token count and size.
+
+    Args:
+        docs: (doc id, text) pairs
+        max_tokens: Token budget per request
+        max_docs: Inputs per request
+        max_input_tokens: Longer texts are truncated to this many tokens
+
+    Yields:
+        (doc ids, texts, token count) per request
+    """
+    max_input_tokens = min(max_input_tokens, max_tokens)
+    doc_ids: List[int] = []
+    texts: List[str] = []
+    batch_tokens = 0
+    for doc_id, text in docs:
+        text = " ".join((text or "").split()) or "(empty)"  # the API rejects empty inputs
+        tokens = count_tokens(text)
+        if tokens > max_input_tokens:
+            text = truncate_tokens(text, max_input_tokens)
+            tokens = count_tokens(text)
+            metrics.inc("reindex_truncated_docs_total")
+        if doc_ids and (batch_tokens + tokens > max_tokens or len(doc_ids) >= max_docs):
+            yield doc_ids, texts, batch_tokens
+            doc_ids, texts, batch_tokens = [], [], 0
+        doc_ids.append(doc_id)
+        texts.append(text)
+        batch_tokens += tokens
+    if doc_ids:
+        yield doc_ids, texts, batch_tokens
+
+
+class BulkReindexer:
+    """
+    Rebuilds the FAISS index from every non-stale memory doc without holding
+    the corpus in memory.
+
+    Docs are read from the database a page at a time in id order and
+    grouped into requests bounded by ``batch_max_tokens`` and
+    ``batch_max_docs``. Up to ``concurrency`` requests are in flight at
+    once; each (and each retry) first takes from a requests-per-minute and
+    a tokens-per-minute bucket so bulk runs stay under the account's
+    embeddings limits. Transient failures are retried with backoff.
+
+    Vectors are shortened to EMBED_DIMENSIONS and encoded as
+    EMBED_QUANTIZATION (see memory.new_index(); an int8 index first buffers
+    a training sample). Results are added to the new index in doc id order
+    as they arrive, so the index always covers a prefix of the corpus. Every
+    ``checkpoint_seconds`` (and when a run fails or is interrupted) that
+    prefix is written beside the live index; the next run resumes after its
+    last doc. The live index is only replaced, atomically, once every doc
+    is embedded.
+    """
+
+    def __init__(
+        self,
+        batch_max_tokens: int = 20000,
+        batch_max_docs: int = 256,
+        concurrency: int = 4,
+        requests_per_minute: float = 3000.0,
+        tokens_per_minute: float = 1000000.0,
+        checkpoint_seconds: float = 30.0,
+        timeout: float = 60.0,
+        max_retries: int = 5,
+        embed_fn: Optional[EmbedFn] = None,
+        embed_model: Optional[str] = None,
+        dimensions: int = 0,
+        quantization: str = "none"
+    ):
+        self.batch_max_tokens = batch_max_tokens
+        self.batch_max_docs = batch_max_docs
+        self.concurrency = max(1, concurrency)
+        self.checkpoint_seconds = checkpoint_seconds
+        self.timeout = timeout
+        self.embed_fn = embed_fn
+        self.embed_model = embed_model or get_embedding_backend().model
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self._requests = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1.0, requests_per_minute / 6.0))
+        # A batch must fit in the bucket or acquiring it would never succeed
+        self._tokens = TokenBucket(
+            rate=tokens_per_minute / 60.0, capacity=max(float(batch_max_tokens), tokens_per_minute / 6.0)
+        )
+        self._retry_policy = RetryPolicy(
+            max_retries=max_retries,
+            base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+        )
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "BulkReindexer":
+        options = dict(
+            batch_max_tokens=settings.REINDEX_BATCH_MAX_TOKENS,
+            batch_max_docs=settings.REINDEX_BATCH_MAX_DOCS,
+            concurrency=settings.REINDEX_CONCURRENCY,
+            requests_per_minute=settings.EMBED_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.EMBED_TOKENS_PER_MINUTE,
+            checkpoint_seconds=settings.REINDEX_CHECKPOINT_SECONDS,
+            timeout=settings.REINDEX_TIMEOUT_SECONDS,
+            max_retries=settings.REINDEX_MAX_RETRIES,
+            dimensions=settings.EMBED_DIMENSIONS,
+            quantization=settings.EMBED_QUANTIZATION,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    @staticmethod
+    def checkpoint_paths() -> Tuple[Path, Path, Path, Path]:
+        """(partial index, partial doc id table, partial float vectors, checkpoint metadata), beside the live index"""
+        data = memory.INDEX_PATH.parent
+        return (
+            data / "reindex.partial.index",
+            data / "reindex.partial_doc_ids.npy",
+            data / "reindex.partial_vectors.f32",
+            data / "reindex.checkpoint.json",
+        )
+
+    def run(self, resume: bool = True) -> Optional["faiss.Index"]:
+        """
+        Embed every non-stale memory doc into a new index and swap it in.
+
+        Args:
+            resume: Continue from a checkpoint left by an earlier run (if it
+                used the same model, dimensions and quantization); otherwise
+                start over
+
+        Returns:
+            The new index, or None if there are no docs to index
+
+        Raises:
+            Exception: The first batch that failed for good; progress up to
+                it is checkpointed
+        """
+        embed_fn = self.embed_fn or self._default_embed_fn()
+        index, doc_ids = self._load_checkpoint() if resume else (None, [])
+        if index is None:
+            self.clear_checkpoint()
+            doc_ids = []
+        else:
+            print(f"Resuming reindex after {len(doc_ids)} docs (doc id {doc_ids[-1]})", flush=True)
+        total = self._count_docs(doc_ids[-1] if doc_ids else 0) + len(doc_ids)
+        resumed = checkpointed = len(doc_ids)
+        # Float vectors are kept for re-scoring a quantized index
+        _, _, vectors_path, _ = self.checkpoint_paths()
+        vectors_path.parent.mkdir(parents=True, exist_ok=True)
+        vectors_file = open(vectors_path, 'ab') if self.quantization != "none" else None
+        # Batches waiting for enough vectors to create (train) the index
+        pending: List[Tuple[List[int], "np.ndarray"]] = []
+
+        batches = batch_by_tokens(
+            iter_docs(after_id=doc_ids[-1] if doc_ids else 0), self.batch_max_tokens, self.batch_max_docs
+        )
+        in_flight: Deque[Tuple[List[int], Future]] = deque()
+        start = last_checkpoint = last_progress = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="reindex")
+        try:
+            while True:
+                # Queue a little ahead so workers never wait on the tokenizer
+                while len(in_flight) < self.concurrency * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    batch_ids, texts, tokens = batch
+                    in_flight.append((batch_ids, executor.submit(self._embed_batch, embed_fn, texts, tokens)))
+                if not in_flight:
+                    break
+
+                batch_ids, future = in_flight.popleft()
+                pending.append((batch_ids, future.result()))
+                if index is None and self.quantization == "int8" and in_flight and (
+                    sum(len(ids) for ids, _ in pending) < memory.QUANTIZER_TRAIN_SIZE
+                ):
+                    continue
+                index = self._add(index, pending, doc_ids, vectors_file)
+                pending = []
+
+                now = time.monotonic()
+                if now - last_progress >= PROGRESS_SECONDS:
+                    self._report(len(doc_ids), resumed, total, now - start)
+                    last_progress = now
+                if now - last_checkpoint >= self.checkpoint_seconds:
+                    self._save_checkpoint(index, doc_ids, vectors_file)
+                    checkpointed, last_checkpoint = len(doc_ids), time.monotonic()
+        except BaseException:
+            for _, future in in_flight:
+                future.cancel()
+            if index is not None and len(doc_ids) > checkpointed:
+                self._save_checkpoint(index, doc_ids, vectors_file)
+            print(f"Reindex stopped after {len(doc_ids)}/{total} docs; run again to resume", flush=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            if vectors_file is not None:
+                vectors_file.close()
+
+        self._report(len(doc_ids), resumed, total, time.monotonic() - start)
+        if index is not None:
+            with memory.index_write_lock():
+                memory.save_index(index, doc_ids, vectors_path=vectors_path if vectors_file is not None else None)
+        self.clear_checkpoint()
+        return index
+
+    def _add(
+        self,
+        index: Optional["faiss.Index"],
+        batches: List[Tuple[List[int], "np.ndarray"]],
+        doc_ids: List[int],
+        vectors_file
+    ) -> "faiss.Index":
+        """Add embedded batches (in order) to the index, creating it from the first ones"""
+        import numpy as np
+
+        vectors = np.vstack([batch_vectors for _, batch_vectors in batches])
+        if index is None:
+            index = memory.new_index(vectors, self.quantization)
+        elif vectors.shape[1] != index.d:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} doesn't match the index ({index.d})")
+        if vectors_file is not None:
+            vectors.astype("float32").tofile(vectors_file)
+        index.add(memory.index_codes(index, vectors))
+        for batch_ids, _ in batches:
+            doc_ids.extend(batch_ids)
+        metrics.inc("reindex_docs_total", len(vectors))
+        return index
+
+    def _embed_batch(self, embed_fn: EmbedFn, texts: List[str], tokens: int) -> "np.ndarray":
+        """Embed one request's texts under the rate limits, retrying transient failures"""
+        charged = False
+
+        def attempt(timeout: float) -> "np.ndarray":
+            nonlocal charged
+            if charged:  # retries count against the limits too
+                self._acquire(tokens)
+            charged = True
+            return embed_fn(texts, timeout)
+
+        self._acquire(tokens)
+        start = time.monotonic()
+        vectors = call_with_resilience(
+            attempt,
+            stage="embeddings",
+            policy=self._retry_policy,
+            breaker=embeddings_breaker,
+            deadline_seconds=(self.timeout + self._retry_policy.max_delay) * (self._retry_policy.max_retries + 1),
+            attempt_timeout=self.timeout,
+        )
+        if len(vectors) != len(texts):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(texts)} texts")
+        metrics.observe("reindex_batch_seconds", time.monotonic() - start)
+        metrics.inc("reindex_tokens_total", tokens)
+        return vectors
+
+    def _acquire(self, tokens: int) -> None:
+        self._requests.acquire()
+        self._tokens.acquire(tokens)
+
+    def _default_embed_fn(self) -> EmbedFn:
+        # Batches retry through call_with_resilience, not the SDK
+        client = None
+        if get_embedding_backend().name == "openai":
+            client = memory.get_shared_openai_client().with_options(max_retries=0)
+        # Explicit dimensions (0 = full size): the live index's may differ
+        return lambda texts, timeout: memory.embed(
+            texts, openai_client=client, timeout=timeout, dimensions=self.dimensions
+        )
+
+    @staticmethod
+    def _count_docs(after_id: int) -> int:
+        db = SessionLocal()
+        try:
+            return (
+                db.query(func.count(MemoryDoc.id))
+                .filter(MemoryDoc.stale == False, MemoryDoc.id > after_id)
+                .scalar()
+            )
+        finally:
+            db.close()
+
+    @staticmethod
+    def _report(done: int, resumed: int, total: int, elapsed: float) -> None:
+        rate = (done - resumed) / elapsed if elapsed > 0 else 0.0
+        eta = f", ETA {math.ceil((total - done) / rate)}s" if rate > 0 and done < total else ""
+        print(f"  {done}/{total} docs embedded ({done / max(1, total):.0%}), {rate:.0f} docs/s{eta}", flush=True)
+
+    def _config(self) -> dict:
+        return {"embed_model": self.embed_model, "dimensions": self.dimensions, "quantization": self.quantization}
+
+    def _save_checkpoint(self, index: "faiss.Index", doc_ids: List[int], vectors_file=None) -> None:
+        """Write the partial index, its doc ids and vectors, then the metadata that vouches for them"""
+        import numpy as np
+
+        index_path, ids_path, _, meta_path = self.checkpoint_paths()
+        if vectors_file is not None:
+            vectors_file.flush()
+        tmp = index_path.with_name(index_path.name + ".tmp")
+        memory.write_index_file(index, tmp)
+        os.replace(tmp, index_path)
+        tmp = ids_path.with_name(ids_path.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(doc_ids, dtype="int64"))
+        os.replace(tmp, ids_path)
+        tmp = meta_path.with_name(meta_path.name + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(dict(self._config(), docs=len(doc_ids)), f)
+        os.replace(tmp, meta_path)
+        metrics.inc("reindex_checkpoints_total")
+
+    def _load_checkpoint(self) -> Tuple[Optional["faiss.Index"], List[int]]:
+        """The checkpointed partial index and its doc ids, or (None, []) if there's no usable checkpoint"""
+        import faiss
+        import numpy as np
+
+        index_path, ids_path, vectors_path, meta_path = self.checkpoint_paths()
+        if not (index_path.exists() and ids_path.exists() and meta_path.exists()):
+            return None, []
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            config = {key: meta.get(key) for key in self._config()}
+            if config != self._config():
+                print(f"Ignoring reindex checkpoint made with other settings: {config}", flush=True)
+                return None, []
+            index = memory.read_index_file(index_path)
+            doc_ids = np.load(ids_path).tolist()
+        except (OSError, ValueError, RuntimeError) as exc:
+            print(f"Ignoring unreadable reindex checkpoint: {exc}", flush=True)
+            return None, []
+        count = meta["docs"]
+        if count == 0 or index.ntotal < count or len(doc_ids) < count:
+            return None, []
+        if self.quantization != "none":
+            vector_bytes = count * index.d * 4
+            if not vectors_path.exists() or vectors_path.stat().st_size < vector_bytes:
+                return None, []
+            os.truncate(vectors_path, vector_bytes)
+        # Files written after the metadata (an interrupted checkpoint) may run ahead of it
+        if index.ntotal > count:
+            index.remove_ids(faiss.IDSelectorRange(count, index.ntotal))
+        return index, doc_ids[:count]
+
+    def clear_checkpoint(self) -> None:
+        for path in self.checkpoint_paths():
+            if path.exists():
+                path.unlink()
@@ -0,0 +1,173 @@
+# Re-ranking - relevance, importance and recency, then MMR for diversity
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from .lexical import STOPWORDS
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def combined_scores(
+    relevance: "np.ndarray",
+    importance: "np.ndarray",
+    age_hours: "np.ndarray",
+    similarity_weight: float = 1.0,
+    importance_weight: float = 0.0,
+    recency_weight: float = 0.0,
+    half_life_hours: float = 72.0
+) -> "np.ndarray":
+    """
+    Weighted sum of min-max scaled relevance, scaled importance and
+    exponential time decay, divided by the total weight (so scores are 0-1).
+
+    Args:
+        relevance: Retrieval scores (inner product or fused rank score)
+        importance: MemoryDoc importance
+        age_hours: Doc ages in hours (NaN for unknown: no recency credit)
+        similarity_weight, importance_weight, recency_weight: Mix weights
+        half_life_hours: Age at which the recency credit halves (<= 0 disables it)
+
+    Returns:
+        One combined score per candidate
+    """
+    import numpy as np
+
+    relevance = np.asarray(relevance, dtype="float32")
+    spread = relevance.max() - relevance.min() if len(relevance) else 0.0
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+    importance = np.asarray(importance, dtype="float32")
+    importance = importance / max(1.0, float(importance.max())) if len(importance) else importance
+
+    age_hours = np.asarray(age_hours, dtype="float32")
+    if half_life_hours > 0:
+        recency = np.nan_to_num(np.exp2(-np.maximum(age_hours, 0.0) / half_life_hours), nan=0.0)
+    else:
+        recency = np.zeros_like(age_hours)
+
+    total = similarity_weight + importance_weight + recency_weight
+    if total <= 0:
+        return relevance
+    return (similarity_weight * relevance + importance_weight * importance + recency_weight * recency) / total
+
+
+def vector_similarity(vectors: "np.ndarray") -> "np.ndarray":
+    """Pairwise cosine similarity of (unit) embedding vectors"""
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+    return vectors @ vectors.T
+
+
+def text_similarity(texts: Sequence[str]) -> "np.ndarray":
+    """
+    Pairwise Jaccard similarity of the texts' word sets (stopwords left out).
+
+    Used for diversity when candidates have no embedding, e.g. lexical-only
+    retrieval while the embeddings API is down.
+    """
+    import numpy as np
+
+    word_sets = [set(re.findall(r"\w+", text.lower())) - STOPWORDS for text in texts]
+    vocabulary = {word: i for i, word in enumerate(set().union(*word_sets))}
+    terms = np.zeros((len(texts), len(vocabulary)), dtype="float32")
+    for row, words in enumerate(word_sets):
+        terms[row, [vocabulary[word] for word in words]] = 1.0
+    overlap = terms @ terms.T
+    sizes = terms.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - overlap
+    return np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+
+def mmr(scores: "np.ndarray", similarity: "np.ndarray", k: int, lambda_: float = 0.7) -> List[int]:
+    """
+    Maximal marginal relevance: repeatedly pick the candidate with the best
+    ``lambda_ * score - (1 - lambda_) * (max similarity to those already picked)``.
+
+    Args:
+        scores: Relevance of each candidate
+        similarity: Candidate x candidate similarity matrix
+        k: Number of candidates to pick
+        lambda_: 1.0 ranks by score alone; lower values favour diversity
+
+    Returns:
+        Positions of the picked candidates, in pick order
+    """
+    import numpy as np
+
+    scores = np.asarray(scores, dtype="float32")
+    k = min(k, len(scores))
+    if lambda_ >= 1.0:
+        return [int(i) for i in np.argsort(-scores, kind="stable")[:k]]
+
+    redundancy = np.zeros_like(scores)
+    available = np.ones(len(scores), dtype=bool)
+    picked: List[int] = []
+    for _ in range(k):
+        objective = np.where(available, lambda_ * scores - (1.0 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(objective))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return picked
+
+
+def rerank(
+    relevance: Sequence[float],
+    importance: Sequence[int],
+    created_at: Sequence[Optional[datetime]],
+    texts: Sequence[str],
+    top_k: int,
+    vectors: Optional["np.ndarray"] = None,
+    now: Optional[datetime] = None
+) -> List[Tuple[int, float]]:
+    """
+    Re-rank retrieval candidates with the RERANK_* settings.
+
+    Candidates are scored by combined_scores() and top_k are picked by MMR,
+    comparing embeddings when given and word overlap otherwise.
+
+    Args:
+        relevance: Retrieval score of each candidate
+        importance: MemoryDoc importance of each candidate
+        created_at: Creation time of each candidate (naive UTC, like the column)
+        texts: Candidate texts (for word-overlap diversity)
+        top_k: Number of candidates to keep
+        vectors: Candidate embeddings, one row per candidate
+        now: Reference time for recency (defaults to utcnow)
+
+    Returns:
+        List of (candidate position, combined score), best first
+    """
+    import numpy as np
+
+    if not len(relevance):
+        return []
+    now = now or datetime.utcnow()
+    age_hours = np.array(
+        [(now - created).total_seconds() / 3600.0 if created is not None else np.nan for created in created_at],
+        dtype="float32",
+    )
+    scores = combined_scores(
+        relevance,
+        importance,
+        age_hours,
+        similarity_weight=settings.RERANK_SIMILARITY_WEIGHT,
+        importance_weight=settings.RERANK_IMPORTANCE_WEIGHT,
+        recency_weight=settings.RERANK_RECENCY_WEIGHT,
+        half_life_hours=settings.RERANK_RECENCY_HALF_LIFE_HOURS,
+    )
+    lambda_ = settings.RERANK_MMR_LAMBDA
+    if lambda_ >= 1.0:
+        similarity = None
+    elif vectors is not None:
+        similarity = vector_similarity(vectors)
+    else:
+        similarity = text_similarity(texts)
+    picked = mmr(scores, similarity, top_k, lambda_)
+    return [(i, float(scores[i])) for i in picked]
@@ -0,0 +1,223 @@
+# Resilience primitives for upstream LLM calls: retry, hedging, circuit breaking
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Callable, Optional, TypeVar
+
+from .metrics import metrics
+from .scheduler import OverloadedError
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(OverloadedError):
+    """The upstream is failing; calls are rejected without being attempted"""
+    status_code = 503
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's overall deadline passed before a successful attempt"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for transient upstream failures (timeouts, connection errors, 429/5xx)"""
+    import openai  # deferred: the SDK is slow to import
+
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_upstream_response(exc: BaseException) -> bool:
+    """True if the upstream answered (with an error status), i.e. it is reachable and serving"""
+    import openai
+
+    return isinstance(exc, openai.APIStatusError)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry_number: int) -> float:
+        """Delay before retry number ``retry_number`` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_number)))
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once ``reset_timeout`` seconds
+    have passed a single probe call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may proceed now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_after = max(1, math.ceil(self.reset_timeout - elapsed))
+        metrics.inc("llm_circuit_rejected_total", breaker=self.name)
+        raise CircuitOpenError(f"Circuit '{self.name}' is open; upstream is unavailable", retry_after=retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def release_probe(self) -> None:
+        """End a call that never reached the upstream: it proves nothing either way"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    metrics.inc("llm_circuit_opened_total", breaker=self.name)
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_gauge("llm_circuit_open", 1 if state == "open" else 0, breaker=self.name)
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+def _hedged_call(fn: Callable[[float], T], timeout: float, hedge_delay: float, stage: str) -> T:
+    """
+    Run fn, and if it hasn't finished after hedge_delay, race a duplicate.
+
+    The first successful result wins. The loser can't be cancelled once the
+    HTTP request is in flight; it finishes in the background and is ignored.
+    Both run in a copy of the caller's context, so either may use the
+    request's admission reservation.
+    """
+    primary = _hedge_executor.submit(copy_context().run, fn, timeout)
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    metrics.inc("llm_hedges_total", stage=stage)
+    hedge = _hedge_executor.submit(copy_context().run, fn, max(0.0, timeout - hedge_delay))
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    metrics.inc("llm_hedge_wins_total", stage=stage)
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_with_resilience(
+    fn: Callable[[float], T],
+    stage: str,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    deadline_seconds: float,
+    attempt_timeout: float,
+    hedge_delay: Optional[float] = None,
+) -> T:
+    """
+    Call ``fn(timeout)`` with deadline-bounded retries and optional hedging.
+
+    Args:
+        fn: Performs one attempt; must honour the timeout it is given
+        stage: Pipeline stage, used for metrics
+        policy: Retry/backoff policy
+        breaker: Circuit breaker guarding the upstream
+        deadline_seconds: Total time budget across all attempts and backoff
+        attempt_timeout: Upper bound for a single attempt
+        hedge_delay: If set, race a duplicate attempt after this many seconds
+
+    Returns:
+        The first successful attempt's result
+
+    Raises:
+        CircuitOpenError: If the breaker is open
+        DeadlineExceeded: If the deadline passes before any attempt succeeds
+        Exception: The last non-retryable (or final) upstream error
+    """
+    deadline = time.monotonic() + deadline_seconds
+    retry_number = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{stage} call exceeded its {deadline_seconds:.0f}s deadline")
+        breaker.allow()
+        timeout = min(attempt_timeout, remaining)
+
+        start = time.monotonic()
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                result = _hedged_call(fn, timeout, hedge_delay, stage)
+            else:
+                result = fn(timeout)
+        except Exception as exc:
+            if isinstance(exc, OverloadedError):
+                # Shed locally (admission timeout, queue full): never reached the upstream
+                breaker.release_probe()
+                raise
+            if not is_retryable(exc):
+                if is_upstream_response(exc):
+                    # Caller error (bad request, auth, ...): upstream is healthy
+                    breaker.record_success()
+                else:
+                    # A bug on our side says nothing about the upstream
+                    breaker.release_probe()
+                raise
+            breaker.record_failure()
+            metrics.inc("llm_failures_total", stage=stage, error=type(exc).__name__)
+
+            delay = policy.backoff(retry_number)
+            if retry_number >= policy.max_retries or time.monotonic() + delay >= deadline:
+                raise
+            retry_number += 1
+            metrics.inc("llm_retries_total", stage=stage)
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        metrics.observe("llm_latency_seconds", time.monotonic() - start, stage=stage)
+        return result
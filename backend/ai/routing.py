@@ -0,0 +1,69 @@
+# Model routing - pick a model per stage and escalate when the small one fails
+from typing import Callable, TypeVar
+
+from app.config import settings
+from .intent import COMPLEXITY_SIMPLE, intent_complexity
+from .metrics import metrics
+
+T = TypeVar("T")
+
+# stage -> (settings field of the large model, settings field of the small model)
+STAGE_MODELS = {
+    "planner": ("PLANNER_MODEL", "PLANNER_SMALL_MODEL"),
+    "narrator": ("NARRATOR_MODEL", "NARRATOR_SMALL_MODEL"),
+}
+
+
+def large_model(stage: str) -> str:
+    return getattr(settings, STAGE_MODELS[stage][0])
+
+
+def route_model(stage: str, player_intent: str) -> str:
+    """Small model for simple intents when routing is enabled, else the large one"""
+    if settings.MODEL_ROUTING_ENABLED and intent_complexity(player_intent) == COMPLEXITY_SIMPLE:
+        return getattr(settings, STAGE_MODELS[stage][1])
+    return large_model(stage)
+
+
+def run_with_escalation(
+    stage: str,
+    player_intent: str,
+    attempt: Callable[[str], T],
+    validate: Callable[[T], None]
+) -> T:
+    """
+    Run a stage on the routed model, escalating to the large model if its
+    output fails validation.
+
+    Args:
+        stage: "planner" or "narrator"
+        player_intent: Player's command/intent, used for routing
+        attempt: Produces the stage output with the given model
+        validate: Raises ValueError/AssertionError for unusable output
+
+    Returns:
+        Validated output
+    """
+    model = route_model(stage, player_intent)
+    large = large_model(stage)
+    if model != large:
+        metrics.inc("model_routed_small_total", stage=stage)
+        try:
+            result = attempt(model)
+            validate(result)
+            _record_escalation_rate(stage)
+            return result
+        except (ValueError, AssertionError) as exc:  # includes pydantic ValidationError
+            metrics.inc("model_escalations_total", stage=stage)
+            _record_escalation_rate(stage)
+            print(f"{stage} output from {model} failed validation ({exc}); escalating to {large}", flush=True)
+
+    result = attempt(large)
+    validate(result)
+    return result
+
+
+def _record_escalation_rate(stage: str) -> None:
+    routed = metrics.get_counter("model_routed_small_total", stage=stage)
+    escalated = metrics.get_counter("model_escalations_total", stage=stage)
+    metrics.set_gauge("model_escalation_rate", escalated / routed if routed else 0.0, stage=stage)
@@ -0,0 +1,340 @@
+# Turn scheduling and LLM admission control
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.config import settings
+from .metrics import metrics
+
+# How often admit() re-checks for a free concurrency slot
+ADMISSION_POLL_SECONDS = 0.02
+
+
+class OverloadedError(Exception):
+    """Raised when work is shed; retry_after is a hint in whole seconds"""
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(OverloadedError):
+    """A player's turn queue (or the global queue) is too deep"""
+
+
+class LLMAdmissionTimeout(OverloadedError):
+    """No LLM capacity became available within the admission timeout"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Refills at ``rate`` tokens per second up to ``capacity``; the capacity is
+    the largest burst allowed after an idle period.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens if available.
+
+        Returns:
+            0.0 on success, otherwise the seconds until enough tokens refill
+        """
+        with self._lock:
+            wait = self._refill(tokens)
+            if wait == 0.0:
+                self._tokens -= tokens
+            return wait
+
+    def time_until(self, tokens: float = 1.0) -> float:
+        """Seconds until tokens could be taken (0.0 if now), without taking them"""
+        with self._lock:
+            return self._refill(tokens)
+
+    def _refill(self, tokens: float) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= tokens:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """Give back tokens that were taken but not used"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are taken; False if timeout elapses first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            time.sleep(wait)
+
+
+class LLMReservation:
+    """
+    LLM capacity held by admit() for a request's next call: one rate token
+    and one concurrency slot.
+
+    The first slot() taken in the request's context uses it instead of
+    waiting; worker threads started with run_in_threadpool (or the hedging
+    executor) copy that context. Leaving the ``with`` block, or release(),
+    gives the capacity back if no call used it, e.g. on a plan cache hit.
+    """
+
+    def __init__(self, limiter: "LLMLimiter"):
+        self._limiter = limiter
+        self._held = True
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """Take over the reserved capacity; True only for the first caller"""
+        with self._lock:
+            held, self._held = self._held, False
+            return held
+
+    def release(self) -> None:
+        if self.claim():
+            self._limiter._semaphore.release()
+            self._limiter._bucket.refund()
+
+    def __enter__(self) -> "LLMReservation":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+# The reservation of the request running in this context, if any
+_reservation: ContextVar[Optional[LLMReservation]] = ContextVar("llm_reservation", default=None)
+# Limiter for LLM calls made in this context, if not llm_limiter (see use_limiter())
+_limiter: ContextVar[Optional["LLMLimiter"]] = ContextVar("llm_limiter", default=None)
+
+
+class LLMLimiter:
+    """
+    Global admission control for LLM calls.
+
+    Combines a token bucket (requests per minute for our OpenAI tier) with a
+    cap on concurrent in-flight calls. Requests wait for capacity on the
+    event loop with admit(), for at most ``admission_timeout`` seconds, and
+    reserve it before handing LLM work to a worker thread, so background
+    work (prefetch, summaries) can't take it in between: the request's first
+    call consumes the reservation in slot(). Other calls take a slot(),
+    blocking their thread for at most ``slot_timeout`` seconds. Either wait
+    running out rejects the call with LLMAdmissionTimeout.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float,
+        admission_timeout: float,
+        slot_timeout: float
+    ):
+        self.max_concurrency = max_concurrency
+        self.admission_timeout = admission_timeout
+        self.slot_timeout = slot_timeout
+        self._bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    async def admit(self, stage: str) -> LLMReservation:
+        """
+        Wait without blocking the event loop for a rate token and a
+        concurrency slot, and reserve them for this request's next LLM call.
+
+        Use the result as a context manager around the request's LLM work:
+        ``with await llm_limiter.admit("turn"): ...``
+
+        Raises:
+            LLMAdmissionTimeout: If there is no capacity within admission_timeout
+        """
+        start = time.monotonic()
+        while True:
+            wait = self._bucket.time_until()
+            if wait == 0.0 and self._semaphore.acquire(blocking=False):
+                if self._bucket.try_acquire() == 0.0:
+                    metrics.observe("llm_admission_wait_seconds", time.monotonic() - start, stage=stage)
+                    reservation = LLMReservation(self)
+                    _reservation.set(reservation)
+                    return reservation
+                # A thread took the token in between
+                self._semaphore.release()
+                wait = self._bucket.time_until()
+            remaining = self.admission_timeout - (time.monotonic() - start)
+            if remaining <= 0 or wait > remaining:
+                metrics.inc("llm_admission_rejected_total", stage=stage)
+                reason = "LLM rate limit reached" if wait else "Too many LLM calls in flight"
+                raise LLMAdmissionTimeout(reason, retry_after=self._retry_after())
+            await asyncio.sleep(min(max(wait, ADMISSION_POLL_SECONDS), remaining))
+
+    @contextmanager
+    def slot(self, stage: str):
+        """Hold one LLM slot for the duration of the block (the request's reserved one, if unused)"""
+        start = time.monotonic()
+        reservation = _reservation.get()
+        if reservation is None or not reservation.claim():
+            if not self._bucket.acquire(timeout=self.slot_timeout):
+                metrics.inc("llm_admission_rejected_total", stage=stage)
+                raise LLMAdmissionTimeout("LLM rate limit reached", retry_after=self._retry_after())
+
+            remaining = max(0.0, self.slot_timeout - (time.monotonic() - start))
+            if not self._semaphore.acquire(timeout=remaining):
+                metrics.inc("llm_admission_rejected_total", stage=stage)
+                raise LLMAdmissionTimeout("Too many LLM calls in flight", retry_after=self._retry_after())
+
+        metrics.observe("llm_slot_wait_seconds", time.monotonic() - start, stage=stage)
+        metrics.add_gauge("llm_in_flight", 1)
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            metrics.add_gauge("llm_in_flight", -1)
+            self._semaphore.release()
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(1.0 / self._bucket.rate))
+
+
+class TurnScheduler:
+    """
+    Serializes turns per player with a bounded queue.
+
+    At most one turn per player runs at a time; further turns wait in FIFO
+    order (asyncio.Lock is fair). A player may have at most
+    ``max_depth_per_player`` turns running or waiting, and the server at most
+    ``max_total_queued`` waiting turns overall, beyond which new turns are
+    rejected with QueueFullError instead of piling up.
+    """
+
+    def __init__(self, max_depth_per_player: int, max_total_queued: int):
+        self.max_depth_per_player = max_depth_per_player
+        self.max_total_queued = max_total_queued
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._depth: Dict[str, int] = {}
+        self._started: Dict[str, float] = {}
+        self._queued_total = 0
+        # Smoothed turn duration used for Retry-After hints
+        self._avg_turn_seconds = 10.0
+
+    def _retry_after(self, depth: int) -> int:
+        return max(1, math.ceil(self._avg_turn_seconds * max(1, depth)))
+
+    async def acquire(self, player_id: str) -> None:
+        """Wait for this player's turn slot, or raise QueueFullError"""
+        depth = self._depth.get(player_id, 0)
+        if depth >= self.max_depth_per_player:
+            metrics.inc("turns_rejected_total", reason="player_queue_full")
+            raise QueueFullError("Too many turns queued for this player", retry_after=self._retry_after(depth))
+        if self._queued_total >= self.max_total_queued:
+            metrics.inc("turns_rejected_total", reason="global_queue_full")
+            raise QueueFullError("Server is busy", retry_after=self._retry_after(1))
+
+        self._depth[player_id] = depth + 1
+        self._queued_total += 1
+        metrics.set_gauge("turn_queue_depth", self._queued_total)
+
+        lock = self._locks.setdefault(player_id, asyncio.Lock())
+        start = time.monotonic()
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._queued_total -= 1
+            metrics.set_gauge("turn_queue_depth", self._queued_total)
+            self._leave(player_id)
+            raise
+
+        self._queued_total -= 1
+        metrics.set_gauge("turn_queue_depth", self._queued_total)
+        metrics.observe("turn_queue_wait_seconds", time.monotonic() - start)
+        metrics.add_gauge("turns_in_progress", 1)
+        self._started[player_id] = time.monotonic()
+
+    def release(self, player_id: str) -> None:
+        """Finish the player's running turn and let the next one start"""
+        started = self._started.pop(player_id, None)
+        if started is not None:
+            self._avg_turn_seconds = 0.8 * self._avg_turn_seconds + 0.2 * (time.monotonic() - started)
+        metrics.add_gauge("turns_in_progress", -1)
+        self._locks[player_id].release()
+        self._leave(player_id)
+
+    @asynccontextmanager
+    async def turn(self, player_id: str):
+        """Run the block as this player's exclusive turn"""
+        await self.acquire(player_id)
+        try:
+            yield
+        finally:
+            self.release(player_id)
+
+    def _leave(self, player_id: str) -> None:
+        depth = self._depth[player_id] - 1
+        if depth:
+            self._depth[player_id] = depth
+        else:
+            # Nobody running or waiting: drop per-player state
+            del self._depth[player_id]
+            del self._locks[player_id]
+
+
+llm_limiter = LLMLimiter(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    admission_timeout=settings.LLM_ADMISSION_TIMEOUT_SECONDS,
+    slot_timeout=settings.LLM_SLOT_TIMEOUT_SECONDS,
+)
+
+# Speculative (prefetch) calls have their own slots, so they can't starve turns;
+# their cost is capped separately by PREFETCH_MAX_CALLS_PER_MINUTE
+speculative_limiter = LLMLimiter(
+    max_concurrency=settings.PREFETCH_MAX_WORKERS,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    admission_timeout=settings.LLM_ADMISSION_TIMEOUT_SECONDS,
+    slot_timeout=settings.LLM_SLOT_TIMEOUT_SECONDS,
+)
+
+
+def current_limiter() -> LLMLimiter:
+    """The limiter LLM calls made in this context take their slot() from"""
+    return _limiter.get() or llm_limiter
+
+
+@contextmanager
+def use_limiter(limiter: LLMLimiter):
+    """Make LLM calls in the block (and threads copying its context) use this limiter"""
+    token = _limiter.set(limiter)
+    try:
+        yield
+    finally:
+        _limiter.reset(token)
+
+turn_scheduler = TurnScheduler(
+    max_depth_per_player=settings.TURN_QUEUE_MAX_DEPTH,
+    max_total_queued=settings.TURN_QUEUE_MAX_TOTAL,
+)
@@ -0,0 +1,66 @@
+# Game session - per-connection state for long-lived transports
+from typing import TYPE_CHECKING, Dict, Any, Optional
+from sqlalchemy.orm import Session
+
+from db.saves import create_save_snapshot
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+class GameSession:
+    """
+    State kept alive for the lifetime of a single WebSocket connection.
+
+    The only per-connection state is the player snapshot (and a turn count):
+    consecutive turns on the same connection don't rebuild it. The OpenAI
+    client and the FAISS index are the process-wide shared ones, as for
+    /play. The snapshot is rebuilt
+    with refresh_snapshot() once each turn is committed, so the next turn
+    starts from the saved state without building it on its own critical path.
+    The session holds no DB session: each turn passes its own.
+    """
+
+    def __init__(self, player_id: str, openai_client: "OpenAI"):
+        self.player_id = player_id
+        self.openai_client = openai_client
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.turns_played = 0
+
+    def get_snapshot(self, db: Session, current_location_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return the cached player snapshot, building it on first use.
+
+        Args:
+            db: Database session
+            current_location_id: Location reported by the frontend, if any
+
+        Returns:
+            Player snapshot dict
+        """
+        if self.snapshot is None:
+            self.snapshot = create_save_snapshot(db, self.player_id) or {"player": {"id": self.player_id}}
+
+        # Frontend-provided location wins, same as the HTTP endpoints
+        if current_location_id:
+            self.snapshot.setdefault("player", {})["current_location_id"] = current_location_id
+
+        return self.snapshot
+
+    def refresh_snapshot(self, db: Session) -> Dict[str, Any]:
+        """
+        Rebuild the cached snapshot from the DB, after a turn has been committed.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Player snapshot dict
+        """
+        # A failed rebuild leaves nothing cached, so the next turn retries it
+        self.snapshot = None
+        return self.get_snapshot(db)
+
+    def invalidate_snapshot(self) -> None:
+        """Drop the cached snapshot so the next turn rebuilds it from the DB"""
+        self.snapshot = None
@@ -1,5 +1,312 @@
-# Summarizer module - for future entity summarization
-# Placeholder for Phase 4+ functionality
+# Summarizer - condenses each player's transcript into episodic memory docs
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
-pass
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
+from app.config import settings
+from db.engine import SessionLocal
+from db.json_utils import loads
+from db.models import MemoryDoc, TranscriptEvent
+from .doc_store import doc_store
+from .llm import create_chat_completion
+from .metrics import metrics
+from .prompts import SUMMARIZER_INSTRUCTIONS
+from .scheduler import TokenBucket
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+TRANSCRIPT_KIND = "transcript"
+
+# Narration is cut to this many characters per turn before summarizing
+MAX_EVENT_CHARS = 1200
+
+_NEXT_ACTIONS = re.compile(r"\*\*Next actions?:?\*\*:?", re.IGNORECASE)
+
+
+def format_turns(events: List[TranscriptEvent]) -> str:
+    """Render transcript events as the summarizer's input: command, then narration"""
+    lines = []
+    for event in events:
+        payload = loads(event.payload_json) if event.payload_json else {}
+        intent = (payload or {}).get("player_intent", "")
+        narration = _NEXT_ACTIONS.split(event.markdown or "")[0].strip()
+        if len(narration) > MAX_EVENT_CHARS:
+            narration = narration[:MAX_EVENT_CHARS].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"Turn {event.turn}: > {intent}\n{narration}")
+    return "\n\n".join(lines)
+
+
+class TranscriptSummarizer:
+    """
+    Background job that turns each player's transcript into rolling summaries.
+
+    Every ``interval_seconds`` it looks for players with unsummarized
+    narration events. Once ``window_turns`` of them have piled up (or the
+    player has been idle for ``idle_flush_seconds``) they are condensed by
+    the LLM, with the player's previous summary as context, into a
+    ``transcript`` MemoryDoc scoped to that player. The doc's
+    source_event_id records the last event covered, so progress survives
+    restarts. New summaries are then embedded and appended to the FAISS
+    index; until that succeeds they are still found by lexical search.
+
+    Retrieval surfaces these docs like any other fact (player-scoped,
+    favoured by recency), so a prompt carries long-horizon continuity within
+    its fixed facts budget instead of a transcript that grows every turn.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = 60.0,
+        window_turns: int = 8,
+        idle_flush_seconds: float = 600.0,
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 250,
+        calls_per_minute: float = 10.0
+    ):
+        self.interval_seconds = interval_seconds
+        self.window_turns = window_turns
+        self.idle_flush_seconds = idle_flush_seconds
+        self.model = model
+        self.max_tokens = max_tokens
+        self._budget = TokenBucket(rate=calls_per_minute / 60.0, capacity=max(1.0, calls_per_minute / 6.0))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # One pass at a time, whether from the background thread or run_once() callers
+        self._run_lock = threading.Lock()
+        # Every transcript doc up to this id is in the index (see embed_pending())
+        self._embedded_through = 0
+        self._embedded_ntotal = 0
+
+    def start(self, client_factory: Callable[[], "OpenAI"]) -> None:
+        """Run passes every interval on a daemon thread until stop()"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(client_factory,), name="transcript-summarizer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self, client_factory: Callable[[], "OpenAI"]) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once(client_factory())
+            except Exception as exc:
+                metrics.inc("summarizer_failures_total")
+                print(f"Transcript summarizer pass failed: {exc}", flush=True)
+
+    def run_once(self, openai_client: "OpenAI", now: Optional[datetime] = None) -> int:
+        """
+        Summarize every player with enough pending turns, then embed new summaries.
+
+        Args:
+            openai_client: OpenAI client instance
+            now: Reference time for the idle check (defaults to utcnow)
+
+        Returns:
+            Number of summary docs written
+        """
+        now = now or datetime.utcnow()
+        written = 0
+        with self._run_lock:
+            db = SessionLocal()
+            try:
+                for player_id in self._pending_players(db):
+                    if self._stop.is_set():
+                        break
+                    try:
+                        if self.summarize_player(openai_client, player_id, db, now) is not None:
+                            written += 1
+                    except Exception as exc:
+                        db.rollback()
+                        metrics.inc("summarizer_failures_total")
+                        print(f"Summarizing the transcript of {player_id} failed: {exc}", flush=True)
+                self.embed_pending(db)
+            finally:
+                db.close()
+        return written
+
+    def _pending_players(self, db: Session) -> List[str]:
+        """Players whose newest narration event isn't covered by a summary yet"""
+        watermarks = self._watermarks(db)
+        latest = (
+            db.query(TranscriptEvent.player_id, func.max(TranscriptEvent.id))
+            .filter(TranscriptEvent.kind == "narration")
+            .group_by(TranscriptEvent.player_id)
+            .all()
+        )
+        return [player_id for player_id, last_id in latest if last_id > watermarks.get(player_id, 0)]
+
+    @staticmethod
+    def _watermarks(db: Session, player_id: Optional[str] = None) -> Dict[str, int]:
+        """Last summarized event id per player"""
+        query = db.query(MemoryDoc.player_id, func.max(MemoryDoc.source_event_id)).filter(
+            MemoryDoc.kind == TRANSCRIPT_KIND, MemoryDoc.source_event_id.isnot(None)
+        )
+        if player_id is not None:
+            query = query.filter(MemoryDoc.player_id == player_id)
+        return {player: last_id for player, last_id in query.group_by(MemoryDoc.player_id).all()}
+
+    def summarize_player(
+        self,
+        openai_client: "OpenAI",
+        player_id: str,
+        db: Session,
+        now: Optional[datetime] = None
+    ) -> Optional[MemoryDoc]:
+        """
+        Condense the player's next window of unsummarized turns.
+
+        Returns:
+            The new summary doc, or None if the window isn't due yet (or
+            the call budget is spent)
+        """
+        now = now or datetime.utcnow()
+        watermark = self._watermarks(db, player_id).get(player_id, 0)
+        events = (
+            db.query(TranscriptEvent)
+            .filter(
+                TranscriptEvent.player_id == player_id,
+                TranscriptEvent.kind == "narration",
+                TranscriptEvent.id > watermark,
+            )
+            .order_by(TranscriptEvent.id)
+            .limit(self.window_turns)
+            .all()
+        )
+        if not events:
+            return None
+        idle = events[-1].created_at is None or now - events[-1].created_at >= timedelta(
+            seconds=self.idle_flush_seconds
+        )
+        if len(events) < self.window_turns and not idle:
+            return None
+        if self._budget.try_acquire() > 0:
+            metrics.inc("summarizer_skipped_total", reason="budget")
+            return None
+
+        previous = (
+            db.query(MemoryDoc)
+            .filter(MemoryDoc.kind == TRANSCRIPT_KIND, MemoryDoc.player_id == player_id, MemoryDoc.stale == False)
+            .order_by(MemoryDoc.source_event_id.desc())
+            .first()
+        )
+        summary = self._summarize(openai_client, previous.text if previous else None, events)
+
+        # Another worker may have summarized these turns while the LLM ran; the
+        # unique (player_id, source_event_id) index catches a race past this check
+        if self._watermarks(db, player_id).get(player_id, 0) != watermark:
+            metrics.inc("summarizer_skipped_total", reason="raced")
+            return None
+        first, last = events[0].turn, events[-1].turn
+        label = f"Turn {first}" if first == last else f"Turns {first}-{last}"
+        doc = MemoryDoc(
+            kind=TRANSCRIPT_KIND,
+            player_id=player_id,
+            text=f"{label}: {summary}",
+            importance=0,
+            stale=False,
+            source_event_id=events[-1].id,
+        )
+        db.add(doc)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            metrics.inc("summarizer_skipped_total", reason="raced")
+            return None
+        db.refresh(doc)
+        doc_store.put(doc)
+        metrics.inc("summarizer_summaries_total")
+        metrics.observe("summarizer_turns_per_summary", len(events))
+        return doc
+
+    def _summarize(self, openai_client: "OpenAI", previous: Optional[str], events: List[TranscriptEvent]) -> str:
+        story_so_far = f"[STORY SO FAR]\n{previous}\n\n" if previous else ""
+        response = create_chat_completion(
+            openai_client,
+            "summarizer",
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SUMMARIZER_INSTRUCTIONS},
+                {"role": "user", "content": f"{story_so_far}[TURNS]\n{format_turns(events)}"},
+            ],
+            temperature=0.2,
+            max_tokens=self.max_tokens,
+        )
+        summary = " ".join((response.choices[0].message.content or "").split())
+        if not summary:
+            raise ValueError("Summarizer returned an empty summary")
+        return summary
+
+    def embed_pending(self, db: Session) -> int:
+        """
+        Embed summary docs missing from the FAISS index and append them.
+
+        Only docs past the highest id known to be indexed are read (a range
+        on idx_memory_kind, whose entries end in the row id), so a pass
+        doesn't scan every summary. The mark
+        stops before the first doc that couldn't be embedded, so it is
+        retried, and is reset if the index shrinks (replaced by a rebuild).
+
+        Returns:
+            Number of docs added (0 if there is no index to add to)
+        """
+        from .memory import add_to_index, embed, get_doc_id_table, get_index
+
+        index = get_index()
+        if index is None:
+            return 0
+        if index.ntotal < self._embedded_ntotal:
+            self._embedded_through = 0
+        self._embedded_ntotal = index.ntotal
+        docs = (
+            db.query(MemoryDoc.id, MemoryDoc.text)
+            .filter(
+                MemoryDoc.id > self._embedded_through,
+                MemoryDoc.kind == TRANSCRIPT_KIND,
+                MemoryDoc.stale == False,
+            )
+            .order_by(MemoryDoc.id)
+            .all()
+        )
+        if not docs:
+            return 0
+        positions = get_doc_id_table(index).positions_of(doc_id for doc_id, _ in docs)
+        pending = [(doc_id, text) for (doc_id, text), position in zip(docs, positions) if position < 0]
+        if not pending:
+            self._embedded_through = docs[-1][0]
+            return 0
+        try:
+            vectors = embed([text for _, text in pending])
+            add_to_index(vectors, [doc_id for doc_id, _ in pending])
+        except Exception as exc:
+            self._embedded_through = pending[0][0] - 1
+            metrics.inc("summarizer_embed_failures_total")
+            print(f"Embedding {len(pending)} transcript summaries failed, retrying next pass: {exc}", flush=True)
+            return 0
+        self._embedded_through = docs[-1][0]
+        self._embedded_ntotal += len(pending)
+        metrics.inc("summarizer_embedded_total", len(pending))
+        return len(pending)
+
+summarizer = TranscriptSummarizer(
+    interval_seconds=settings.SUMMARY_INTERVAL_SECONDS,
+    window_turns=settings.SUMMARY_WINDOW_TURNS,
+    idle_flush_seconds=settings.SUMMARY_IDLE_FLUSH_SECONDS,
+    model=settings.SUMMARY_MODEL,
+    max_tokens=settings.SUMMARY_MAX_TOKENS,
+    calls_per_minute=settings.SUMMARY_MAX_CALLS_PER_MINUTE,
+)
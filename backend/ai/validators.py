@@ -1,12 +1,20 @@
 # Validation and red-line enforcement
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from db.world_graph import get_world_graph
 from .models import PlannerOutput
 
+# state_change entities/keys that move the player
+_LOCATION_KEYS = ("current_location_id", "location_id", "location")
+_PLAYER_ENTITIES = ("player", "player.current_location_id", "player.location_id", "player.location")
 
-def validate_plan(plan: PlannerOutput) -> None:
+
+def validate_plan(plan: PlannerOutput, snapshot: Optional[Dict[str, Any]] = None) -> None:
     """
     Validate planner output structure.
     
+    With a snapshot, player moves are also checked against the world graph
+    (no teleportation: only known locations one exit away).
+    
     Raises:
         AssertionError: If plan is invalid
     """
@@ -20,6 +28,42 @@ def validate_plan(plan: PlannerOutput) -> None:
         assert "op" in state_change, "state_change missing 'op'"
         assert state_change["op"] in ["set", "add", "remove", "update"], \
             f"Invalid operation: {state_change['op']}"
+    
+    if snapshot is not None:
+        current = snapshot.get("player", {}).get("current_location_id")
+        for destination in plan_destinations(plan):
+            _check_move(current, destination)
+            current = destination
+
+
+def plan_destinations(plan: PlannerOutput) -> List[str]:
+    """Location ids the plan moves the player to, in order"""
+    destinations = []
+    for state_change in plan.state_changes:
+        entity = str(state_change.get("entity", "")).lower()
+        if entity not in _PLAYER_ENTITIES:
+            continue
+        value = state_change.get("value")
+        if isinstance(value, dict):
+            value = next((value[key] for key in _LOCATION_KEYS if value.get(key)), None)
+        elif entity == "player":
+            value = None  # some other player attribute
+        if isinstance(value, str) and value:
+            destinations.append(value)
+    return destinations
+
+
+def _check_move(current: Optional[str], destination: str) -> None:
+    graph = get_world_graph()
+    if not len(graph) or current == destination:
+        return
+    assert destination in graph, f"Move to unknown location '{destination}'"
+    if current is None or current not in graph:
+        return
+    if not graph.is_adjacent(current, destination):
+        distance = graph.distance(current, destination)
+        how_far = f"{distance} moves away" if distance is not None else "unreachable"
+        raise AssertionError(f"Teleportation: '{destination}' is not an exit of '{current}' ({how_far})")
 
 
 def check_red_lines(markdown: str, snapshot: Dict[str, Any]) -> List[str]:
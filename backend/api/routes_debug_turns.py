@@ -1,7 +1,7 @@
 # Debug routes for testing AI turns
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from db.engine import get_db
 from db.models import TranscriptEvent
 from sqlalchemy.orm import Session
@@ -10,19 +10,25 @@ router = APIRouter()
 
 
 @router.get("/last_turn")
-async def get_last_turn(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def get_last_turn(player_id: Optional[str] = None, db: Session = Depends(get_db)) -> Dict[str, Any]:
     """
     Get the latest transcript event with Markdown narration.
     
+    With a player_id the lookup walks idx_transcript_player_turn backwards;
+    without one it falls back to the most recent event across all players.
+    
     Returns:
         Dict with markdown text and metadata
     """
     # Get the latest event from database
-    latest_event = (
-        db.query(TranscriptEvent)
-        .order_by(TranscriptEvent.created_at.desc())
-        .first()
-    )
+    query = db.query(TranscriptEvent)
+    if player_id:
+        query = query.filter(TranscriptEvent.player_id == player_id).order_by(
+            TranscriptEvent.turn.desc(), TranscriptEvent.id.desc()
+        )
+    else:
+        query = query.order_by(TranscriptEvent.created_at.desc())
+    latest_event = query.first()
     
     if not latest_event:
         raise HTTPException(status_code=404, detail="No transcript events found")
@@ -37,23 +43,39 @@ async def get_last_turn(db: Session = Depends(get_db)) -> Dict[str, Any]:
 
 
 @router.get("/turns/{player_id}")
-async def get_player_turns(player_id: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def get_player_turns(
+    player_id: str,
+    before_turn: Optional[int] = Query(None, description="Only turns lower than this (for paging backwards)"),
+    after_turn: Optional[int] = Query(None, description="Only turns higher than this"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
     """
-    Get all transcript events for a specific player.
+    Get transcript events for a specific player, newest turn first.
+    
+    Keyset-paginated on (player_id, turn) so each page is a range scan of
+    idx_transcript_player_turn. Pass the returned next_before_turn as
+    before_turn to fetch the next page.
     
     Returns:
         List of events with markdown
     """
+    query = db.query(TranscriptEvent).filter(TranscriptEvent.player_id == player_id)
+    if before_turn is not None:
+        query = query.filter(TranscriptEvent.turn < before_turn)
+    if after_turn is not None:
+        query = query.filter(TranscriptEvent.turn > after_turn)
     events = (
-        db.query(TranscriptEvent)
-        .filter(TranscriptEvent.player_id == player_id)
-        .order_by(TranscriptEvent.turn.desc())
+        query
+        .order_by(TranscriptEvent.turn.desc(), TranscriptEvent.id.desc())
+        .limit(limit)
         .all()
     )
     
     return {
         "player_id": player_id,
         "count": len(events),
+        "next_before_turn": events[-1].turn if len(events) == limit else None,
         "events": [
             {
                 "turn": event.turn,
@@ -1,5 +1,6 @@
 # Health check routes
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
+from app.warmup import warmup_state
 
 router = APIRouter()
 
@@ -7,3 +8,10 @@ router = APIRouter()
 async def health_check():
     return {"status": "ok"}
 
+@router.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness: 503 until every warm-up component (index, world, clients, pipeline) is ready"""
+    report = warmup_state.report()
+    if not report["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
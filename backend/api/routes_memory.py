@@ -1,6 +1,7 @@
 # Memory debug endpoints
-from fastapi import APIRouter
-from ai.memory import search, retrieve_context, load_mapping
+from typing import List, Optional
+from fastapi import APIRouter, Query
+from ai.memory import search, retrieve_facts, get_doc_id_table, get_index
 from db.engine import SessionLocal
 from db.models import MemoryDoc
 
@@ -10,13 +11,14 @@ router = APIRouter()
 @router.get("/memory/search")
 def memory_search(q: str):
     """Search memory index and return top-k matches"""
-    matches = search(q, top_k=3)
+    index = get_index()
+    matches = search(q, top_k=3, index=index) if index is not None else []
     
-    # Get document details for each match using mapping
+    # Get document details for each match using the doc id table
     db = SessionLocal()
     try:
-        mapping = load_mapping()
-        doc_ids = [mapping.get(idx) for _, idx in matches if idx in mapping]
+        match_doc_ids = get_doc_id_table(index).doc_ids_at([idx for _, idx in matches]).tolist()
+        doc_ids = [doc_id for doc_id in match_doc_ids if doc_id >= 0]
         
         if not doc_ids:
             return {
@@ -28,9 +30,8 @@ def memory_search(q: str):
         doc_dict = {doc.id: doc for doc in docs}
         
         results = []
-        for score, idx in matches:
-            doc_id = mapping.get(idx)
-            if doc_id and doc_id in doc_dict:
+        for (score, idx), doc_id in zip(matches, match_doc_ids):
+            if doc_id in doc_dict:
                 doc = doc_dict[doc_id]
                 results.append({
                     "score": score,
@@ -50,11 +51,17 @@ def memory_search(q: str):
 
 
 @router.get("/memory/retrieve")
-def memory_retrieve(q: str):
-    """Test retrieval context function"""
-    context = retrieve_context(q)
+def memory_retrieve(
+    q: str,
+    kind: Optional[List[str]] = Query(default=None),
+    entity_id: Optional[List[str]] = Query(default=None),
+    player_id: Optional[str] = None
+):
+    """Test retrieval as the turn pipeline runs it, optionally filtered by kind, entity or player"""
+    facts = retrieve_facts(q, kinds=kind, entity_ids=entity_id, player_id=player_id)
     return {
         "query": q,
-        "context": context
+        "context": "\n".join(fact["text"] for fact in facts),
+        "facts": facts
     }
 
@@ -0,0 +1,14 @@
+# Metrics routes - in-process counters, gauges and latency histograms
+from fastapi import APIRouter
+from ai.metrics import metrics
+from ai.plan_cache import plan_cache
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Current metrics snapshot (turn queue depth/wait, LLM admission, ...)"""
+    snapshot = metrics.snapshot()
+    snapshot["planner_cache"] = plan_cache.stats()
+    return snapshot
@@ -1,23 +1,23 @@
 from typing import Optional
+import asyncio
 import os
 import traceback
 import json
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from openai import OpenAI
 
 from db.engine import get_db
 from db.saves import create_save_snapshot
-from ai.context_engine import run_turn
-from ai.planner import plan_turn
-from ai.narrator import narrate_turn_streaming, _extract_next_actions
-from ai.validators import validate_plan
-from ai.prompts import SYSTEM_PROMPT
-from ai.memory import retrieve_context
+from db.turns import next_turn
+from app.idempotency import idempotency_cache, IdempotencyMismatch
+from ai.context_engine import run_turn, prepare_turn, stream_narration_events
+from ai.memory import get_shared_openai_client
 from ai.models import NarratorOutput
+from ai.scheduler import llm_limiter, turn_scheduler, OverloadedError
 
 
 router = APIRouter()
@@ -33,50 +33,135 @@ class PlayResponse(BaseModel):
     markdown: str
 
 
+def _build_snapshot(db: Session, player_id: str, current_location_id: Optional[str]) -> dict:
+    """Build a snapshot of current player state, honouring the frontend location"""
+    snapshot = create_save_snapshot(db, player_id) or {"player": {"id": player_id}}
+    
+    # Override location with frontend-provided location if available
+    # This ensures backend uses the correct current location from frontend state
+    if current_location_id:
+        if "player" not in snapshot:
+            snapshot["player"] = {}
+        snapshot["player"]["current_location_id"] = current_location_id
+    return snapshot
+
+
+def _request_fingerprint(payload: PlayRequest) -> str:
+    """Fields that must match for an Idempotency-Key to be reused"""
+    return idempotency_cache.fingerprint(payload.command, payload.current_location_id)
+
+
+def _sse(event: dict) -> str:
+    """Format an event as a Server-Sent Events frame"""
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def _overloaded(exc: OverloadedError) -> HTTPException:
+    """Shed load with 429 (503 when the upstream circuit is open) and a Retry-After hint"""
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class _TurnStreamingResponse(StreamingResponse):
+    """StreamingResponse that always runs on_close, even if the body never starts streaming"""
+
+    def __init__(self, content, on_close=None, **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+
+
+def _sse_response(events, on_close=None) -> StreamingResponse:
+    return _TurnStreamingResponse(
+        events,
+        on_close=on_close,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
+
+
 @router.post("/play", response_model=PlayResponse)
-async def play_turn(payload: PlayRequest, db: Session = Depends(get_db)) -> PlayResponse:
+async def play_turn(
+    payload: PlayRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None)
+) -> PlayResponse:
     """
     Minimal /play endpoint to drive a single game turn.
 
     For now this uses a simple snapshot of the given player (or a demo player)
     and runs one turn through the AI context engine.
+
+    With an Idempotency-Key header, duplicate requests attach to the running
+    turn or are answered from the cache instead of running a new turn.
     """
     player_id = payload.player_id or "demo"
 
-    # Build a snapshot of current player state if possible
-    snapshot = create_save_snapshot(db, player_id) or {"player": {"id": player_id}}
-    
-    # Override location with frontend-provided location if available
-    # This ensures backend uses the correct current location from frontend state
-    if payload.current_location_id:
-        if "player" not in snapshot:
-            snapshot["player"] = {}
-        snapshot["player"]["current_location_id"] = payload.current_location_id
+    async def play() -> NarratorOutput:
+        try:
+            async with turn_scheduler.turn(player_id):
+                return await play_locked()
+        except OverloadedError as exc:
+            raise _overloaded(exc)
 
-    # Check for OpenAI API key
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(
-            status_code=500,
-            detail="OPENAI_API_KEY not found in environment variables. Please check your .env file."
-        )
+    async def play_locked() -> NarratorOutput:
+        snapshot = _build_snapshot(db, player_id, payload.current_location_id)
 
-    try:
-        client = OpenAI(api_key=api_key)
-        narrator_output = run_turn(
-            openai_client=client,
-            player_intent=payload.command,
-            snapshot=snapshot,
-            db=db,
-            turn_id=0,
-        )
-    except Exception as exc:  # pragma: no cover - surfaced to client
-        # Log full traceback for debugging
-        error_trace = traceback.format_exc()
-        print(f"Error in /play endpoint:\n{error_trace}", flush=True)
-        # Return a user-friendly error message
-        error_msg = str(exc)
-        raise HTTPException(status_code=500, detail=error_msg)
+        # Check for OpenAI API key
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise HTTPException(
+                status_code=500,
+                detail="OPENAI_API_KEY not found in environment variables. Please check your .env file."
+            )
+
+        try:
+            client = get_shared_openai_client()
+            # Reserve LLM capacity on the event loop, not in a worker thread
+            with await llm_limiter.admit("turn"):
+                return await run_in_threadpool(
+                    lambda: run_turn(
+                        openai_client=client,
+                        player_intent=payload.command,
+                        snapshot=snapshot,
+                        db=db,
+                        turn_id=next_turn(db, player_id),
+                    )
+                )
+        except OverloadedError:
+            raise
+        except Exception as exc:  # pragma: no cover - surfaced to client
+            # Log full traceback for debugging
+            error_trace = traceback.format_exc()
+            print(f"Error in /play endpoint:\n{error_trace}", flush=True)
+            # Return a user-friendly error message
+            error_msg = str(exc)
+            raise HTTPException(status_code=500, detail=error_msg)
+
+    if not idempotency_key:
+        narrator_output = await play()
+    else:
+        try:
+            narrator_output = await idempotency_cache.run(
+                idempotency_cache.make_key(player_id, idempotency_key),
+                _request_fingerprint(payload),
+                play,
+            )
+        except IdempotencyMismatch as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
 
     return PlayResponse(markdown=narrator_output.markdown)
 
@@ -84,79 +169,130 @@ async def play_turn(payload: PlayRequest, db: Session = Depends(get_db)) -> Play
 @router.post("/play/stream")
 async def play_turn_stream(
     payload: PlayRequest, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None)
 ):
     """
     Streaming version of /play endpoint.
     Returns Server-Sent Events (SSE) with narrative chunks for faster perceived performance.
+
+    With an Idempotency-Key header, a duplicate of a running turn waits for it
+    and a duplicate of a finished turn is replayed from the cache.
     """
     player_id = payload.player_id or "demo"
 
-    # Build snapshot
-    snapshot = create_save_snapshot(db, player_id) or {"player": {"id": player_id}}
-    
-    if payload.current_location_id:
-        if "player" not in snapshot:
-            snapshot["player"] = {}
-        snapshot["player"]["current_location_id"] = payload.current_location_id
+    key = None
+    if idempotency_key:
+        key = idempotency_cache.make_key(player_id, idempotency_key)
+        fingerprint = _request_fingerprint(payload)
+        try:
+            cached = idempotency_cache.get_completed(key, fingerprint)
+            running = None if cached is not None else idempotency_cache.get_in_flight(key, fingerprint)
+        except IdempotencyMismatch as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+        if cached is not None or running is not None:
+            return _sse_response(_replay_turn(cached, running))
+        idempotency_cache.begin(key, fingerprint)
+
+    # Serialize with other turns for this player; held until the stream ends
+    try:
+        await turn_scheduler.acquire(player_id)
+    except OverloadedError as exc:
+        if key:
+            idempotency_cache.fail(key, exc)
+        raise _overloaded(exc)
+
+    finished = False
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(
-            status_code=500,
-            detail="OPENAI_API_KEY not found in environment variables."
-        )
+    def finish_turn() -> None:
+        """Release the player's turn slot once; wake idempotent followers if we never completed"""
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        turn_scheduler.release(player_id)
+        if key:
+            # No-op once the turn completed
+            idempotency_cache.fail(key, RuntimeError("Turn was interrupted before completion"))
 
     try:
-        client = OpenAI(api_key=api_key)
-        
-        # Pass A: Planning (non-streaming, fast)
-        relevant_facts = retrieve_context(payload.command)
-        system_prompt = SYSTEM_PROMPT.format(
-            relevant_facts=relevant_facts if relevant_facts else "(No relevant facts found)"
-        )
-        planner_output = plan_turn(client, system_prompt, payload.command, snapshot)
-        validate_plan(planner_output)
-        
-        # Pass B: Streaming narration
-        async def generate():
-            full_text = ""
-            try:
-                for chunk in narrate_turn_streaming(client, system_prompt, planner_output, snapshot):
-                    full_text += chunk
-                    # Format as SSE
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-                
-                # Extract next actions from complete markdown
-                next_actions = _extract_next_actions(full_text)
-                
-                # Send metadata
-                yield f"data: {json.dumps({'type': 'metadata', 'next_actions': next_actions})}\n\n"
-                
-                # Save to database after streaming completes
-                from ai.context_engine import _save_transcript_event
-                narrator_output = NarratorOutput(markdown=full_text, next_actions=next_actions)
-                _save_transcript_event(db, 0, payload.command, planner_output, narrator_output, snapshot)
-                
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
-            except Exception as e:
-                error_trace = traceback.format_exc()
-                print(f"Error in streaming generation:\n{error_trace}", flush=True)
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-        
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no",  # Disable nginx buffering
-            }
-        )
-        
+        # Build snapshot
+        snapshot = _build_snapshot(db, player_id, payload.current_location_id)
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise HTTPException(
+                status_code=500,
+                detail="OPENAI_API_KEY not found in environment variables."
+            )
+
+        client = get_shared_openai_client()
+        # Reserve LLM capacity on the event loop; shed turns don't use a turn number
+        with await llm_limiter.admit("turn"):
+            turn_id = await run_in_threadpool(next_turn, db, player_id)
+            
+            # Pass A: Planning (non-streaming, fast)
+            relevant_facts, planner_output = await run_in_threadpool(
+                prepare_turn, client, payload.command, snapshot, allow_fast_turn=True
+            )
+    except HTTPException as exc:
+        if key:
+            idempotency_cache.fail(key, exc)
+        finish_turn()
+        raise
+    except OverloadedError as exc:
+        if key:
+            idempotency_cache.fail(key, exc)
+        finish_turn()
+        raise _overloaded(exc)
     except Exception as exc:
+        if key:
+            idempotency_cache.fail(key, exc)
+        finish_turn()
         error_trace = traceback.format_exc()
         print(f"Error in /play/stream endpoint:\n{error_trace}", flush=True)
         raise HTTPException(status_code=500, detail=str(exc))
+        
+    # Pass B: Streaming narration
+    async def generate():
+        full_text = ""
+        next_actions = []
+        try:
+            with await llm_limiter.admit("narrator"):
+                events = stream_narration_events(
+                    client, relevant_facts, planner_output, payload.command, snapshot, db, turn_id=turn_id
+                )
+                async for event in iterate_in_threadpool(events):
+                    if event["type"] == "chunk":
+                        full_text += event["content"]
+                    elif event["type"] == "metadata":
+                        next_actions = event["next_actions"]
+                    yield _sse(event)
+            if key:
+                idempotency_cache.complete(key, NarratorOutput(markdown=full_text, next_actions=next_actions))
+        except OverloadedError as e:
+            # Headers are already sent: shed with an error event carrying the hint
+            if key:
+                idempotency_cache.fail(key, e)
+            yield _sse({'type': 'error', 'message': str(e), 'retry_after': e.retry_after})
+        except Exception as e:
+            error_trace = traceback.format_exc()
+            print(f"Error in streaming generation:\n{error_trace}", flush=True)
+            if key:
+                idempotency_cache.fail(key, e)
+            yield _sse({'type': 'error', 'message': str(e)})
+    
+    return _sse_response(generate(), on_close=finish_turn)
+
 
+async def _replay_turn(cached: Optional[NarratorOutput], running: Optional[asyncio.Future]):
+    """Stream a coalesced turn: wait for the leader if needed, then replay its result"""
+    try:
+        narrator_output = cached if cached is not None else await asyncio.shield(running)
+    except Exception as e:
+        yield _sse({'type': 'error', 'message': str(getattr(e, "detail", e))})
+        return
 
+    yield _sse({'type': 'chunk', 'content': narrator_output.markdown})
+    yield _sse({'type': 'metadata', 'next_actions': narrator_output.next_actions})
+    yield _sse({'type': 'done'})
@@ -0,0 +1,141 @@
+# WebSocket game transport - one persistent session per connection
+from typing import Optional, Dict, Any
+import asyncio
+import json
+import os
+import traceback
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from db.engine import SessionLocal
+from db.turns import next_turn
+from ai.context_engine import prepare_turn, stream_narration_events
+from ai.memory import get_shared_openai_client
+from ai.session import GameSession
+from ai.scheduler import llm_limiter, turn_scheduler, OverloadedError
+
+
+router = APIRouter()
+
+
+@router.websocket("/ws/play")
+async def play_ws(websocket: WebSocket, player_id: Optional[str] = None):
+    """
+    Bidirectional game transport.
+
+    The client sends JSON commands such as
+    ``{"id": "1", "command": "look around", "current_location_id": "..."}``
+    and may send several without waiting (pipelining); they are queued and
+    played in order. For each command the server streams the same events as
+    /play/stream (``chunk``, ``metadata``, ``done`` or ``error``), tagged with
+    the command's ``id``. ``{"type": "refresh"}`` drops the cached snapshot.
+
+    Each turn opens its own DB session, so no session outlives a turn or is
+    shared between the threads of different turns.
+    """
+    await websocket.accept()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        await websocket.send_json({
+            "type": "error",
+            "message": "OPENAI_API_KEY not found in environment variables."
+        })
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+
+    session = GameSession(player_id or "demo", get_shared_openai_client())
+    await websocket.send_json({"type": "session", "player_id": session.player_id})
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def receive_commands():
+        """Read messages as they arrive so commands can be pipelined"""
+        try:
+            while True:
+                raw = await websocket.receive_text()
+                try:
+                    await queue.put(json.loads(raw))
+                except json.JSONDecodeError:
+                    await queue.put({"type": "invalid", "raw": raw})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await queue.put(None)
+
+    receiver = asyncio.create_task(receive_commands())
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            await _handle_message(websocket, session, message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+async def _handle_message(
+    websocket: WebSocket,
+    session: GameSession,
+    message: Dict[str, Any]
+) -> None:
+    """Play a single queued command and stream its events back"""
+    message_id = message.get("id")
+
+    if message.get("type") == "refresh":
+        session.invalidate_snapshot()
+        await websocket.send_json({"type": "refreshed", "id": message_id})
+        return
+
+    command = message.get("command")
+    if not isinstance(command, str) or not command.strip():
+        await websocket.send_json({"type": "error", "id": message_id, "message": "Missing 'command'"})
+        return
+
+    db = SessionLocal()
+    try:
+        async with turn_scheduler.turn(session.player_id):
+            # Reserve LLM capacity on the event loop; shed turns don't use a turn number
+            with await llm_limiter.admit("turn"):
+                snapshot = session.get_snapshot(db, message.get("current_location_id"))
+                turn_id = await run_in_threadpool(next_turn, db, session.player_id)
+
+                # Pass A: retrieval and planning off the event loop
+                relevant_facts, planner_output = await run_in_threadpool(
+                    prepare_turn, session.openai_client, command, snapshot, allow_fast_turn=True
+                )
+
+            # Pass B: stream narration events as they are produced
+            with await llm_limiter.admit("narrator"):
+                events = stream_narration_events(
+                    session.openai_client, relevant_facts, planner_output, command, snapshot, db, turn_id=turn_id
+                )
+                async for event in iterate_in_threadpool(events):
+                    await websocket.send_json({**event, "id": message_id})
+
+            # The transcript is committed: rebuild the snapshot for the next turn
+            try:
+                await run_in_threadpool(session.refresh_snapshot, db)
+            except Exception as exc:
+                # The turn is already done; the next one rebuilds the snapshot itself
+                print(f"Snapshot refresh failed after /ws/play turn: {exc}", flush=True)
+
+        session.turns_played += 1
+    except WebSocketDisconnect:
+        raise
+    except OverloadedError as exc:
+        await websocket.send_json({
+            "type": "error",
+            "id": message_id,
+            "message": str(exc),
+            "retry_after": exc.retry_after,
+        })
+    except Exception as exc:
+        error_trace = traceback.format_exc()
+        print(f"Error in /ws/play turn:\n{error_trace}", flush=True)
+        await websocket.send_json({"type": "error", "id": message_id, "message": str(exc)})
+    finally:
+        db.close()
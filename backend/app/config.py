@@ -1,15 +1,144 @@
 # Configuration settings
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from dotenv import load_dotenv
+
+# Load the project root .env into os.environ once, before anything reads it.
+# Settings reads the same file for its own fields; the OpenAI key is also read
+# from the environment by scripts and the play routes.
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+load_dotenv(dotenv_path=PROJECT_ROOT / ".env")
 
 class Settings(BaseSettings):
     APP_NAME: str = "London Bleeds"
     DATABASE_URL: str = "sqlite:///game.db"
     OPENAI_API_KEY: str = ""
     
+    # Completed /play results are replayed for this long to duplicate Idempotency-Keys
+    IDEMPOTENCY_TTL_SECONDS: float = 300.0
+    
+    # Turn scheduling: per-player serialization and load shedding
+    TURN_QUEUE_MAX_DEPTH: int = 4  # running + waiting turns per player
+    TURN_QUEUE_MAX_TOTAL: int = 64  # waiting turns across all players
+    
+    # Global LLM admission control, sized to the OpenAI account tier
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_REQUESTS_PER_MINUTE: float = 500.0
+    LLM_ADMISSION_TIMEOUT_SECONDS: float = 5.0  # waited on the event loop to reserve a turn's first call
+    LLM_SLOT_TIMEOUT_SECONDS: float = 1.0  # waited by a worker thread for any other call
+    
+    # LLM resilience: per-attempt timeout, total deadline, retries, hedging, breaker
+    LLM_TIMEOUT_SECONDS: float = 45.0
+    LLM_DEADLINE_SECONDS: float = 90.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    
+    # Planner cache for repeated intents in identical game states
+    PLANNER_CACHE_ENABLED: bool = True
+    PLANNER_CACHE_TTL_SECONDS: float = 600.0
+    PLANNER_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Semantic intent cache: reuse plans for paraphrases above this cosine similarity
+    # that name the same targets
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    
+    # Prompt assembly: each stage's sections are fitted into a token budget
+    # by priority (intent or plan, then context, then retrieved facts)
+    RETRIEVAL_TOP_K: int = 3
+    PROMPT_TOKEN_BUDGET: int = 3000  # per-stage prompt ceiling
+    PROMPT_CONTEXT_TOKEN_BUDGET: int = 600
+    PROMPT_FACTS_TOKEN_BUDGET: int = 800
+    PROMPT_FACT_IMPORTANCE_WEIGHT: float = 0.1
+    
+    # Hybrid memory retrieval: BM25 (SQLite FTS5) and FAISS results fused by
+    # reciprocal rank; lexical search keeps working when embeddings are down
+    RETRIEVAL_HYBRID_ENABLED: bool = True
+    RETRIEVAL_CANDIDATES: int = 20  # per-list depth before fusion and re-ranking
+    RETRIEVAL_RRF_K: int = 60
+    # Text and metadata of recently retrieved memory docs kept per worker
+    MEMORY_DOC_CACHE_MAX_ENTRIES: int = 4096
+    # Memory-map the FAISS index read-only so worker processes share one copy
+    MEMORY_INDEX_MMAP: bool = True
+    # Where embeddings come from: the OpenAI API, or hashed character n-grams
+    # computed locally with NumPy (offline, deterministic; needs its own reindex)
+    EMBED_BACKEND: str = "openai"  # openai or local
+    # Embedding size and index encoding (both take a reindex; queries follow the
+    # saved index). EMBED_DIMENSIONS shortens vectors via the API, or sets the
+    # local backend's size (0 = the backend's full size: 3072 or 512);
+    # int8/binary indexes re-score RETRIEVAL_RESCORE_FACTOR x top_k candidates
+    # with float vectors kept on disk
+    EMBED_DIMENSIONS: int = 0
+    EMBED_QUANTIZATION: str = "none"  # none, int8 or binary
+    RETRIEVAL_RESCORE_FACTOR: int = 4
+    
+    # Re-ranking of retrieval candidates by relevance, importance and recency,
+    # then maximal marginal relevance (MMR) so near-duplicates don't fill top_k
+    RERANK_ENABLED: bool = True
+    RERANK_SIMILARITY_WEIGHT: float = 1.0
+    RERANK_IMPORTANCE_WEIGHT: float = 0.2
+    RERANK_RECENCY_WEIGHT: float = 0.3
+    RERANK_RECENCY_HALF_LIFE_HOURS: float = 72.0
+    RERANK_MMR_LAMBDA: float = 0.7  # 1.0 disables the diversity penalty
+    
+    # Bulk reindexing: docs are embedded in token-bounded batches, several at once
+    # under the embeddings rate limits, with progress checkpointed for resuming
+    REINDEX_BATCH_MAX_TOKENS: int = 20000
+    REINDEX_BATCH_MAX_DOCS: int = 256
+    REINDEX_CONCURRENCY: int = 4
+    REINDEX_CHECKPOINT_SECONDS: float = 30.0
+    REINDEX_TIMEOUT_SECONDS: float = 60.0  # per embeddings request
+    REINDEX_MAX_RETRIES: int = 5
+    EMBED_REQUESTS_PER_MINUTE: float = 3000.0
+    EMBED_TOKENS_PER_MINUTE: float = 1000000.0
+    
+    # Fast turns: low-risk streamed commands narrate and plan in a single call
+    FAST_TURN_ENABLED: bool = False
+    FAST_TURN_MAX_WORDS: int = 8
+    
+    # Model routing: simple intents use the small model, escalating to the large one
+    # on validation failure; complex (deduction) intents always use the large model
+    MODEL_ROUTING_ENABLED: bool = False
+    ROUTING_SIMPLE_MAX_WORDS: int = 12
+    PLANNER_MODEL: str = "gpt-4-turbo-preview"
+    PLANNER_SMALL_MODEL: str = "gpt-4o-mini"
+    NARRATOR_MODEL: str = "gpt-4-turbo-preview"
+    NARRATOR_SMALL_MODEL: str = "gpt-4o-mini"
+    
+    # Speculative prefetch of suggested next actions, capped in LLM calls per minute;
+    # its calls run on PREFETCH_MAX_WORKERS LLM slots of their own, apart from the turns' slots
+    PREFETCH_ENABLED: bool = False
+    PREFETCH_NARRATION: bool = False  # also pre-narrate, not just plan
+    PREFETCH_MAX_ACTIONS: int = 3
+    PREFETCH_TTL_SECONDS: float = 120.0
+    PREFETCH_MAX_WORKERS: int = 2
+    PREFETCH_MAX_CALLS_PER_MINUTE: float = 30.0
+    
+    # Episodic memory: a background summarizer condenses each player's transcript
+    # into player-scoped "transcript" memory docs that retrieval can surface.
+    # Enable it in one worker process only: workers don't coordinate passes
+    SUMMARY_ENABLED: bool = False
+    SUMMARY_INTERVAL_SECONDS: float = 60.0
+    SUMMARY_WINDOW_TURNS: int = 8  # turns condensed into one summary doc
+    SUMMARY_IDLE_FLUSH_SECONDS: float = 600.0  # summarize a shorter window once the player is idle
+    SUMMARY_MODEL: str = "gpt-4o-mini"
+    SUMMARY_MAX_TOKENS: int = 250
+    SUMMARY_MAX_CALLS_PER_MINUTE: float = 10.0
+    
+    # Startup warm-up of the index, world data, clients and turn pipeline;
+    # /health/ready answers 503 until every component is warm
+    WARMUP_ENABLED: bool = True
+    WARMUP_IN_BACKGROUND: bool = False  # serve at once, readiness reports progress
+    
     class Config:
         # Use absolute path to project root .env file
         # This ensures it works regardless of current working directory
-        env_file = Path(__file__).parent.parent.parent / ".env"
+        env_file = PROJECT_ROOT / ".env"
 
 settings = Settings()
@@ -0,0 +1,129 @@
+# Idempotency keys and in-flight request coalescing for turn endpoints
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import settings
+
+
+class IdempotencyMismatch(Exception):
+    """Raised when an Idempotency-Key is reused with a different request body"""
+
+
+class IdempotencyCache:
+    """
+    Coalesces duplicate turn requests that share an Idempotency-Key.
+
+    The first request for a key becomes the leader and runs the turn. Requests
+    arriving while it runs await the leader's future instead of starting their
+    own turn, and completed results are kept for ``ttl_seconds`` so late
+    retries are answered without any LLM calls or DB writes. Failed turns are
+    never cached, so a retry after an error runs again.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._completed: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def make_key(player_id: str, idempotency_key: str) -> str:
+        """Scope client-supplied keys per player"""
+        return f"{player_id}:{idempotency_key}"
+
+    @staticmethod
+    def fingerprint(*parts: Optional[str]) -> str:
+        """Hash of the request fields that must match for a key to be reused"""
+        return hashlib.sha256("\x1f".join(p or "" for p in parts).encode("utf-8")).hexdigest()
+
+    def get_completed(self, key: str, fingerprint: str) -> Optional[Any]:
+        """Return a cached result for key, or None if absent or expired"""
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        expires_at, cached_fingerprint, value = entry
+        if expires_at < time.monotonic():
+            del self._completed[key]
+            return None
+        if cached_fingerprint != fingerprint:
+            raise IdempotencyMismatch("Idempotency-Key was already used for a different request")
+        return value
+
+    def get_in_flight(self, key: str, fingerprint: str) -> Optional[asyncio.Future]:
+        """Return the future of a running turn for key, if any"""
+        entry = self._in_flight.get(key)
+        if entry is None:
+            return None
+        running_fingerprint, future = entry
+        if running_fingerprint != fingerprint:
+            raise IdempotencyMismatch("Idempotency-Key is in use by a different request")
+        return future
+
+    def begin(self, key: str, fingerprint: str) -> asyncio.Future:
+        """Register the caller as leader for key"""
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        return future
+
+    def complete(self, key: str, value: Any) -> None:
+        """Store the leader's result and wake up any attached followers"""
+        fingerprint, future = self._in_flight.pop(key)
+        if not future.done():
+            future.set_result(value)
+        self._completed[key] = (time.monotonic() + self.ttl_seconds, fingerprint, value)
+        self._completed.move_to_end(key)
+        self._evict()
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        """Propagate the leader's failure to followers without caching it"""
+        entry = self._in_flight.pop(key, None)
+        if entry is None:
+            return
+        _, future = entry
+        if not future.done():
+            future.set_exception(exc)
+            # Mark retrieved so an unobserved failure doesn't log a warning
+            future.exception()
+
+    async def run(self, key: str, fingerprint: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory once per key, coalescing concurrent and repeated calls.
+
+        Args:
+            key: Scoped idempotency key (see make_key)
+            fingerprint: Request fingerprint (see fingerprint)
+            factory: Coroutine function producing the result
+
+        Returns:
+            The leader's result, shared by all duplicates
+        """
+        cached = self.get_completed(key, fingerprint)
+        if cached is not None:
+            return cached
+
+        running = self.get_in_flight(key, fingerprint)
+        if running is not None:
+            return await asyncio.shield(running)
+
+        self.begin(key, fingerprint)
+        try:
+            value = await factory()
+        except BaseException as exc:
+            self.fail(key, exc)
+            raise
+        self.complete(key, value)
+        return value
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones beyond max_entries"""
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _, _) in self._completed.items() if expires_at < now]:
+            del self._completed[key]
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache(ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS)
@@ -3,15 +3,12 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from pathlib import Path
-from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import asyncio
 import traceback
 
-# Load .env file from project root at application startup
-# This ensures environment variables are available before any modules try to use them
-PROJECT_ROOT = Path(__file__).parent.parent.parent
-load_dotenv(dotenv_path=PROJECT_ROOT / ".env")
-
+# Importing settings loads the project root .env before any module reads it
 from .config import settings
 from .deps import get_db
 from api.routes_health import router as health_router
@@ -19,8 +16,34 @@ from api.routes_debug import router as debug_router
 from api.routes_debug_turns import router as debug_turns_router
 from api.routes_memory import router as memory_router
 from api.routes_play import router as play_router
+from api.routes_ws import router as ws_router
+from api.routes_metrics import router as metrics_router
+from .warmup import skip_warm_up, warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Preload the index, world data, clients and turn pipeline so the first
+    # turns don't pay for them; /health/ready reports progress
+    if not settings.WARMUP_ENABLED:
+        skip_warm_up()
+    elif settings.WARMUP_IN_BACKGROUND:
+        app.state.warmup_task = asyncio.create_task(run_in_threadpool(warm_up))
+    else:
+        await run_in_threadpool(warm_up)
+    
+    # Condense player transcripts into episodic memory in the background
+    if settings.SUMMARY_ENABLED:
+        from ai.memory import get_shared_openai_client
+        from ai.summarizer import summarizer
+        
+        summarizer.start(get_shared_openai_client)
+    yield
+    if settings.SUMMARY_ENABLED:
+        summarizer.stop()
+
 
-app = FastAPI(title=settings.APP_NAME)
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 # Global exception handler to ensure all errors return JSON
 from fastapi.exceptions import HTTPException as FastAPIHTTPException
@@ -57,3 +80,5 @@ app.include_router(debug_router, prefix="/debug", tags=["debug"])
 app.include_router(debug_turns_router, prefix="/debug/turns", tags=["debug", "turns"])
 app.include_router(memory_router, tags=["memory"])
 app.include_router(play_router, tags=["play"])
+app.include_router(ws_router, tags=["play"])
+app.include_router(metrics_router, tags=["metrics"])
@@ -0,0 +1,151 @@
+# Startup warm-up - preload what the first turns would otherwise pay for
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from ai.metrics import metrics
+from db.engine import get_engine
+from db.location_cards import get_location_card
+from db.world_graph import get_world_graph
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def _warm_database() -> str:
+    """Open (and return to the pool) a database connection"""
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return "connected"
+
+
+def _warm_world() -> str:
+    """Build the world graph and every location's context card"""
+    graph = get_world_graph()
+    if not len(graph):
+        raise RuntimeError("no locations loaded (is the database initialized and seeded?)")
+    for location_id in graph.ids:
+        get_location_card(location_id)
+    return f"{len(graph)} locations"
+
+
+def _warm_memory_index() -> str:
+    """Read the FAISS index into the shared cache and make sure the lexical index exists"""
+    from ai.lexical import ensure_lexical_index
+    from ai.memory import INDEX_PATH, get_index, index_embed_model, quantization_of
+
+    lexical = "lexical index created" if ensure_lexical_index() else "lexical index ready"
+    index = get_index()
+    # Retrieval works without a FAISS index (lexical only), so a missing one isn't an error
+    if index is None and INDEX_PATH.exists():
+        return f"FAISS index built with {index_embed_model()} unused until a reindex, {lexical}"
+    if index is None:
+        return f"no FAISS index, {lexical}"
+    return f"{index.ntotal} vectors ({index.d} dims, {quantization_of(index)}), {lexical}"
+
+
+def _warm_openai_client() -> str:
+    """Create the pooled OpenAI client used by the play routes"""
+    from ai.memory import get_shared_openai_client
+
+    get_shared_openai_client()
+    return "client created"
+
+
+def _warm_pipeline() -> str:
+    """Run the turn pipeline's local steps once: tokenizer, models and validators"""
+    from ai.markdown_utils import ensure_markdown_valid, extract_next_actions
+    from ai.models import PlannerOutput
+    from ai.prompt_builder import count_tokens
+    from ai.prompts import NARRATOR_INSTRUCTIONS, PLANNER_INSTRUCTIONS, SYSTEM_PROMPT
+    from ai.validators import check_red_lines, validate_plan
+
+    tokens = count_tokens(SYSTEM_PROMPT + PLANNER_INSTRUCTIONS + NARRATOR_INSTRUCTIONS)
+    plan = PlannerOutput.model_validate({"action": "look around", "targets": [], "state_changes": [], "notes": ""})
+    validate_plan(plan)
+    markdown = "### Warm-up\n\nThe fog lifts.\n\n**Next actions:**\n- look around"
+    ensure_markdown_valid(markdown)
+    extract_next_actions(markdown)
+    check_red_lines(markdown, {})
+    return f"{tokens} static prompt tokens"
+
+
+# Run in order: the world and index steps reuse the warmed database connection
+COMPONENTS: List[Tuple[str, Callable[[], str]]] = [
+    ("database", _warm_database),
+    ("world", _warm_world),
+    ("memory_index", _warm_memory_index),
+    ("openai_client", _warm_openai_client),
+    ("pipeline", _warm_pipeline),
+]
+
+
+class WarmupState:
+    """Per-component warm-up status, as reported by /health/ready"""
+
+    def __init__(self, components: List[str]):
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict[str, Any]] = {
+            name: {"status": PENDING, "seconds": None, "detail": ""} for name in components
+        }
+
+    def set(self, name: str, status: str, seconds: float = None, detail: str = "") -> None:
+        with self._lock:
+            self._components[name] = {"status": status, "seconds": seconds, "detail": detail}
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["status"] in (READY, SKIPPED) for c in self._components.values())
+
+    def report(self) -> Dict[str, Any]:
+        """Overall status (ready, warming or failed) and a copy of each component's state"""
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        statuses = {c["status"] for c in components.values()}
+        if statuses <= {READY, SKIPPED}:
+            status = "ready"
+        elif FAILED in statuses:
+            status = "failed"
+        else:
+            status = "warming"
+        return {"status": status, "ready": status == "ready", "components": components}
+
+
+warmup_state = WarmupState([name for name, _ in COMPONENTS])
+
+
+def warm_up(state: WarmupState = warmup_state) -> bool:
+    """
+    Warm every component, recording each one's status, duration and detail.
+
+    A failing component is reported (and logged) but doesn't stop the others
+    or the application: /health/ready keeps answering 503 for it.
+
+    Returns:
+        True if every component is ready
+    """
+    for name, warm in COMPONENTS:
+        start = time.perf_counter()
+        try:
+            detail = warm()
+            status = READY
+        except Exception as exc:
+            detail = f"{type(exc).__name__}: {exc}"
+            status = FAILED
+        seconds = time.perf_counter() - start
+
+        state.set(name, status, round(seconds, 4), detail)
+        metrics.set_gauge("warmup_ready", 1.0 if status == READY else 0.0, component=name)
+        metrics.observe("warmup_seconds", seconds, component=name)
+        print(f"Warm-up {name}: {status} in {seconds * 1000:.0f} ms ({detail})", flush=True)
+    return state.is_ready()
+
+
+def skip_warm_up(state: WarmupState = warmup_state) -> None:
+    """Mark every component as skipped (warm-up disabled): the app reports ready at once"""
+    for name, _ in COMPONENTS:
+        state.set(name, SKIPPED)
@@ -1,16 +1,41 @@
 # Database engine and session management
+import threading
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config import settings
 
+_engine = None
+_engine_lock = threading.Lock()
+
+
 def get_engine():
-    """Create and return SQLAlchemy engine for SQLite"""
-    return create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+    """Return the shared SQLAlchemy engine for SQLite, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+    return _engine
+
+
+class _LazyBindSession(Session):
+    """Session bound to the shared engine, so importing this module doesn't create it"""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
 
-engine = get_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SessionLocal = sessionmaker(class_=_LazyBindSession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+
+def __getattr__(name):
+    # ``from db.engine import engine`` keeps working, without an import-time engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_db():
     """Dependency that yields a database session and closes it on finally"""
     db = SessionLocal()
@@ -0,0 +1,122 @@
+# Location context cards - read-through cache of what a location looks like
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+import orjson
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from db.engine import SessionLocal
+from db.models import Location, Character, Item
+from db.world_graph import get_world_graph
+from db.world_version import LOCATION_CARDS, read_world_version
+
+_lock = threading.Lock()
+_cards: Dict[str, Dict[str, Any]] = {}
+_generation = 0
+# LOCATION_CARDS version the cached cards were built at
+_cards_version = 0
+
+
+def build_location_card(db: Session, location_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Build the context card for a location.
+
+    Returns:
+        Dict with id, name, atmosphere, characters, items and exits
+        (each entity as {"id", "name"}), or None if the location doesn't exist
+    """
+    location = db.query(Location.id, Location.name, Location.atmosphere).filter(Location.id == location_id).first()
+    if location is None:
+        return None
+
+    characters = (
+        db.query(Character.id, Character.name)
+        .filter(Character.last_known_location_id == location_id)
+        .order_by(Character.id)
+        .all()
+    )
+    items = (
+        db.query(Item.id, Item.name, Item.kind)
+        .filter(Item.location_id == location_id)
+        .order_by(Item.id)
+        .all()
+    )
+    graph = get_world_graph(db)
+    return {
+        "id": location.id,
+        "name": location.name,
+        "atmosphere": location.atmosphere,
+        "characters": [{"id": c.id, "name": c.name} for c in characters],
+        "items": [{"id": i.id, "name": i.name, "kind": i.kind} for i in items],
+        "exits": [{"id": exit_id, "name": graph.name(exit_id)} for exit_id in graph.exits(location_id)],
+    }
+
+
+def get_location_card(location_id: Optional[str], db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return a location's context card, building it on first use.
+
+    Cards are shared and must not be mutated. Reads check the LOCATION_CARDS
+    world version (see read_world_version()) and drop every cached card once
+    a seed upsert, from any process, has bumped it; until then turns don't
+    query characters and items.
+
+    Args:
+        location_id: Location to describe
+        db: Session to build with; a short-lived one is opened if None
+
+    Returns:
+        The card, or None for unknown locations (or before the tables exist)
+    """
+    global _cards_version, _generation
+    if not location_id:
+        return None
+    version = read_world_version(LOCATION_CARDS)
+    with _lock:
+        if version != _cards_version:
+            _cards.clear()
+            _cards_version = version
+            _generation += 1
+        card = _cards.get(location_id)
+        generation = _generation
+    if card is not None:
+        return card
+
+    session = db if db is not None else SessionLocal()
+    try:
+        card = build_location_card(session, location_id)
+    except OperationalError as exc:
+        print(f"Location cards unavailable, database not initialized: {exc}", flush=True)
+        return None
+    finally:
+        if db is None:
+            session.close()
+
+    with _lock:
+        # Don't cache a card built from data an upsert has since replaced
+        if card is not None and generation == _generation:
+            _cards[location_id] = card
+    return card
+
+
+def location_card_digest(location_id: Optional[str]) -> Optional[str]:
+    """
+    Content hash of a location's card (None if it has none), for cache keys
+    of anything built from it: the same in every process, and different
+    once an upsert changes who or what is there.
+    """
+    card = get_location_card(location_id)
+    if card is None:
+        return None
+    return hashlib.sha256(orjson.dumps(card)).hexdigest()[:16]
+
+
+def invalidate_location_cards(*location_ids: Optional[str]) -> None:
+    """Drop this process's cards for the given locations, or all cards if none are given"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if not location_ids:
+            _cards.clear()
+        for location_id in location_ids:
+            _cards.pop(location_id, None)
@@ -269,6 +269,24 @@ class TranscriptEvent(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
+class PlayerTurnCounter(Base):
+    __tablename__ = "player_turn_counters"
+
+    player_id = Column(String, primary_key=True)
+    last_turn = Column(Integer, nullable=False, default=0)  # last turn number handed out (see db/turns.py)
+
+    def __repr__(self):
+        return f"<PlayerTurnCounter(player_id='{self.player_id}', last_turn={self.last_turn})>"
+
+class WorldVersion(Base):
+    __tablename__ = "world_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # bumped by seed upserts (see db/world_version.py)
+
+    def __repr__(self):
+        return f"<WorldVersion(name='{self.name}', version={self.version})>"
+
 class SaveSlot(Base):
     __tablename__ = "save_slots"
     __table_args__ = (
@@ -326,14 +344,19 @@ class MemoryDoc(Base):
         Index('idx_memory_kind', 'kind'),
         Index('idx_memory_stale', 'stale'),
         Index('idx_memory_entity', 'entity_id'),
+        Index('idx_memory_player', 'player_id'),
+        # One transcript summary per window end, whichever worker writes it first
+        Index('uq_memory_player_source_event', 'player_id', 'source_event_id', unique=True),
     )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     kind = Column(String)  # seed_lore | lore_rule | known_fact | entity_card | transcript
     entity_id = Column(String, nullable=True)
+    player_id = Column(String, nullable=True)  # None: shared by all players
     text = Column(Text)
     importance = Column(Integer, default=0)
     stale = Column(Boolean, default=False)
+    source_event_id = Column(Integer, nullable=True)  # transcript summaries: last TranscriptEvent covered
     created_at = Column(DateTime, default=datetime.utcnow)
     
     def __repr__(self):
@@ -344,8 +367,10 @@ class MemoryDoc(Base):
             "id": self.id,
             "kind": self.kind,
             "entity_id": self.entity_id,
+            "player_id": self.player_id,
             "text": self.text,
             "importance": self.importance,
             "stale": self.stale,
+            "source_event_id": self.source_event_id,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
@@ -4,6 +4,9 @@ import os
 from sqlalchemy.orm import Session
 from .models import Location, Character, Item, LoreFact, TimelineEvent, Mystery
 from .json_utils import dumps
+from .world_graph import invalidate_world_graph
+from .location_cards import invalidate_location_cards
+from .world_version import LOCATION_CARDS, WORLD_GRAPH, bump_world_version
 
 def load_json_file(file_path: str) -> list:
     """Load JSON data from file"""
@@ -22,6 +25,8 @@ def upsert_location(db: Session, data: dict):
         raise ValueError(f"Location {data.get('id', 'unknown')} missing required field: 'name'")
     
     location = db.query(Location).filter(Location.id == data['id']).first()
+    graph_before = (location.name, location.exits_json) if location else None
+    atmosphere_before = location.atmosphere if location else None
     
     if location:
         # Update existing (respect immutable flag)
@@ -45,7 +50,22 @@ def upsert_location(db: Session, data: dict):
         )
         db.add(location)
     
+    # The world graph only depends on names and exits; cards also show
+    # neighbours' names, so drop them all. Other processes drop theirs once
+    # they see the bumped version
+    graph_changed = graph_before != (location.name, location.exits_json)
+    atmosphere_changed = atmosphere_before != location.atmosphere
+    if graph_changed:
+        bump_world_version(db, WORLD_GRAPH)
+    if graph_changed or atmosphere_changed:
+        bump_world_version(db, LOCATION_CARDS)
     db.commit()
+    
+    if graph_changed:
+        invalidate_world_graph()
+        invalidate_location_cards()
+    elif atmosphere_changed:
+        invalidate_location_cards(location.id)
     return location
 
 def upsert_character(db: Session, data: dict):
@@ -57,6 +77,7 @@ def upsert_character(db: Session, data: dict):
         raise ValueError(f"Character {data.get('id', 'unknown')} missing required field: 'name'")
     
     character = db.query(Character).filter(Character.id == data['id']).first()
+    before = (character.name, character.last_known_location_id) if character else (None, None)
     
     if character:
         # Update existing (respect immutable flag)
@@ -80,7 +101,13 @@ def upsert_character(db: Session, data: dict):
         )
         db.add(character)
     
+    changed = before != (character.name, character.last_known_location_id)
+    if changed:
+        bump_world_version(db, LOCATION_CARDS)
     db.commit()
+    
+    if changed:
+        invalidate_location_cards(before[1], character.last_known_location_id)
     return character
 
 def upsert_item(db: Session, data: dict):
@@ -92,6 +119,7 @@ def upsert_item(db: Session, data: dict):
         raise ValueError(f"Item {data.get('id', 'unknown')} missing required field: 'name'")
     
     item = db.query(Item).filter(Item.id == data['id']).first()
+    before = (item.name, item.kind, item.location_id) if item else (None, None, None)
     
     if item:
         # Update existing (respect immutable flag)
@@ -116,7 +144,13 @@ def upsert_item(db: Session, data: dict):
         )
         db.add(item)
     
+    changed = before != (item.name, item.kind, item.location_id)
+    if changed:
+        bump_world_version(db, LOCATION_CARDS)
     db.commit()
+    
+    if changed:
+        invalidate_location_cards(before[2], item.location_id)
     return item
 
 def upsert_lore_fact(db: Session, data: dict):
@@ -0,0 +1,43 @@
+# Per-player turn sequencing
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from db.models import PlayerTurnCounter, TranscriptEvent
+
+_counters = PlayerTurnCounter.__table__
+
+
+def next_turn(db: Session, player_id: str) -> int:
+    """
+    Allocate the next turn number for a player.
+
+    The counter is a player_turn_counters row incremented with
+    ``UPDATE ... RETURNING`` in its own short transaction on the session's
+    engine, so every worker process (and script) draws from the same
+    sequence and the row isn't locked for the rest of the turn. A player's
+    first allocation seeds the row from MAX(transcript_events.turn), an
+    index-only lookup on idx_transcript_player_turn; concurrent seeders
+    insert-or-ignore, so exactly one seed wins. Turns that fail before their
+    transcript is saved leave a gap, so numbers are strictly increasing but
+    not necessarily dense.
+    """
+    increment = (
+        update(_counters)
+        .where(_counters.c.player_id == player_id)
+        .values(last_turn=_counters.c.last_turn + 1)
+        .returning(_counters.c.last_turn)
+    )
+    engine = db.get_bind()
+    with engine.begin() as connection:
+        turn = connection.execute(increment).scalar()
+    if turn is not None:
+        return turn
+
+    with engine.connect() as connection:
+        seed = connection.execute(
+            select(func.max(TranscriptEvent.turn)).where(TranscriptEvent.player_id == player_id)
+        ).scalar() or 0
+    with engine.begin() as connection:
+        connection.execute(
+            insert(_counters).values(player_id=player_id, last_turn=seed).prefix_with("OR IGNORE")
+        )
+        return connection.execute(increment).scalar()
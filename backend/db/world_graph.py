@@ -0,0 +1,177 @@
+# World graph - immutable in-memory map of locations and their exits
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from db.engine import SessionLocal
+from db.models import Location
+from db.json_utils import loads
+from db.world_version import WORLD_GRAPH, read_world_version
+
+_UNREACHABLE = -1
+
+
+class WorldGraph:
+    """
+    Immutable snapshot of the location graph.
+
+    Locations are numbered 0..n-1 in id order and exits are stored as an
+    adjacency tuple of neighbour indices. All-pairs shortest paths are
+    computed once by a BFS from every location (the map is small and
+    unweighted), so movement and distance questions are table lookups.
+    """
+
+    __slots__ = ("ids", "names", "index", "adjacency", "dangling_exits", "_distances", "_next_hop")
+
+    def __init__(self, locations: Iterable[Dict[str, Any]]):
+        records = sorted(locations, key=lambda loc: loc["id"])
+        self.ids: Tuple[str, ...] = tuple(loc["id"] for loc in records)
+        self.names: Tuple[str, ...] = tuple(loc.get("name") or loc["id"] for loc in records)
+        self.index: Dict[str, int] = {location_id: i for i, location_id in enumerate(self.ids)}
+
+        adjacency = []
+        dangling = []
+        for loc in records:
+            neighbours = []
+            for target in _exit_targets(loc.get("exits")):
+                if target in self.index:
+                    if self.index[target] not in neighbours:
+                        neighbours.append(self.index[target])
+                else:
+                    dangling.append((loc["id"], target))
+            adjacency.append(tuple(neighbours))
+        self.adjacency: Tuple[Tuple[int, ...], ...] = tuple(adjacency)
+        # Exits pointing at locations that don't exist, as (from id, to id)
+        self.dangling_exits: Tuple[Tuple[str, str], ...] = tuple(dangling)
+
+        searches = [self._bfs(source) for source in range(len(self.ids))]
+        self._distances: Tuple[Tuple[int, ...], ...] = tuple(distances for distances, _ in searches)
+        self._next_hop: Tuple[Tuple[int, ...], ...] = tuple(next_hop for _, next_hop in searches)
+
+    def _bfs(self, source: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Hop counts from source, and the first hop on a shortest path to each location"""
+        distance = [_UNREACHABLE] * len(self.ids)
+        first_hop = [_UNREACHABLE] * len(self.ids)
+        distance[source] = 0
+        first_hop[source] = source
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for neighbour in self.adjacency[current]:
+                if distance[neighbour] == _UNREACHABLE:
+                    distance[neighbour] = distance[current] + 1
+                    first_hop[neighbour] = neighbour if current == source else first_hop[current]
+                    queue.append(neighbour)
+        return tuple(distance), tuple(first_hop)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self.index
+
+    def name(self, location_id: str) -> Optional[str]:
+        i = self.index.get(location_id)
+        return None if i is None else self.names[i]
+
+    def exits(self, location_id: str) -> Tuple[str, ...]:
+        """Ids of locations reachable in one move"""
+        i = self.index.get(location_id)
+        return () if i is None else tuple(self.ids[j] for j in self.adjacency[i])
+
+    def distance(self, from_id: str, to_id: str) -> Optional[int]:
+        """Fewest moves between two locations, or None if unknown/unreachable"""
+        i, j = self.index.get(from_id), self.index.get(to_id)
+        if i is None or j is None or self._distances[i][j] == _UNREACHABLE:
+            return None
+        return self._distances[i][j]
+
+    def is_adjacent(self, from_id: str, to_id: str) -> bool:
+        return self.distance(from_id, to_id) == 1
+
+    def shortest_path(self, from_id: str, to_id: str) -> Optional[List[str]]:
+        """Location ids from start to destination inclusive, or None if unreachable"""
+        if self.distance(from_id, to_id) is None:
+            return None
+        i, j = self.index[from_id], self.index[to_id]
+        path = [i]
+        while path[-1] != j:
+            path.append(self._next_hop[path[-1]][j])
+        return [self.ids[k] for k in path]
+
+    def unreachable_from(self, location_id: str) -> List[str]:
+        """Locations that can't be reached from the given one"""
+        i = self.index.get(location_id)
+        if i is None:
+            return list(self.ids)
+        return [self.ids[j] for j, d in enumerate(self._distances[i]) if d == _UNREACHABLE]
+
+
+def _exit_targets(exits: Any) -> List[str]:
+    """Target ids from an exits list (dicts with 'to', or plain ids)"""
+    targets = []
+    for exit in exits or []:
+        if isinstance(exit, dict) and exit.get("to"):
+            targets.append(exit["to"])
+        elif isinstance(exit, str):
+            targets.append(exit)
+    return targets
+
+
+def build_world_graph(db: Session) -> WorldGraph:
+    """Build a graph from the locations table"""
+    rows = db.query(Location.id, Location.name, Location.exits_json).all()
+    return WorldGraph(
+        {"id": row.id, "name": row.name, "exits": loads(row.exits_json) if row.exits_json else []}
+        for row in rows
+    )
+
+
+_lock = threading.Lock()
+_graph: Optional[WorldGraph] = None
+_graph_version = 0  # WORLD_GRAPH version the cached graph was built at
+
+
+def get_world_graph(db: Optional[Session] = None) -> WorldGraph:
+    """
+    Return the shared world graph, building it on first use.
+
+    The graph is rebuilt after invalidate_world_graph(), which
+    upsert_location() calls when a location's name or exits change, and
+    in every other process once it reads the WORLD_GRAPH world version
+    the upsert bumped (see read_world_version()).
+
+    Args:
+        db: Session to build with; a short-lived one is opened if None
+
+    Returns:
+        The graph (empty, and not cached, if the tables don't exist yet)
+    """
+    global _graph, _graph_version
+    version = read_world_version(WORLD_GRAPH)
+    graph = _graph
+    if graph is not None and _graph_version == version:
+        return graph
+
+    with _lock:
+        if _graph is not None and _graph_version == version:
+            return _graph
+        session = db if db is not None else SessionLocal()
+        try:
+            _graph = build_world_graph(session)
+            _graph_version = version
+        except OperationalError as exc:
+            print(f"World graph unavailable, database not initialized: {exc}", flush=True)
+            return WorldGraph([])
+        finally:
+            if db is None:
+                session.close()
+        return _graph
+
+
+def invalidate_world_graph() -> None:
+    """Drop this process's graph so the next access rebuilds it"""
+    global _graph
+    with _lock:
+        _graph = None
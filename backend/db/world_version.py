@@ -0,0 +1,59 @@
+# World data versions - tell every process when seeded world data has changed
+import threading
+import time
+from typing import Dict, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from db.engine import get_engine
+from db.models import WorldVersion
+
+_versions = WorldVersion.__table__
+
+# Bumped when anything shown on a location card changes
+LOCATION_CARDS = "location_cards"
+# Bumped when a location's name or exits change
+WORLD_GRAPH = "world_graph"
+
+# How long a version read is reused: caches lag a seed by at most this long
+VERSION_CHECK_SECONDS = 1.0
+
+_lock = threading.Lock()
+_checked: Dict[str, Tuple[float, int]] = {}  # name -> (monotonic time read, version)
+
+
+def bump_world_version(db: Session, name: str) -> None:
+    """
+    Mark world data as changed, in the caller's transaction.
+
+    Caches built from that data in any process (seeding scripts included)
+    compare read_world_version() with the version they were built at, so
+    they drop their copy once the change is committed.
+    """
+    db.execute(insert(_versions).values(name=name, version=0).prefix_with("OR IGNORE"))
+    db.execute(update(_versions).where(_versions.c.name == name).values(version=_versions.c.version + 1))
+
+
+def read_world_version(name: str) -> int:
+    """
+    Current version of some world data.
+
+    One primary key lookup, done at most every VERSION_CHECK_SECONDS per
+    process so caches can check it on every read.
+
+    Returns:
+        The version, or 0 if it was never bumped (or the table doesn't exist yet)
+    """
+    now = time.monotonic()
+    with _lock:
+        checked = _checked.get(name)
+    if checked is not None and now - checked[0] < VERSION_CHECK_SECONDS:
+        return checked[1]
+    try:
+        with get_engine().connect() as connection:
+            version = connection.execute(select(_versions.c.version).where(_versions.c.name == name)).scalar() or 0
+    except OperationalError:
+        return 0
+    with _lock:
+        _checked[name] = (now, version)
+    return version
@@ -0,0 +1,30 @@
+"""memory_docs transcript summary watermark
+
+Revision ID: 3b7f5e91c4d8
+Revises: 8e4b0c6d2a17
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7f5e91c4d8'
+down_revision: Union[str, Sequence[str], None] = '8e4b0c6d2a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Last transcript event condensed into a summary doc (see ai/summarizer.py)
+    op.add_column('memory_docs', sa.Column('source_event_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('memory_docs') as batch_op:
+        batch_op.drop_column('source_event_id')
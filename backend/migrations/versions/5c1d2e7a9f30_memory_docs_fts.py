@@ -0,0 +1,52 @@
+"""memory_docs full-text index
+
+Revision ID: 5c1d2e7a9f30
+Revises: 18b0f21d98b4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1d2e7a9f30'
+down_revision: Union[str, Sequence[str], None] = '18b0f21d98b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # External-content FTS5 index over memory_docs (see ai/lexical.py),
+    # kept in sync by triggers and filled from the existing rows
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS memory_docs_fts USING fts5("
+        "text, entity_id, content='memory_docs', content_rowid='id', tokenize='porter unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS memory_docs_fts_ai AFTER INSERT ON memory_docs BEGIN "
+        "INSERT INTO memory_docs_fts(rowid, text, entity_id) VALUES (new.id, new.text, new.entity_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS memory_docs_fts_ad AFTER DELETE ON memory_docs BEGIN "
+        "INSERT INTO memory_docs_fts(memory_docs_fts, rowid, text, entity_id) "
+        "VALUES ('delete', old.id, old.text, old.entity_id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS memory_docs_fts_au AFTER UPDATE OF text, entity_id ON memory_docs BEGIN "
+        "INSERT INTO memory_docs_fts(memory_docs_fts, rowid, text, entity_id) "
+        "VALUES ('delete', old.id, old.text, old.entity_id); "
+        "INSERT INTO memory_docs_fts(rowid, text, entity_id) VALUES (new.id, new.text, new.entity_id); END"
+    )
+    op.execute("INSERT INTO memory_docs_fts(memory_docs_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS memory_docs_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS memory_docs_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS memory_docs_fts_ai")
+    op.execute("DROP TABLE IF EXISTS memory_docs_fts")
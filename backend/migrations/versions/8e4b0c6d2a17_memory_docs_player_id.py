@@ -0,0 +1,32 @@
+"""memory_docs player scope
+
+Revision ID: 8e4b0c6d2a17
+Revises: 5c1d2e7a9f30
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b0c6d2a17'
+down_revision: Union[str, Sequence[str], None] = '5c1d2e7a9f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Player-scoped memory docs; NULL keeps existing docs shared by all players
+    op.add_column('memory_docs', sa.Column('player_id', sa.String(), nullable=True))
+    op.create_index('idx_memory_player', 'memory_docs', ['player_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_memory_player', table_name='memory_docs')
+    with op.batch_alter_table('memory_docs') as batch_op:
+        batch_op.drop_column('player_id')
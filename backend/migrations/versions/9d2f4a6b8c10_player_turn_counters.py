@@ -0,0 +1,34 @@
+"""player turn counters
+
+Revision ID: 9d2f4a6b8c10
+Revises: 3b7f5e91c4d8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f4a6b8c10'
+down_revision: Union[str, Sequence[str], None] = '3b7f5e91c4d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-player turn sequence shared by all worker processes (see db/turns.py);
+    # rows are seeded from transcript_events on a player's first turn
+    op.create_table(
+        'player_turn_counters',
+        sa.Column('player_id', sa.String(), primary_key=True),
+        sa.Column('last_turn', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('player_turn_counters')
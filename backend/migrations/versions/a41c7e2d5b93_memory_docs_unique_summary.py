@@ -0,0 +1,31 @@
+"""memory_docs unique transcript summary window
+
+Revision ID: a41c7e2d5b93
+Revises: 9d2f4a6b8c10
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e2d5b93'
+down_revision: Union[str, Sequence[str], None] = '9d2f4a6b8c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Summarizers in several workers may race on a window; only one summary is kept
+    op.create_index(
+        'uq_memory_player_source_event', 'memory_docs', ['player_id', 'source_event_id'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_memory_player_source_event', table_name='memory_docs')
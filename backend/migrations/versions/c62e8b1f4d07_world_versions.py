@@ -0,0 +1,34 @@
+"""world versions
+
+Revision ID: c62e8b1f4d07
+Revises: a41c7e2d5b93
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c62e8b1f4d07'
+down_revision: Union[str, Sequence[str], None] = 'a41c7e2d5b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Versions of seeded world data, bumped by seed upserts and checked by the
+    # caches built from it in every process (see db/world_version.py)
+    op.create_table(
+        'world_versions',
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('world_versions')
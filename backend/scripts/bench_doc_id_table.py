@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the binary doc id table against the old JSON mapping.
+
+Writes an index-sized position -> MemoryDoc id mapping both ways in a
+scratch directory (the JSON file older versions saved, and the int64 .npy
+table that replaced it), then times loading each and translating a turn's
+worth of lookups in both directions: search hits to doc ids, and a filter's
+allowed doc ids to index positions. Also checks that a legacy JSON mapping
+is converted to the table on first load and that both give the same answers.
+
+Usage: python scripts/bench_doc_id_table.py [n_docs]
+"""
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+import ai.memory as memory
+
+REPEATS = 5
+HITS = 50          # search results translated per query
+ALLOWED = 5000     # doc ids a filter translates to positions
+
+
+def timed(fn, repeats: int = REPEATS) -> float:
+    """Median wall time of fn() in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def json_load(path: Path):
+    """What load_mapping() and get_mapping() used to do"""
+    with open(path, 'r') as f:
+        mapping = {int(k): int(v) for k, v in json.load(f).items()}
+    return mapping, {doc_id: position for position, doc_id in mapping.items()}
+
+
+def main(n_docs: int = 1_000_000) -> bool:
+    data = Path(tempfile.mkdtemp(prefix="doc-id-table-"))
+    memory.DOC_IDS_PATH = data / "faiss_doc_ids.npy"
+    memory.LEGACY_MAPPING_PATH = data / "faiss_mapping.json"
+
+    rng = np.random.default_rng(0)
+    # Doc ids with gaps (stale docs are dropped at reindex), in index order
+    doc_ids = np.sort(rng.choice(n_docs * 2, size=n_docs, replace=False)).astype("int64") + 1
+    with open(memory.LEGACY_MAPPING_PATH, 'w') as f:
+        json.dump({str(i): int(doc_id) for i, doc_id in enumerate(doc_ids)}, f)
+
+    results = []
+    table = memory.get_doc_id_table()
+    converted = memory.DOC_IDS_PATH.exists() and np.array_equal(table.doc_ids, doc_ids)
+    results.append(("legacy JSON mapping converted on first load", converted))
+
+    hits = rng.integers(-1, n_docs, size=HITS)  # FAISS pads missing results with -1
+    allowed = np.concatenate([rng.choice(doc_ids, size=ALLOWED - 10), [0, -5, n_docs * 3] * 3 + [7]])
+    mapping, positions = json_load(memory.LEGACY_MAPPING_PATH)
+    expected_ids = [mapping.get(int(p), -1) for p in hits]
+    expected_positions = [positions.get(int(d), -1) for d in allowed.tolist()]
+    results.append(("same doc ids as the JSON mapping", table.doc_ids_at(hits).tolist() == expected_ids))
+    results.append(("same positions as the JSON mapping", table.positions_of(allowed).tolist() == expected_positions))
+
+    json_mb = memory.LEGACY_MAPPING_PATH.stat().st_size / 2**20
+    npy_mb = memory.DOC_IDS_PATH.stat().st_size / 2**20
+    json_ms = timed(lambda: json_load(memory.LEGACY_MAPPING_PATH), repeats=3)
+    npy_ms = timed(lambda: memory.DocIdTable(memory.load_doc_ids()))
+    # Reverse lookups sort the table once per load
+    first_reverse_ms = timed(lambda: memory.DocIdTable(memory.load_doc_ids()).positions_of(allowed))
+    dict_hits_ms = timed(lambda: [mapping[int(p)] for p in hits if int(p) in mapping])
+    table_hits_ms = timed(lambda: table.doc_ids_at(hits))
+    dict_allowed_ms = timed(lambda: [positions[d] for d in allowed.tolist() if d in positions])
+    table_allowed_ms = timed(lambda: table.positions_of(allowed))
+
+    print(f"{n_docs} indexed docs: JSON mapping {json_mb:.1f} MB, doc id table {npy_mb:.1f} MB")
+    print("=" * 62)
+    print(f"{'operation':<34} | {'JSON + dicts':>12} | {'table':>9}")
+    print(f"{'load':<34} | {json_ms:>9.1f} ms | {npy_ms:>6.2f} ms")
+    print(f"{'first reverse lookup after load':<34} | {'-':>12} | {first_reverse_ms:>6.1f} ms")
+    print(f"{f'{HITS} hits -> doc ids':<34} | {dict_hits_ms:>9.3f} ms | {table_hits_ms:>6.3f} ms")
+    print(f"{f'{ALLOWED} allowed doc ids -> positions':<34} | {dict_allowed_ms:>9.3f} ms | {table_allowed_ms:>6.3f} ms")
+    print("=" * 62)
+
+    results.append((f"table loads faster than the JSON mapping ({npy_ms:.2f} vs {json_ms:.0f} ms)", npy_ms < json_ms))
+    results.append(("table is smaller on disk", npy_mb < json_mb))
+    for label, passed in results:
+        print(f"  {'✓' if passed else '✗'} {label}")
+    return all(passed for _, passed in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(*[int(arg) for arg in sys.argv[1:2]]) else 1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare time-to-first-token of two-pass and fast (single-call) turns.
+
+Plays the same low-risk commands through prepare_turn() and
+stream_narration_events() against the local stub client, once with the
+separate planner pass and once as fast turns, and reports time to the
+first narration chunk and to the finished turn. Plan caches are disabled
+so every turn pays for its LLM calls.
+
+Usage: python scripts/bench_fast_turn.py [latency_seconds] [turns]
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ai.context_engine import prepare_turn, stream_narration_events
+from ai.intent import TURN_MODE_FAST, classify_intent
+from app.config import settings
+from db.models import Base
+from scripts.stub_openai import StubOpenAI
+
+COMMANDS = ["look around", "examine the letter", "go north", "walk to the window", "read the newspaper"]
+SNAPSHOT = {"player": {"id": "bench", "current_location_id": "221b_baker_street"}, "inventory": []}
+
+
+def play(client, db, command: str, fast: bool):
+    """Seconds to the first chunk and to the end of the turn"""
+    start = time.perf_counter()
+    first_chunk = None
+    relevant_facts, plan = prepare_turn(client, command, SNAPSHOT, relevant_facts="", allow_fast_turn=fast)
+    for event in stream_narration_events(client, relevant_facts, plan, command, SNAPSHOT, db):
+        if event["type"] == "chunk" and first_chunk is None:
+            first_chunk = time.perf_counter() - start
+    return first_chunk, time.perf_counter() - start
+
+
+def _ms(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] * 1000
+
+
+def main(latency: float = 0.4, turns: int = 20) -> bool:
+    settings.PLANNER_CACHE_ENABLED = False
+    settings.SEMANTIC_CACHE_ENABLED = False
+    settings.FAST_TURN_ENABLED = True
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    print(f"Fast turn benchmark: {turns} turns per mode, stub latency {latency * 1000:.0f}ms per call")
+    print("=" * 70)
+    print("Classifier: " + ", ".join(f"{c!r}={classify_intent(c)}" for c in COMMANDS + ["take the letter"]))
+    print("=" * 70)
+    print(f"{'mode':<9} | {'calls':>5} | {'TTFT p50':>9} | {'TTFT p95':>9} | {'turn p50':>9}")
+
+    results = {}
+    for mode, fast in [("two_pass", False), ("fast", True)]:
+        client = StubOpenAI(latency=latency, jitter=latency * 0.25, chunk_delay=0.002, seed=1)
+        ttft, total = [], []
+        for i in range(turns):
+            first, end = play(client, db, COMMANDS[i % len(COMMANDS)], fast)
+            ttft.append(first)
+            total.append(end)
+        results[mode] = statistics.median(ttft)
+        print(f"{mode:<9} | {client.calls:>5} | {_ms(ttft, 50):>7.0f}ms | {_ms(ttft, 95):>7.0f}ms | {_ms(total, 50):>7.0f}ms")
+
+    db.close()
+    speedup = results["two_pass"] / results["fast"]
+    print("=" * 70)
+    print(f"Fast turns reach the first token {speedup:.1f}x sooner")
+    return all(classify_intent(c) == TURN_MODE_FAST for c in COMMANDS) and speedup > 1
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ok = main(float(args[0]) if args else 0.4, int(args[1]) if len(args) > 1 else 20)
+    sys.exit(0 if ok else 1)
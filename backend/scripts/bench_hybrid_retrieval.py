@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark recall and latency of lexical, dense and hybrid memory retrieval.
+
+Builds a memory corpus from the seed data (lore facts plus one card per
+character, item, location and timeline scene) in a scratch database, and a
+labeled query set from it: every entity's exact name and id, plus
+hand-labeled natural-language queries. Each query is answered by
+
+- lexical: BM25 over the SQLite FTS5 index (offline)
+- dense: FAISS inner product over embeddings (needs the embeddings API)
+- hybrid: both lists fused by reciprocal rank, as retrieve_facts() does
+
+and scored by recall@k and mean reciprocal rank. Latency excludes the
+query embedding call, which is reported separately. Without embeddings only
+the lexical (offline fallback) numbers are produced.
+
+Usage: python scripts/bench_hybrid_retrieval.py [k]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="hybrid-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+from app.config import settings
+from ai.lexical import lexical_search
+from ai.memory import reciprocal_rank_fusion, retrieve_facts
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+from scripts.init_db import init_database
+
+SEED_DIR = Path(__file__).parent.parent / "seed"
+
+# Hand-labeled queries: relevant docs by entity id, or "lore:<n>" for the
+# n-th fact in seed/lore.json
+NATURAL_QUERIES = [
+    ("who drives the phantom coach through the fog", ["lore:7", "whitechapel_streets", "timeline_act1_scene4", "coach_route_abstraction"]),
+    ("what are the missing markers Harper, Lamb and Beadle", ["holmes_murder_map", "timeline_act1_scene1"]),
+    ("read the note written in red ink", ["red_ink_note", "timeline_act1_epilogue"]),
+    ("how is Watson's mind stability holding up", ["lore:6", "timeline_act1_scene5"]),
+    ("who borrowed the surgical saw", ["greel_tool_ledger", "timeline_act1_scene3"]),
+    ("does Watson trust Holmes", ["lore:5", "timeline_act1_scene5"]),
+    ("search the Yard's records office for misfiled evidence", ["lore:3", "scotland_yard_records", "timeline_act1_scene2"]),
+    ("a masked coachman near Miller's Court", ["suppressed_witness_statement"]),
+    ("take a dose of laudanum", ["laudanum_vial"]),
+    ("visit the anatomy theatre at Barts", ["lore:4", "st_bartholomews_theatre"]),
+    ("the crest on the token matches the diary margin", ["brass_charity_token"]),
+    ("was the Ripper's surgical precision staged", ["reversed_cut_diagram", "timeline_act1_scene3"]),
+]
+
+
+def _load(name: str):
+    with open(SEED_DIR / f"{name}.json") as f:
+        return json.load(f)
+
+
+def build_corpus() -> dict:
+    """Insert the seed corpus as MemoryDocs; returns {label: doc id}"""
+    docs = []
+    for i, lore in enumerate(_load("lore")):
+        docs.append((f"lore:{i}", MemoryDoc(kind="seed_lore", text=lore["text"], importance=0)))
+    for character in _load("characters"):
+        text = f"{character['name']}: {character['bio']}"
+        docs.append((character["id"], MemoryDoc(kind="entity_card", entity_id=character["id"], text=text)))
+    for item in _load("items"):
+        text = f"{item['name']}: {item['seed_description']}"
+        docs.append((item["id"], MemoryDoc(kind="entity_card", entity_id=item["id"], text=text)))
+    for location in _load("locations"):
+        text = f"{location['name']}: {location['description']}"
+        docs.append((location["id"], MemoryDoc(kind="entity_card", entity_id=location["id"], text=text)))
+    for scene in _load("timeline"):
+        text = f"{scene['label']}: {scene['summary']}"
+        docs.append((scene["id"], MemoryDoc(kind="seed_lore", entity_id=scene["id"], text=text)))
+
+    db = SessionLocal()
+    try:
+        db.add_all(doc for _, doc in docs)
+        db.commit()
+        return {label: doc.id for label, doc in docs}
+    finally:
+        db.close()
+
+
+def build_queries(labels: dict) -> list:
+    """(query, relevant doc ids, group) triples"""
+    queries = []
+    for name in ("characters", "items", "locations"):
+        for entity in _load(name):
+            queries.append((entity["name"], {labels[entity["id"]]}, "exact name"))
+            queries.append((f"examine {entity['id']}", {labels[entity["id"]]}, "entity id"))
+    for query, relevant in NATURAL_QUERIES:
+        queries.append((query, {labels[label] for label in relevant}, "natural"))
+    return queries
+
+
+def dense_backend(texts: list):
+    """FAISS index over the texts via the embeddings API, or None if unavailable"""
+    try:
+        import faiss
+        from ai.memory import embed
+
+        vectors = embed(texts)
+    except Exception as exc:
+        print(f"Dense retrieval skipped, embeddings unavailable: {type(exc).__name__}: {exc}")
+        return None
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def evaluate(name: str, queries: list, rank, k: int) -> dict:
+    """Recall@k, MRR and per-query latency for a ranking function"""
+    recalls, reciprocal_ranks, latencies = [], [], []
+    by_group = {}
+    for i, (query, relevant, group) in enumerate(queries):
+        start = time.perf_counter()
+        ranked = rank(i, query)
+        latencies.append(time.perf_counter() - start)
+        top = ranked[:k]
+        recall = len(relevant & set(top)) / len(relevant)
+        first = next((r for r, doc_id in enumerate(ranked, start=1) if doc_id in relevant), None)
+        recalls.append(recall)
+        reciprocal_ranks.append(1.0 / first if first else 0.0)
+        by_group.setdefault(group, []).append(recall)
+    return {
+        "name": name,
+        "recall": statistics.mean(recalls),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "groups": {group: statistics.mean(values) for group, values in by_group.items()},
+    }
+
+
+def main(k: int = 3) -> bool:
+    init_database()
+    labels = build_corpus()
+    queries = build_queries(labels)
+    depth = max(k, settings.RETRIEVAL_CANDIDATES)
+    print(f"{len(labels)} memory docs, {len(queries)} labeled queries, recall@{k}, candidate depth {depth}")
+    print("=" * 78)
+
+    db = SessionLocal()
+    try:
+        def lexical(_, query):
+            return [doc_id for _, doc_id in lexical_search(query, top_k=depth, db=db)]
+
+        results = [evaluate("lexical", queries, lexical, k)]
+
+        doc_ids = sorted(labels.values())
+        texts = {doc.id: doc.text for doc in db.query(MemoryDoc).all()}
+        index = dense_backend([texts[doc_id] for doc_id in doc_ids])
+        if index is not None:
+            from ai.memory import embed
+
+            start = time.perf_counter()
+            query_vectors = embed([query for query, _, _ in queries])
+            embed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            def dense(i, _):
+                _, positions = index.search(query_vectors[i:i + 1], depth)
+                return [doc_ids[p] for p in positions[0] if p >= 0]
+
+            def hybrid(i, query):
+                fused = reciprocal_rank_fusion([dense(i, query), lexical(i, query)], k=settings.RETRIEVAL_RRF_K)
+                return [doc_id for _, doc_id in fused]
+
+            results.append(evaluate("dense", queries, dense, k))
+            results.append(evaluate("hybrid (RRF)", queries, hybrid, k))
+            print(f"Query embedding: {embed_ms:.1f} ms per query (batched), excluded below")
+    finally:
+        db.close()
+
+    groups = list(results[0]["groups"])
+    print(f"{'retriever':<14} | {'recall@' + str(k):>9} | {'MRR':>5} | {'p50':>9} | " + " | ".join(f"{g:>10}" for g in groups))
+    for r in results:
+        print(f"{r['name']:<14} | {r['recall']:>9.1%} | {r['mrr']:>5.2f} | {r['p50_ms']:>6.2f} ms | "
+              + " | ".join(f"{r['groups'][g]:>10.1%}" for g in groups))
+
+    # The production path must answer without the embeddings API
+    facts = retrieve_facts("Brass Charity Token", top_k=k, dense=False)
+    ok = bool(facts) and facts[0]["id"] == labels["brass_charity_token"]
+    print("=" * 78)
+    print(f"{'✓' if ok else '✗'} retrieve_facts() answers offline (lexical only)")
+    return ok
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
+    sys.exit(0 if ok else 1)
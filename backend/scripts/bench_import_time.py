@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start import time per entry point.
+
+Each entry point is imported in a fresh interpreter (so nothing is cached in
+sys.modules) several times, and the median wall time of the import is
+reported together with the heavy optional dependencies it pulled in. The
+API process should import none of them: faiss, numpy and the OpenAI SDK are
+loaded on first use.
+
+Usage: python scripts/bench_import_time.py [runs] [max_app_ms]
+"""
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).parent.parent
+
+ENTRY_POINTS = [
+    "app.main",
+    "app.config",
+    "db.engine",
+    "db.models",
+    "ai",
+    "ai.context_engine",
+    "ai.memory",
+    "api.routes_play",
+]
+
+HEAVY_MODULES = ["openai", "faiss", "numpy", "httpx", "tiktoken"]
+
+# Imports the module in a clean interpreter and reports time and heavy modules
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__({module!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int) -> dict:
+    """Median cold import time of a module over fresh interpreters"""
+    samples = []
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=BACKEND,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        heavy = probe["heavy"]
+    return {
+        "module": module,
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "heavy": heavy,
+    }
+
+
+def main(runs: int = 5, max_app_ms: float = None) -> bool:
+    print(f"Cold import time per entry point ({runs} fresh interpreters each)")
+    print("=" * 78)
+    print(f"{'entry point':<20} | {'median':>9} | {'min':>9} | heavy modules loaded")
+
+    ok = True
+    for module in ENTRY_POINTS:
+        r = measure(module, runs)
+        if "error" in r:
+            print(f"{module:<20} | ✗ import failed: {r['error']}")
+            ok = False
+            continue
+        print(f"{module:<20} | {r['median_ms']:>6.0f} ms | {r['min_ms']:>6.0f} ms | {', '.join(r['heavy']) or '-'}")
+
+        if module == "app.main":
+            if r["heavy"]:
+                print(f"  ✗ app.main imports {', '.join(r['heavy'])} at startup")
+                ok = False
+            if max_app_ms is not None and r["median_ms"] > max_app_ms:
+                print(f"  ✗ app.main cold start {r['median_ms']:.0f} ms exceeds {max_app_ms:.0f} ms")
+                ok = False
+
+    print("=" * 78)
+    print("✓ Import-time checks passed" if ok else "✗ Import-time checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    ok = main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        float(sys.argv[2]) if len(sys.argv) > 2 else None,
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Replay recorded transcripts through the semantic intent cache.
+
+For every recorded narration turn, in order, the intent is looked up in the
+cache for its game state. A hit counts as correct when the cached plan has
+the same action and targets as the plan the planner actually produced.
+Reports hit rate, precision, lookup overhead and estimated planner time
+saved for a range of similarity thresholds. First checks, offline, that
+a cached plan is never reused for a command naming another target.
+
+Usage: python scripts/bench_intent_cache.py [planner_seconds]
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ai.intent_cache import SemanticIntentCache, semantic_state_key
+from ai.memory import embed
+from ai.models import PlannerOutput
+from ai.plan_cache import normalize_intent
+from db.engine import SessionLocal
+from db.models import TranscriptEvent
+
+THRESHOLDS = [0.85, 0.88, 0.90, 0.92, 0.95]
+
+
+def load_turns():
+    """Recorded (intent, snapshot, plan) triples in play order"""
+    db = SessionLocal()
+    try:
+        events = (
+            db.query(TranscriptEvent)
+            .filter(TranscriptEvent.kind == "narration")
+            .order_by(TranscriptEvent.player_id, TranscriptEvent.turn, TranscriptEvent.id)
+            .all()
+        )
+        turns = []
+        for event in events:
+            payload = event.to_dict()["payload"]
+            if not payload.get("player_intent") or not payload.get("planner"):
+                continue
+            turns.append((
+                payload["player_intent"],
+                payload.get("context", {}),
+                PlannerOutput.model_validate(payload["planner"]),
+            ))
+        return turns
+    finally:
+        db.close()
+
+
+def _same_plan(a: PlannerOutput, b: PlannerOutput) -> bool:
+    return normalize_intent(a.action) == normalize_intent(b.action) and sorted(a.targets) == sorted(b.targets)
+
+
+def replay(turns, vectors, threshold: float, planner_seconds: float) -> dict:
+    cache = SemanticIntentCache(threshold=threshold, ttl_seconds=float("inf"))
+    hits = correct = 0
+    lookup_seconds = 0.0
+    for (intent, snapshot, recorded_plan), vector in zip(turns, vectors):
+        state_key = semantic_state_key(snapshot)
+        start = time.perf_counter()
+        found = cache.lookup(state_key, vector, intent)
+        lookup_seconds += time.perf_counter() - start
+        if found is not None:
+            hits += 1
+            correct += _same_plan(found[0], recorded_plan)
+        else:
+            cache.add(state_key, vector, recorded_plan, planner_seconds, intent)
+    return {
+        "threshold": threshold,
+        "hits": hits,
+        "hit_rate": hits / len(turns),
+        "precision": correct / hits if hits else 1.0,
+        "lookup_ms": lookup_seconds / len(turns) * 1000,
+        "saved_seconds": hits * planner_seconds,
+    }
+
+
+def check_targets_must_match() -> bool:
+    """Identical vectors, so only the target guard can tell these intents apart"""
+    import numpy as np
+
+    cache = SemanticIntentCache(threshold=0.92)
+    vector = np.ones(8, dtype="float32") / np.sqrt(8)
+    plan = PlannerOutput(action="take", targets=["brass_key"], state_changes=[], notes="")
+    cache.add("state", vector, plan, 2.5, "take the key")
+    paraphrase = cache.lookup("state", vector, "grab the key")
+    other_target = cache.lookup("state", vector, "take the knife")
+    ok = paraphrase is not None and other_target is None
+    print(f"{'✓' if ok else '✗'} Paraphrases with the same target hit, other targets miss "
+          f"(\"grab the key\": {'hit' if paraphrase else 'miss'}, \"take the knife\": {'hit' if other_target else 'miss'})")
+    return ok
+
+
+def main(planner_seconds: float = 2.5):
+    if not check_targets_must_match():
+        return False
+    turns = load_turns()
+    if not turns:
+        print("No recorded narration turns found. Play a few turns first.")
+        return False
+
+    print(f"Replaying {len(turns)} recorded turns (assumed planner latency {planner_seconds:.1f}s)")
+    print("=" * 78)
+    vectors = embed([intent for intent, _, _ in turns])
+
+    print(f"{'threshold':>9} | {'hits':>5} | {'hit rate':>8} | {'precision':>9} | {'lookup':>9} | {'planner time saved':>18}")
+    for threshold in THRESHOLDS:
+        r = replay(turns, vectors, threshold, planner_seconds)
+        print(f"{r['threshold']:>9.2f} | {r['hits']:>5} | {r['hit_rate']:>7.1%} | {r['precision']:>8.1%} | "
+              f"{r['lookup_ms']:>6.3f} ms | {r['saved_seconds']:>16.1f} s")
+    return True
+
+
+if __name__ == "__main__":
+    ok = main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.5)
+    sys.exit(0 if ok else 1)
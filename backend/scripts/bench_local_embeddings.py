@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local (EMBED_BACKEND=local) embedding backend.
+
+Everything runs offline on the CPU. Reports embedding throughput by batch
+size and vector size, with the dense recall@3 of queries made of some of
+a doc's words (the exact bag-of-words cosine is the ceiling here: hashing
+adds collisions, and no backend weights words by rarity). Then loads a
+scratch database with a synthetic memory corpus, rebuilds the FAISS index
+with the bulk reindexer and times retrieve_facts() end to end (query
+embedding, hybrid search, re-ranking) as a turn would call it.
+
+Checks that vectors are unit length and identical across processes (no
+dependence on Python's salted string hashing), that a query made of some
+of a doc's words finds that doc, that query embedding is cheap next to
+the rest of retrieval, and that an index built with another embedding
+model is neither searched nor appended to.
+
+Usage: python scripts/bench_local_embeddings.py [n_docs] [queries]
+"""
+import hashlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = Path(tempfile.mkdtemp(prefix="local-embed-bench-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+os.environ["EMBED_BACKEND"] = "local"
+
+import faiss
+import numpy as np
+
+import ai.memory as memory
+from ai.embeddings import HashingEmbeddings, get_embedding_backend
+from ai.lexical import rebuild_lexical_index
+from ai.reindex import BulkReindexer
+from app.config import settings
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+from scripts.init_db import init_database
+
+# Keep the real data/ index untouched
+memory.INDEX_PATH = _tmp / "faiss.index"
+memory.DOC_IDS_PATH = _tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = _tmp / "faiss_index.json"
+memory.VECTORS_PATH = _tmp / "faiss_vectors.f32"
+memory.LEGACY_MAPPING_PATH = _tmp / "faiss_mapping.json"
+
+SYLLABLES = "ba ke lo mi nu ra si te vo wy cha dre fen gol hul jor kin lam mor pel quin ros sul tor".split()
+VOCABULARY = 5000
+BATCH_SIZES = (1, 16, 256)
+DIMENSIONS = (256, 512, 1024)
+QUERY_WORDS = 8
+
+# Run in a child process with a different PYTHONHASHSEED
+_FINGERPRINT = (
+    "import hashlib, sys; sys.path.insert(0, {root!r}); "
+    "from ai.embeddings import HashingEmbeddings; "
+    "print(hashlib.sha256(HashingEmbeddings().embed({texts!r}).tobytes()).hexdigest())"
+)
+
+
+def make_texts(n: int, seed: int = 0) -> list:
+    """Docs of 8-40 words drawn from a Zipf-like vocabulary, as in natural text"""
+    rng = np.random.default_rng(seed)
+    words = ["".join(rng.choice(SYLLABLES, size=int(rng.integers(1, 4)))) for _ in range(VOCABULARY)]
+    weights = 1.0 / (np.arange(VOCABULARY) + 10.0)
+    weights /= weights.sum()
+    return [
+        f"Doc {i}: " + " ".join(rng.choice(words, size=int(rng.integers(8, 40)), p=weights)) for i in range(n)
+    ]
+
+
+def throughput(backend, texts: list, batch_size: int, dimensions: int) -> float:
+    """Docs embedded per second"""
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        backend.embed(texts[i:i + batch_size], dimensions=dimensions)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def make_queries(texts: list, n: int):
+    """(target positions, queries of QUERY_WORDS of each target's words, shuffled)"""
+    rng = np.random.default_rng(1)
+    targets = rng.choice(len(texts), size=n, replace=False)
+    return targets, [" ".join(rng.permutation(texts[i].split()[2:])[:QUERY_WORDS]) for i in targets]
+
+
+def dense_recall(backend, texts: list, targets, queries: list, dimensions: int, k: int = 3) -> float:
+    """Share of queries whose target is in the exact inner-product top k"""
+    index = faiss.IndexFlatIP(dimensions)
+    index.add(backend.embed(texts, dimensions=dimensions))
+    _, found = index.search(backend.embed(queries, dimensions=dimensions), k)
+    return float(np.mean([target in row for target, row in zip(targets, found)]))
+
+
+def fingerprint_elsewhere(texts: list) -> str:
+    """Digest of the same embeddings computed by a fresh interpreter"""
+    code = _FINGERPRINT.format(root=str(Path(__file__).parent.parent), texts=texts)
+    env = dict(os.environ, PYTHONHASHSEED="12345")
+    return subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def load_corpus(texts: list) -> list:
+    db = SessionLocal()
+    try:
+        docs = [MemoryDoc(kind="known_fact", text=text, importance=0) for text in texts]
+        db.add_all(docs)
+        db.commit()
+        return [doc.id for doc in docs]
+    finally:
+        db.close()
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return ok
+
+
+def main(n_docs: int = 20000, n_queries: int = 500) -> bool:
+    backend = get_embedding_backend()
+    results = [check(f"EMBED_BACKEND=local selects {backend.model}", isinstance(backend, HashingEmbeddings))]
+    texts = make_texts(n_docs)
+    targets, queries = make_queries(texts, n_queries)
+
+    print(f"Embedding throughput ({n_docs} docs, 8-40 words each) in docs/s, and dense recall@3")
+    print("=" * 62)
+    print(f"{'dims':>5} | " + " | ".join(f"{f'batch {size}':>10}" for size in BATCH_SIZES) + f" | {'recall':>7}")
+    rates = {}
+    for dimensions in DIMENSIONS:
+        row = [throughput(backend, texts, size, dimensions) for size in BATCH_SIZES]
+        rates[dimensions] = row
+        recall = dense_recall(backend, texts, targets, queries, dimensions)
+        print(f"{dimensions:>5} | " + " | ".join(f"{rate:>10.0f}" for rate in row) + f" | {recall:>7.1%}")
+    print("=" * 62)
+
+    sample = texts[:64]
+    vectors = backend.embed(sample)
+    results.append(check("vectors are unit length float32",
+                         vectors.dtype == np.float32 and np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)))
+    digest = hashlib.sha256(vectors.tobytes()).hexdigest()
+    results.append(check("identical across processes and hash seeds", fingerprint_elsewhere(sample) == digest))
+
+    print(f"Retrieval load test ({n_queries} queries over {n_docs} docs)")
+    init_database()
+    doc_ids = load_corpus(texts)
+    rebuild_lexical_index()
+    start = time.perf_counter()
+    index = BulkReindexer.from_settings(requests_per_minute=1e6, tokens_per_minute=1e9).run(resume=False)
+    reindex_seconds = time.perf_counter() - start
+    print(f"  reindex: {index.ntotal} docs in {reindex_seconds:.1f}s ({index.ntotal / reindex_seconds:.0f} docs/s)")
+
+    memory.retrieve_facts(queries[0], top_k=3)  # load the index and its filter table
+    embed_times, total_times, found, found_dense = [], [], 0, 0
+    for target, query in zip(targets, queries):
+        start = time.perf_counter()
+        query_vector = memory.embed([query])
+        embedded = time.perf_counter()
+        facts = memory.retrieve_facts(query, top_k=3, query_vector=query_vector)
+        done = time.perf_counter()
+        embed_times.append(embedded - start)
+        total_times.append(done - start)
+        found += doc_ids[target] in {fact["id"] for fact in facts}
+        found_dense += target in {position for _, position in memory.search(query, 3, query_vector=query_vector)}
+    embed_times.sort()
+    total_times.sort()
+    p50 = statistics.median(total_times) * 1000
+    p95 = total_times[int(len(total_times) * 0.95)] * 1000
+    embed_p50 = statistics.median(embed_times) * 1000
+    print(f"  query embedding: p50 {embed_p50:.2f} ms")
+    print(f"  retrieve_facts (with embedding): p50 {p50:.2f} ms, p95 {p95:.2f} ms, "
+          f"{len(total_times) / sum(total_times):.0f} queries/s on one thread")
+    print("=" * 62)
+
+    results.append(check(f"{QUERY_WORDS} of a doc's words find it in the dense top 3: {found_dense / n_queries:.1%} "
+                         f"(hybrid {found / n_queries:.1%})", found_dense / n_queries >= 0.85))
+    results.append(check(f"query embedding is under a fifth of retrieval time ({embed_p50:.2f} of {p50:.2f} ms)",
+                         embed_p50 < p50 / 5))
+    results.append(check(f"bulk embedding over 5000 docs/s ({rates[512][-1]:.0f})", rates[512][-1] > 5000))
+    results.append(check("saved index records the local model",
+                         memory.load_index_config().get("embed_model") == backend.model))
+
+    # Switch backends without reindexing: the local index must not be used
+    settings.EMBED_BACKEND = "openai"
+    facts = memory.retrieve_facts(queries[0], top_k=3)
+    try:
+        memory.add_to_index(backend.embed(["late summary"]), [10 ** 9])
+        refused = False
+    except ValueError:
+        refused = True
+    results.append(check("index from another embedding model: unused, lexical results only, appends refused",
+                         memory.get_index() is None and len(facts) > 0 and refused
+                         and memory.load_index(mmap=False).ntotal == n_docs))
+    settings.EMBED_BACKEND = "local"
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(*[int(arg) for arg in sys.argv[1:3]]) else 1)
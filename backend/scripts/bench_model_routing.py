@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare planner latency with and without model routing.
+
+Plays a mix of simple and deduction commands through plan_with_caches()
+against the local stub client, where the small model is faster than the
+large one and a configurable share of its plans fail validation. Reports
+per-model latency, escalation rate and end-to-end planner latency.
+
+Usage: python scripts/bench_model_routing.py [small_failure_every_n]
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ai.context_engine import plan_with_caches
+from ai.intent import intent_complexity
+from ai.metrics import metrics
+from app.config import settings
+from scripts.stub_openai import StubOpenAI
+
+COMMANDS = [
+    "look around",
+    "examine the letter",
+    "go to the window",
+    "read the newspaper",
+    "deduce who wrote the letter",
+    "why was the door unlocked",
+]
+SNAPSHOT = {"player": {"id": "bench", "current_location_id": "221b_baker_street"}, "inventory": []}
+LATENCY = {settings.PLANNER_SMALL_MODEL: 0.05, settings.PLANNER_MODEL: 0.2}
+
+
+def run(routing: bool, fail_every: int, turns: int = 30) -> dict:
+    settings.MODEL_ROUTING_ENABLED = routing
+    metrics.reset()
+    good = StubOpenAI(model_latency=LATENCY, seed=1)
+    bad = StubOpenAI(model_latency=LATENCY, seed=1, invalid_plan_models=[settings.PLANNER_SMALL_MODEL])
+
+    seconds = []
+    for i in range(turns):
+        # Every n-th turn the small model produces an invalid plan
+        client = bad if fail_every and i % fail_every == 0 else good
+        start = time.perf_counter()
+        plan_with_caches(client, COMMANDS[i % len(COMMANDS)], SNAPSHOT, relevant_facts="")
+        seconds.append(time.perf_counter() - start)
+    return {
+        "p50": statistics.median(seconds),
+        "mean": statistics.mean(seconds),
+        "escalation_rate": metrics.get_gauge("model_escalation_rate", stage="planner"),
+        "models": {
+            model: metrics.get_sample_count("llm_model_latency_seconds", stage="planner", model=model)
+            for model in LATENCY
+        },
+    }
+
+
+def main(fail_every: int = 5) -> bool:
+    settings.PLANNER_CACHE_ENABLED = False
+    settings.SEMANTIC_CACHE_ENABLED = False
+
+    print("Model routing benchmark (planner stage)")
+    print("=" * 70)
+    print("Routing: " + ", ".join(f"{c!r}={intent_complexity(c)}" for c in COMMANDS))
+    print("=" * 70)
+    results = {}
+    for routing in (False, True):
+        r = results[routing] = run(routing, fail_every)
+        calls = ", ".join(f"{model}: {count}" for model, count in r["models"].items())
+        print(f"routing {'on ' if routing else 'off'} | p50 {r['p50'] * 1000:>4.0f}ms | mean {r['mean'] * 1000:>4.0f}ms | "
+              f"escalation rate {r['escalation_rate']:.0%} | calls {calls}")
+    print("=" * 70)
+    return results[True]["mean"] < results[False]["mean"] and results[True]["escalation_rate"] > 0
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+    sys.exit(0 if ok else 1)
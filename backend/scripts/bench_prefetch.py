@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Measure speculative prefetch of suggested next actions.
+
+Plays a turn against the local stub client, waits for the background
+prefetch of its "Next actions", then times a click on a suggested action
+against a command that wasn't suggested. Also checks that sending a
+different command cancels the pending prefetches, that the cost cap
+limits speculative calls and that they don't take the turns' LLM slots,
+that prefetches target the post-turn location and that a prefetched
+narration failing the narration checks is replaced by a fresh one, and
+that cached plans (and prefetches) are keyed on everything the planner
+sees: the location card's contents, the player's name and the number of
+seen entities.
+
+Usage: python scripts/bench_prefetch.py [latency_seconds]
+"""
+import sys
+import tempfile
+import time
+from contextlib import chdir
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ai.context_engine import prepare_turn, stream_narration_events
+from ai.intent_cache import semantic_state_key
+from ai.metrics import metrics
+from ai.models import NarratorOutput, PlannerOutput
+from ai.plan_cache import planner_cache_key
+from ai.prefetch import SpeculativePrefetcher
+from ai.scheduler import llm_limiter, speculative_limiter
+from app.config import settings
+from db import location_cards
+from db.models import Base
+from scripts.stub_openai import StubOpenAI
+import ai.context_engine as context_engine
+
+SNAPSHOT = {"player": {"id": "bench", "current_location_id": "221b_baker_street"}, "inventory": []}
+
+
+def play(client, db, command: str):
+    """Play one streamed turn; returns (seconds to first chunk, seconds total, next actions)"""
+    start = time.perf_counter()
+    first_chunk = None
+    next_actions = []
+    relevant_facts, plan = prepare_turn(client, command, SNAPSHOT, relevant_facts="")
+    for event in stream_narration_events(client, relevant_facts, plan, command, SNAPSHOT, db):
+        if event["type"] == "chunk" and first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        elif event["type"] == "metadata":
+            next_actions = event["next_actions"]
+    return first_chunk, time.perf_counter() - start, next_actions
+
+
+def _wait_idle(prefetcher: SpeculativePrefetcher, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not any(prefetcher._pending.get(SNAPSHOT["player"]["id"], {})):
+            return
+        time.sleep(0.01)
+
+
+def main(latency: float = 0.3) -> bool:
+    settings.PLANNER_CACHE_ENABLED = False
+    settings.SEMANTIC_CACHE_ENABLED = False
+    settings.PREFETCH_ENABLED = True
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    client = StubOpenAI(latency=latency, seed=1)
+
+    print(f"Prefetch benchmark: stub latency {latency * 1000:.0f}ms per call")
+    print("=" * 70)
+    results = []
+    for narrate in (False, True):
+        context_engine.prefetcher = prefetcher = SpeculativePrefetcher(narrate=narrate, calls_per_minute=600)
+        _, _, suggested = play(client, db, "look around")
+        _wait_idle(prefetcher)
+
+        _, cold, _ = play(client, db, "whistle for a cab")  # also cancels and drops the prefetches
+        _, _, suggested = play(client, db, "look around")
+        _wait_idle(prefetcher)
+        first, warm, _ = play(client, db, suggested[0])
+
+        label = "plan + narration" if narrate else "plan only"
+        print(f"{label:<17} | unsuggested turn {cold * 1000:>5.0f}ms | suggested turn {warm * 1000:>5.0f}ms "
+              f"(first chunk {first * 1000:.0f}ms)")
+        results.append(warm < cold)
+
+    # Cancellation: a different command drops pending prefetches
+    prefetcher._executor.shutdown(wait=True)
+    metrics.reset()
+    context_engine.prefetcher = prefetcher = SpeculativePrefetcher(max_workers=1, calls_per_minute=600)
+    prefetcher.schedule(client, "bench", ["examine the letter", "look out of the window", "ask holmes"], SNAPSHOT)
+    prefetcher.claim("bench", "go to the docks", SNAPSHOT)
+    prefetcher._executor.shutdown(wait=True)
+    cancelled = metrics.get_counter("prefetch_cancelled_total")
+    ok = cancelled == 3
+    print(f"{'✓' if ok else '✗'} new command cancelled {cancelled:.0f} of 3 pending prefetches")
+    results.append(ok)
+
+    # Cost cap: only the budget's burst is spent
+    metrics.reset()
+    context_engine.prefetcher = prefetcher = SpeculativePrefetcher(calls_per_minute=1, max_actions=3)
+    prefetcher._budget._tokens = 1
+    prefetcher.schedule(client, "bench", ["examine the letter", "look out of the window", "ask holmes"], SNAPSHOT)
+    prefetcher._executor.shutdown(wait=True)
+    spent = metrics.get_counter("prefetch_llm_calls_total")
+    skipped = metrics.get_counter("prefetch_skipped_total", reason="budget")
+    ok = spent == 1 and skipped == 2
+    print(f"{'✓' if ok else '✗'} cost cap: {spent:.0f} speculative call made, {skipped:.0f} skipped")
+    results.append(ok)
+
+    # Speculative calls run on their own slots, never the turns'
+    context_engine.prefetcher = prefetcher = SpeculativePrefetcher(calls_per_minute=600)
+    prefetcher.schedule(StubOpenAI(latency=0.1, seed=1), "bench", ["examine the letter", "ask holmes"], SNAPSHOT)
+    speculative = turns = 0
+    while any(future.running() or not future.done() for future, _ in prefetcher._pending.get("bench", {}).values()):
+        speculative = max(speculative, speculative_limiter._in_flight)
+        turns = max(turns, llm_limiter._in_flight)
+        time.sleep(0.005)
+    ok = speculative > 0 and turns == 0
+    print(f"{'✓' if ok else '✗'} speculative calls use their own LLM slots ({speculative} in flight, {turns} of the turns')")
+    results.append(ok)
+
+    # Prefetches target the state the next turn will start from
+    move = PlannerOutput(action="go", targets=[], notes="", state_changes=[
+        {"entity": "player", "op": "set", "value": {"current_location_id": "scotland_yard_records"}}
+    ])
+    post_turn = context_engine._post_turn_snapshot(db, SNAPSHOT, move)
+    ok = post_turn["player"]["current_location_id"] == "scotland_yard_records"
+    print(f"{'✓' if ok else '✗'} prefetches after a move are planned at the destination")
+    results.append(ok)
+
+    # A prefetched narration that fails the checks isn't sent
+    metrics.reset()
+    context_engine.prefetcher = prefetcher = SpeculativePrefetcher(calls_per_minute=600)
+    prefetcher.narration = lambda *args: NarratorOutput(markdown="not markdown", next_actions=[])
+    with chdir(tempfile.mkdtemp(prefix="prefetch-bench-")):  # run_turn writes logs/ in the cwd
+        output = context_engine.run_turn(client, "look around", SNAPSHOT, db)
+    rejected = metrics.get_counter("prefetch_narration_rejected_total")
+    ok = output.markdown != "not markdown" and rejected == 1
+    print(f"{'✓' if ok else '✗'} an invalid prefetched narration is rejected and narrated afresh")
+    results.append(ok)
+
+    # Cache keys follow the planner's context
+    card = {"id": "221b_baker_street", "name": "221B Baker Street", "atmosphere": "", "characters": [],
+            "items": [], "exits": []}
+    location_cards._cards["221b_baker_street"] = card
+    keys = lambda snapshot: (planner_cache_key("look around", snapshot, ""), semantic_state_key(snapshot))
+    before = keys(SNAPSHOT)
+    location_cards.invalidate_location_cards("221b_baker_street")
+    location_cards._cards["221b_baker_street"] = {**card, "characters": [{"id": "lestrade", "name": "Lestrade"}]}
+    moved_in = keys(SNAPSHOT)
+    renamed = keys({**SNAPSHOT, "player": {**SNAPSHOT["player"], "profile_name": "Watson"}})
+    seen = keys({**SNAPSHOT, "seen_flags": [{"entity_id": "lestrade"}]})
+    unchanged = keys(dict(SNAPSHOT))
+    location_cards.invalidate_location_cards()
+    ok = len({before, moved_in, renamed, seen}) == 4 and unchanged == moved_in
+    print(f"{'✓' if ok else '✗'} plan and intent cache keys change with the location card, player name and seen count")
+    results.append(ok)
+
+    db.close()
+    print("=" * 70)
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    ok = main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.3)
+    sys.exit(0 if ok else 1)
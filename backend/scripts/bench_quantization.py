@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark reduced-dimension and quantized memory indexes.
+
+Builds a synthetic corpus of clustered unit vectors at the embedding
+model's full size whose variance falls off with the dimension index, as
+with text-embedding-3's matryoshka training, and shortens them by
+truncating and renormalizing (what the API's ``dimensions`` parameter
+returns). Each setting (EMBED_DIMENSIONS x EMBED_QUANTIZATION x
+RETRIEVAL_RESCORE_FACTOR) is built and saved through ai.memory, loaded
+like a worker loads it and queried with memory.search(). Reported:
+
+- recall@k: share of the exact full-size float32 top k that was returned
+- index: size of the index file, i.e. what a worker keeps resident
+- vectors: float vectors kept on disk for re-scoring; memory-mapped, so
+  only the rows of re-scored candidates are read
+- p50 / p95: query latency in memory.search(), re-scoring included
+
+Also checks that query embeddings are requested at the saved index's size.
+
+Usage: python scripts/bench_quantization.py [n_docs] [dim]
+"""
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import faiss
+import numpy as np
+
+import ai.memory as memory
+from app.config import settings
+
+TOP_K = 10
+QUERIES = 200
+CLUSTERS = 500
+
+# (dimensions, quantization, re-scoring factor); 0 dimensions = full size
+CONFIGS = [
+    (0, "none", 1),
+    (0, "int8", 1),
+    (0, "int8", 4),
+    (0, "binary", 1),
+    (0, "binary", 4),
+    (0, "binary", 10),
+    (1024, "none", 1),
+    (1024, "int8", 4),
+    (1024, "binary", 4),
+    (1024, "binary", 10),
+    (256, "none", 1),
+    (256, "int8", 4),
+    (256, "binary", 10),
+]
+
+
+def shorten(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the leading dimensions and renormalize, as the embeddings API does"""
+    if not dimensions:
+        return vectors
+    short = np.ascontiguousarray(vectors[:, :dimensions])
+    faiss.normalize_L2(short)
+    return short
+
+
+def make_corpus(n_docs: int, dim: int):
+    """Clustered docs and paraphrase-like queries; leading dimensions carry most variance"""
+    rng = np.random.default_rng(0)
+    scale = ((1.0 + np.arange(dim) / 32.0) ** -0.75).astype("float32")
+    centers = rng.standard_normal((CLUSTERS, dim)).astype("float32") * scale
+    docs = centers[rng.integers(0, CLUSTERS, n_docs)] + 0.7 * rng.standard_normal((n_docs, dim)).astype("float32") * scale
+    faiss.normalize_L2(docs)
+    queries = docs[rng.choice(n_docs, QUERIES, replace=False)]
+    queries = queries + 0.2 * rng.standard_normal(queries.shape).astype("float32") * scale
+    faiss.normalize_L2(queries)
+    return docs, queries.astype("float32")
+
+
+def run_config(docs, queries, truth, dimensions: int, quantization: str, factor: int) -> dict:
+    settings.EMBED_QUANTIZATION = quantization
+    settings.RETRIEVAL_RESCORE_FACTOR = factor
+    vectors = shorten(docs, dimensions)
+    memory.build_index(vectors, list(range(1, len(docs) + 1)))
+    index = memory.get_index()
+    short_queries = shorten(queries, dimensions)
+
+    latencies, recalls = [], []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        matches = memory.search("", top_k=TOP_K, index=index, query_vector=short_queries[i:i + 1])
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(truth[i] & {position for _, position in matches}) / TOP_K)
+    latencies.sort()
+    return {
+        "recall": statistics.mean(recalls),
+        "index_mb": memory.INDEX_PATH.stat().st_size / 2**20,
+        "vectors_mb": memory.VECTORS_PATH.stat().st_size / 2**20 if memory.VECTORS_PATH.exists() else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def query_dimensions() -> int:
+    """Dimensions embed() asks the API for by default, with the index just built"""
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0] * 4)])
+
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    memory.embed(["query"], openai_client=client)
+    return requests[0].get("dimensions", 0)
+
+
+def main(n_docs: int = 20000, dim: int = 3072) -> bool:
+    data = Path(tempfile.mkdtemp(prefix="quantization-bench-"))
+    memory.INDEX_PATH = data / "faiss.index"
+    memory.DOC_IDS_PATH = data / "faiss_doc_ids.npy"
+    memory.INDEX_CONFIG_PATH = data / "faiss_index.json"
+    memory.VECTORS_PATH = data / "faiss_vectors.f32"
+    memory.LEGACY_MAPPING_PATH = data / "faiss_mapping.json"
+
+    docs, queries = make_corpus(n_docs, dim)
+    exact = faiss.IndexFlatIP(dim)
+    exact.add(docs)
+    _, truth_ids = exact.search(queries, TOP_K)
+    truth = [set(row.tolist()) for row in truth_ids]
+    del exact
+
+    print(f"{n_docs} docs, {QUERIES} queries, recall@{TOP_K} against exact {dim}-dim float32 search")
+    print("=" * 86)
+    print(f"{'dims':>5} | {'encoding':<8} | {'rescore':>7} | {'recall':>7} | {'index':>9} | {'vectors':>9} | "
+          f"{'p50':>8} | {'p95':>8}")
+    results = {}
+    for dimensions, quantization, factor in CONFIGS:
+        r = results[dimensions, quantization, factor] = run_config(docs, queries, truth, dimensions, quantization, factor)
+        rescore = f"{factor}x" if quantization != "none" else "-"
+        vectors = f"{r['vectors_mb']:>6.1f} MB" if r["vectors_mb"] else f"{'-':>9}"
+        print(f"{dimensions or dim:>5} | {quantization:<8} | {rescore:>7} | {r['recall']:>7.1%} | "
+              f"{r['index_mb']:>6.1f} MB | {vectors} | {r['p50_ms']:>5.2f} ms | {r['p95_ms']:>5.2f} ms")
+    settings.EMBED_QUANTIZATION = "none"
+    settings.RETRIEVAL_RESCORE_FACTOR = 4
+
+    full = results[0, "none", 1]
+    int8 = results[0, "int8", 4]
+    binary = results[0, "binary", 10]
+    memory.build_index(shorten(docs[:100], 256), list(range(1, 101)))
+    checks = [
+        (f"int8 re-scored keeps recall ({int8['recall']:.1%}) in a quarter of the memory",
+         int8["recall"] >= 0.98 and int8["index_mb"] <= full["index_mb"] / 3.9),
+        (f"binary re-scored (10x) keeps recall ({binary['recall']:.1%}) in 1/32 of the memory",
+         binary["recall"] >= 0.9 and binary["index_mb"] <= full["index_mb"] / 31),
+        ("re-scoring recovers recall lost to quantization",
+         results[0, "binary", 10]["recall"] > results[0, "binary", 1]["recall"]
+         and results[0, "int8", 4]["recall"] >= results[0, "int8", 1]["recall"]),
+        ("queries are embedded at the saved index's size", query_dimensions() == 256),
+    ]
+    print("=" * 86)
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✓' if passed else '✗'} {label}")
+        ok = ok and passed
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(*[int(arg) for arg in sys.argv[1:3]]) else 1)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-worker memory of the FAISS index with and without mmap.
+
+Builds a synthetic index (random unit vectors at the embedding model's
+dimension) in a scratch directory, then starts 1, 4 and 8 worker processes
+at once, as uvicorn --workers would. Each worker loads the shared index and
+doc id table the way the app does, runs searches (touching every vector),
+and reports from /proc:
+
+- RSS: resident pages, including page-cache pages shared with other workers
+- anon: private heap pages (a copied index lands here)
+- PSS: proportional set size, shared pages divided among the processes
+  mapping them; the sum over workers is what the workers really cost
+
+Linux only.
+
+Usage: python scripts/bench_worker_rss.py [n_docs] [dim]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+WORKER_COUNTS = (1, 4, 8)
+SEARCHES = 20
+
+
+def _proc_kb(path: str, field: str) -> int:
+    with open(path) as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def worker(data_dir: str) -> None:
+    """Load the index like an app worker, search, report memory, wait to be released"""
+    import numpy as np
+
+    import ai.memory as memory
+
+    data = Path(data_dir)
+    memory.INDEX_PATH = data / "faiss.index"
+    memory.LEGACY_MAPPING_PATH = data / "faiss_mapping.json"
+    memory.DOC_IDS_PATH = data / "faiss_doc_ids.npy"
+    memory.INDEX_CONFIG_PATH = data / "faiss_index.json"
+    memory.VECTORS_PATH = data / "faiss_vectors.f32"
+
+    index = memory.get_index()
+    table = memory.get_doc_id_table()
+    rng = np.random.default_rng(os.getpid())
+    queries = rng.standard_normal((SEARCHES, index.d)).astype("float32")
+    for i in range(SEARCHES):
+        memory.search("", top_k=5, index=index, query_vector=queries[i:i + 1])
+
+    print(json.dumps({
+        "rss": _proc_kb("/proc/self/status", "VmRSS"),
+        "anon": _proc_kb("/proc/self/status", "RssAnon"),
+        "file": _proc_kb("/proc/self/status", "RssFile"),
+        "pss": _proc_kb("/proc/self/smaps_rollup", "Pss"),
+        "docs": len(table),
+    }), flush=True)
+    sys.stdin.readline()  # stay alive until every worker has reported
+
+
+def run_workers(count: int, data_dir: str, mmap: bool) -> list:
+    """Start count workers at once and collect their reports"""
+    env = dict(os.environ, MEMORY_INDEX_MMAP="true" if mmap else "false", PYTHONPATH=str(Path(__file__).parent.parent))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--worker", data_dir],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, text=True,
+        )
+        for _ in range(count)
+    ]
+    try:
+        return [json.loads(proc.stdout.readline()) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+
+
+def main(n_docs: int = 10000, dim: int = 3072) -> bool:
+    import faiss
+    import numpy as np
+
+    import ai.memory as memory
+
+    data = Path(tempfile.mkdtemp(prefix="worker-rss-"))
+    memory.INDEX_PATH = data / "faiss.index"
+    memory.LEGACY_MAPPING_PATH = data / "faiss_mapping.json"
+    memory.DOC_IDS_PATH = data / "faiss_doc_ids.npy"
+    memory.INDEX_CONFIG_PATH = data / "faiss_index.json"
+    memory.VECTORS_PATH = data / "faiss_vectors.f32"
+    vectors = np.random.default_rng(0).standard_normal((n_docs, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    memory.build_index(vectors, list(range(1, n_docs + 1)))
+    index_mb = memory.INDEX_PATH.stat().st_size / 2**20
+    del vectors
+    print(f"{n_docs} docs x {dim} dims: index file {index_mb:.0f} MB, "
+          f"doc id table {memory.DOC_IDS_PATH.stat().st_size / 2**10:.0f} KB")
+    print("=" * 78)
+    print(f"{'index load':<10} | {'workers':>7} | {'RSS/worker':>10} | {'anon/worker':>11} | "
+          f"{'PSS/worker':>10} | {'total PSS':>9}")
+
+    totals = {}
+    for mmap in (False, True):
+        for count in WORKER_COUNTS:
+            reports = run_workers(count, str(data), mmap)
+            mean = {key: sum(r[key] for r in reports) / count / 1024 for key in ("rss", "anon", "pss")}
+            total_pss = sum(r["pss"] for r in reports) / 1024
+            totals[mmap, count] = total_pss
+            print(f"{'mmap' if mmap else 'copy':<10} | {count:>7} | {mean['rss']:>7.0f} MB | {mean['anon']:>8.0f} MB | "
+                  f"{mean['pss']:>7.0f} MB | {total_pss:>6.0f} MB")
+
+    workers = WORKER_COUNTS[-1]
+    saved = totals[False, workers] - totals[True, workers]
+    # Each copying worker holds the whole index; mapped workers share one copy
+    ok = saved >= (workers - 1) * index_mb * 0.8
+    print("=" * 78)
+    print(f"{'✓' if ok else '✗'} mmap saves {saved:.0f} MB across {workers} workers "
+          f"(~{(workers - 1) * index_mb:.0f} MB expected)")
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--worker":
+        worker(sys.argv[2])
+    else:
+        args = [int(arg) for arg in sys.argv[1:3]]
+        sys.exit(0 if main(*args) else 1)
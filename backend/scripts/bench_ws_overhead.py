@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-turn setup overhead: HTTP /play vs a persistent /ws/play session.
+
+Measures only the work each endpoint does before a turn's LLM calls, against
+a throwaway seeded database. /play opens a DB session, builds the snapshot
+and allocates a turn number (_build_snapshot and next_turn). /ws/play does
+the same with its cached snapshot, then rebuilds the snapshot once the turn
+is committed; that refresh is reported separately because it runs after the
+turn's events are sent, not before them. Both use the shared OpenAI client
+and FAISS index, so neither is counted. No API calls are made.
+
+Usage: python scripts/bench_ws_overhead.py [turns]
+"""
+import os
+import sys
+import tempfile
+import time
+import statistics
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="ws-overhead-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+from api.routes_play import _build_snapshot
+from db.engine import SessionLocal
+from db.turns import next_turn
+from ai.session import GameSession
+from scripts.init_db import init_database
+from scripts.seed_db import seed_database
+
+LOCATION_ID = "221b_baker_street"
+
+
+def http_turn_overhead(player_id: str) -> float:
+    """Setup work repeated by every /play request"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        _build_snapshot(db, player_id, LOCATION_ID)
+        next_turn(db, player_id)
+    finally:
+        db.close()
+    return time.perf_counter() - start
+
+
+def ws_turn_overhead(session: GameSession) -> tuple:
+    """(setup before the turn's LLM work, snapshot refresh after its commit) on an open /ws/play connection"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        session.get_snapshot(db, LOCATION_ID)
+        next_turn(db, session.player_id)
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        session.refresh_snapshot(db)
+        return setup, time.perf_counter() - start
+    finally:
+        db.close()
+
+
+def _report(label: str, samples: list) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(samples_ms):8.3f} ms | "
+          f"p50 {statistics.median(samples_ms):8.3f} ms | p95 {p95:8.3f} ms")
+
+
+def main(turns: int = 200, player_id: str = "demo"):
+    init_database()
+    seed_database()
+    print(f"Per-turn setup before the LLM calls over {turns} turns (player '{player_id}')")
+    print("=" * 60)
+
+    http_samples = [http_turn_overhead(player_id) for _ in range(turns)]
+
+    session = GameSession(player_id, openai_client=None)
+    ws_samples, refresh_samples = zip(*[ws_turn_overhead(session) for _ in range(turns)])
+
+    _report("HTTP /play", http_samples)
+    _report("WS session", ws_samples)
+    _report("WS refresh", refresh_samples)
+    saved = statistics.mean(http_samples) - statistics.mean(ws_samples)
+    print(f"\nThe WebSocket session starts a turn {saved * 1000:.3f} ms sooner; the snapshot is "
+          f"rebuilt after the turn instead ({statistics.mean(refresh_samples) * 1000:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main(turns=int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Check metadata-filtered memory retrieval.
+
+Builds a scratch database and FAISS index (deterministic bag-of-words
+vectors, no API calls) and checks that stale docs, other players' docs and
+docs outside a kind/entity filter never take one of the top_k slots, that
+filtered results match a brute-force filtered ranking (with and without
+FAISS ID selectors), that the dense filter comes from per-position metadata
+read once per index snapshot (no doc text), that a turn runs a single query
+re-reading its hits' stale flags, so a doc marked stale by another worker
+process drops out on the next retrieval, and that hit text comes from a doc
+store bounded to its most recently used docs.
+
+Usage: python scripts/check_filtered_retrieval.py
+"""
+import os
+import re
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = Path(tempfile.mkdtemp(prefix="filtered-retrieval-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+import faiss
+import numpy as np
+from sqlalchemy import event
+
+import ai.memory as memory
+from app.config import settings
+from db.engine import SessionLocal, get_engine
+from db.models import MemoryDoc
+from scripts.init_db import init_database
+
+# Keep the real data/ index untouched
+memory.INDEX_PATH = _tmp / "faiss.index"
+memory.LEGACY_MAPPING_PATH = _tmp / "faiss_mapping.json"
+memory.DOC_IDS_PATH = _tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = _tmp / "faiss_index.json"
+memory.VECTORS_PATH = _tmp / "faiss_vectors.f32"
+
+DIM = 256
+TOP_K = 3
+
+DOCS = [
+    # (text, kind, entity_id, player_id, stale)
+    ("The phantom coach rattles through the fog at midnight", "seed_lore", None, None, True),
+    ("A phantom coach was seen in the fog near Miller's Court", "seed_lore", None, None, True),
+    ("The coach in the fog has no crest on its door", "known_fact", "phantom_coach", None, True),
+    ("Finch swears the coach in the fog turns down Hanbury Street", "known_fact", "finch", None, False),
+    ("Fog hides the coachman's face from every witness", "seed_lore", None, None, False),
+    ("The coach wheels leave a narrow rut in the mud", "known_fact", "brass_charity_token", None, False),
+    ("Holmes forbids travel by coach after dark", "lore_rule", None, None, False),
+    ("Watson followed the phantom coach in the fog last night", "transcript", None, "alice", False),
+    ("Watson lost the coach in the fog by the docks", "transcript", None, "bob", False),
+    ("Gaslight flickers on wet cobbles", "seed_lore", None, None, False),
+]
+
+
+def vectorize(texts):
+    """Hashed bag-of-words unit vectors (stand-in for the embeddings API)"""
+    vectors = np.zeros((len(texts), DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 1.0
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return ok
+
+
+def brute_force(query_vector, doc_vectors, doc_ids, allowed):
+    """Reference ranking: exact inner product over the allowed docs"""
+    scores = doc_vectors @ query_vector[0]
+    order = [i for i in np.argsort(-scores, kind="stable") if doc_ids[i] in allowed]
+    return [doc_ids[i] for i in order[:TOP_K]]
+
+
+def main() -> bool:
+    init_database()
+    ids = []
+    for text, kind, entity_id, player_id, stale in DOCS:
+        doc = memory.promote_fact(text, kind=kind, entity_id=entity_id, player_id=player_id)
+        ids.append(doc.id)
+        if stale:
+            memory.mark_stale(doc.id)
+    doc_vectors = vectorize([text for text, *_ in DOCS])
+    index = memory.build_index(doc_vectors, ids)
+    query = "the phantom coach in the fog"
+    q_vec = vectorize([query])
+    results = []
+
+    def dense_ids(**filters):
+        facts = memory.retrieve_facts(query, top_k=TOP_K, index=index, query_vector=q_vec, **filters)
+        return [fact["id"] for fact in facts]
+
+    def allowed(kinds=None, entity_ids=None, player_id=None):
+        return {
+            doc_id for doc_id, (_, kind, entity_id, owner, stale) in zip(ids, DOCS)
+            if not stale and owner in (None, player_id)
+            and (kinds is None or kind in kinds) and (entity_ids is None or entity_id in entity_ids)
+        }
+
+    settings.RETRIEVAL_HYBRID_ENABLED = False
+    settings.RERANK_ENABLED = False  # compare raw search order with the brute-force ranking
+    print("Dense retrieval")
+    positions = [position for _, position in memory.search(query, TOP_K, index=index, query_vector=q_vec)]
+    raw = memory.get_doc_id_table(index).doc_ids_at(positions).tolist()
+    stale_hits = len(set(raw) & set(ids[:3]))
+    results.append(check(f"unfiltered top {TOP_K} holds {stale_hits} stale docs", stale_hits > 0))
+    got = dense_ids()
+    results.append(check(f"stale docs don't take slots: {len(got)} of {TOP_K} facts", len(got) == TOP_K))
+    results.append(check("matches brute-force ranking", got == brute_force(q_vec, doc_vectors, ids, allowed())))
+
+    for filters in ({"kinds": ["known_fact"]}, {"entity_ids": ["finch", "brass_charity_token"]},
+                    {"player_id": "alice"}, {"player_id": "bob", "kinds": ["transcript"]}):
+        got = dense_ids(**filters)
+        expected = brute_force(q_vec, doc_vectors, ids, allowed(**filters))
+        results.append(check(f"{filters}: {len(got)} facts, exact", got == expected))
+    results.append(check("other players' transcripts stay private", ids[8] not in dense_ids(player_id="alice")))
+
+    print("FAISS without ID selectors (adaptive over-fetch)")
+    selector_params = faiss.SearchParameters
+    try:
+        del faiss.SearchParameters
+        for filters in ({}, {"kinds": ["lore_rule"]}, {"player_id": "bob"}):
+            got = dense_ids(**filters)
+            expected = brute_force(q_vec, doc_vectors, ids, allowed(**filters))
+            results.append(check(f"{filters or 'no filter'}: same results as the selector path", got == expected))
+    finally:
+        faiss.SearchParameters = selector_params
+
+    print("Filter table and doc store")
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    memory._filter_table = None
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    try:
+        dense_ids(player_id="alice")
+        first = list(statements)
+        settings.RETRIEVAL_HYBRID_ENABLED = True
+        dense_ids(player_id="alice")  # the hits' text is cached from here on
+        settings.RETRIEVAL_HYBRID_ENABLED = False
+        statements.clear()
+        dense_ids(player_id="alice")
+        dense_only = len(statements)
+        settings.RETRIEVAL_HYBRID_ENABLED = True
+        statements.clear()
+        hybrid = dense_ids(player_id="alice")
+        hybrid_statements = len(statements)
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", listener)
+    table_reads = [sql for sql in first if "memory_docs.kind" in sql and "WHERE" not in sql]
+    results.append(check("the filter table is read once, without doc text",
+                         len(table_reads) == 1 and "memory_docs.text" not in table_reads[0]))
+    results.append(check(f"dense retrieval runs {dense_only} SQL statement (the stale check)", dense_only == 1))
+    results.append(check(f"hybrid retrieval runs {hybrid_statements} (the FTS query and the stale check)",
+                         hybrid_statements == 2))
+    results.append(check("hybrid results respect the filters", set(hybrid) <= allowed(player_id="alice") and len(hybrid) == TOP_K))
+
+    # Another worker process marks the top hit stale: only the database knows
+    settings.RETRIEVAL_HYBRID_ENABLED = False
+    top = dense_ids()[0]
+    db = SessionLocal()
+    try:
+        db.query(MemoryDoc).filter(MemoryDoc.id == top).update({"stale": True})
+        db.commit()
+    finally:
+        db.close()
+    dropped = top not in dense_ids()
+    # The stale flag is cached now, so it no longer takes a search slot either
+    got = dense_ids()
+    results.append(check("a doc marked stale by another process drops out on the next retrieval",
+                         dropped and top not in got and len(got) == TOP_K))
+
+    memory.doc_store.max_entries = 2
+    memory.doc_store.invalidate()
+    got = dense_ids()
+    results.append(check(f"the doc store keeps {len(memory.doc_store)} of {len(DOCS)} docs and still returns "
+                         f"{len(got)} facts", len(memory.doc_store) == 2 and len(got) == TOP_K))
+
+    print("=" * 50)
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
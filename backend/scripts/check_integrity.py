@@ -4,8 +4,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from db.engine import SessionLocal
-from db.models import Location, Character, Item, LoreFact
-from db.json_utils import loads
+from db.models import Character, Item, LoreFact
+from db.world_graph import build_world_graph
 
 def check_integrity():
     """Check database integrity"""
@@ -14,18 +14,29 @@ def check_integrity():
     
     try:
         # Check 1: All exits_json.to locations exist
-        locations = db.query(Location).all()
-        location_ids = {loc.id for loc in locations}
+        graph = build_world_graph(db)
+        location_ids = set(graph.ids)
         
-        for loc in locations:
-            if loc.exits_json:
-                exits = loads(loc.exits_json) if loc.exits_json else []
-                for exit in exits:
-                    if isinstance(exit, dict) and 'to' in exit:
-                        if exit['to'] not in location_ids:
-                            errors.append(f"Location '{loc.id}' has exit to non-existent location '{exit['to']}'")
+        for from_id, to_id in graph.dangling_exits:
+            errors.append(f"Location '{from_id}' has exit to non-existent location '{to_id}'")
         
-        print("✓ Check 1: All exits point to valid locations")
+        if not graph.dangling_exits:
+            print("✓ Check 1: All exits point to valid locations")
+        else:
+            print(f"✗ Check 1: Found {len(graph.dangling_exits)} exits to non-existent locations")
+        
+        # Check 1b: Every location can be reached by walking (warning only)
+        unreachable = {}
+        for location_id in graph.ids:
+            missing = graph.unreachable_from(location_id)
+            if missing:
+                unreachable[location_id] = missing
+        if not unreachable:
+            print("✓ Check 1b: Every location is reachable from every other")
+        else:
+            print(f"⚠ Check 1b: {len(unreachable)} location(s) can't reach the whole map")
+            for location_id, missing in unreachable.items():
+                print(f"    {location_id} -> unreachable: {', '.join(missing)}")
         
         # Check 2: No orphan characters.last_known_location_id
         characters = db.query(Character).all()
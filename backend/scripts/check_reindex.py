@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark the streaming bulk reindex.
+
+Uses a scratch database and FAISS index and a stand-in embeddings function
+(deterministic bag-of-words vectors after a fixed latency, with optional
+transient failures). Checks that requests respect the token and size
+limits, the concurrency cap and the rate limits, that transient failures
+are retried, that an interrupted run leaves the live index alone and the
+next run resumes from its checkpoint instead of starting over, and that
+the resulting index matches embedding every doc at once (also for int8
+and binary indexes, whose float vectors must line up). Checks that readers
+racing index rewrites that move docs to new positions only ever see an
+index with the doc id table saved with it, and that appends refuse a table
+that doesn't cover the index. Then compares throughput with one request in
+flight against the configured concurrency.
+
+Usage: python scripts/check_reindex.py [n_docs]
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = Path(tempfile.mkdtemp(prefix="reindex-check-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+import faiss
+import httpx
+import numpy as np
+import openai
+
+import ai.memory as memory
+from ai.prompt_builder import count_tokens
+from ai.reindex import BulkReindexer
+from app.config import settings
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+from scripts.init_db import init_database
+
+# Keep the real data/ index untouched
+memory.INDEX_PATH = _tmp / "faiss.index"
+memory.DOC_IDS_PATH = _tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = _tmp / "faiss_index.json"
+memory.VECTORS_PATH = _tmp / "faiss_vectors.f32"
+memory.LEGACY_MAPPING_PATH = _tmp / "faiss_mapping.json"
+
+DIM = 256
+LATENCY = 0.02
+BATCH_MAX_TOKENS = 2000
+BATCH_MAX_DOCS = 64
+WORDS = "fog gaslight cab coach ledger saw note ink blood diary Holmes Watson Finch Greel river bells court".split()
+_REQUEST = httpx.Request("POST", "http://stub.local/v1/embeddings")
+
+
+def vectorize(texts):
+    """Signed hashed bag-of-words unit vectors (stand-in for the embeddings API)"""
+    vectors = np.zeros((len(texts), DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(word.encode())
+            vectors[row, h % DIM] += 1.0 if h & 0x80000000 else -1.0
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class StubEmbeddings:
+    """Records each request; fails every ``fail_every``-th call, and for good from call ``fail_from``"""
+
+    def __init__(self, latency: float = LATENCY, fail_every: int = 0, fail_from: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_from = fail_from
+        self.calls = 0
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts, timeout):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.started.append(time.monotonic())
+        try:
+            time.sleep(self.latency)
+            if self.fail_from and call >= self.fail_from:
+                raise openai.AuthenticationError("key revoked", response=httpx.Response(401, request=_REQUEST), body=None)
+            if self.fail_every and call % self.fail_every == 0:
+                raise openai.APITimeoutError(request=_REQUEST)
+            with self._lock:
+                self.batches.append(list(texts))
+            return vectorize(texts)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return ok
+
+
+def make_corpus(n_docs: int):
+    """Insert n docs of varying length (a few over the per-input limit), some stale"""
+    rng = np.random.default_rng(0)
+    docs = []
+    for i in range(n_docs):
+        length = 5000 if i % 500 == 7 else int(rng.integers(4, 120))
+        text = f"Doc {i}: " + " ".join(rng.choice(WORDS, size=length))
+        docs.append(MemoryDoc(kind="known_fact", text=text, importance=0, stale=(i % 50 == 3)))
+    db = SessionLocal()
+    try:
+        db.add_all(docs)
+        db.commit()
+        return {doc.id: doc.text for doc in docs if not doc.stale}
+    finally:
+        db.close()
+
+
+def reindexer(stub, **overrides) -> BulkReindexer:
+    options = dict(
+        batch_max_tokens=BATCH_MAX_TOKENS, batch_max_docs=BATCH_MAX_DOCS, concurrency=4,
+        requests_per_minute=60000.0, tokens_per_minute=1e9, checkpoint_seconds=0.05,
+        timeout=5.0, max_retries=3, embed_fn=stub, embed_model="stub",
+    )
+    options.update(overrides)
+    return BulkReindexer(**options)
+
+
+def read_while_rewriting(vectors: dict, rounds: int = 40):
+    """
+    Rebuild the index in a new doc order ``rounds`` times while this thread
+    reads it back; returns (position checks, of them mismatched through
+    get_index_snapshot(), mismatched reading the index and table separately).
+    """
+    doc_ids = np.array(sorted(vectors))
+    done = threading.Event()
+
+    def save(order):
+        with memory.index_write_lock():
+            index = faiss.IndexFlatIP(DIM)
+            index.add(np.stack([vectors[doc_id] for doc_id in order]))
+            memory.save_index(index, order.tolist())
+
+    def rewrite():
+        rng = np.random.default_rng(2)
+        for _ in range(rounds):
+            save(rng.permutation(doc_ids))
+        done.set()
+
+    def matches(index, table) -> bool:
+        position = int(np.random.randint(index.ntotal))
+        doc_id = int(table.doc_ids_at([position])[0])
+        return doc_id in vectors and np.allclose(index.reconstruct(position), vectors[doc_id], atol=1e-5)
+
+    writer = threading.Thread(target=rewrite)
+    save(doc_ids)
+    memory.get_index_snapshot()
+    writer.start()
+    checks = paired_misses = unpaired_misses = 0
+    while not done.is_set():
+        snapshot = memory.get_index_snapshot()
+        paired_misses += not matches(snapshot.index, snapshot.table)
+        try:
+            unpaired_misses += not matches(memory.load_index(), memory.DocIdTable(memory.load_doc_ids()))
+        except Exception:
+            unpaired_misses += 1
+        checks += 1
+    writer.join()
+    return checks, paired_misses, unpaired_misses
+
+
+def main(n_docs: int = 3000) -> bool:
+    init_database()
+    live = [memory.promote_fact("Gaslight flickers on wet cobbles", kind="seed_lore")]
+    memory.build_index(vectorize([doc.text for doc in live]), [doc.id for doc in live])
+    corpus = make_corpus(n_docs)
+    corpus[live[0].id] = live[0].text
+    expected_ids = sorted(corpus)
+    results = []
+
+    print("Interrupted run")
+    stub = StubEmbeddings(fail_from=25)
+    try:
+        reindexer(stub).run(resume=False)
+        failed = False
+    except openai.AuthenticationError:
+        failed = True
+    results.append(check("non-retryable failure stops the run", failed))
+    index_path, ids_path, _, _ = BulkReindexer.checkpoint_paths()
+    partial = np.load(ids_path) if ids_path.exists() else np.empty(0)
+    results.append(check(f"checkpoint holds a prefix: {len(partial)} docs",
+                         0 < len(partial) < len(expected_ids) and partial.tolist() == expected_ids[:len(partial)]))
+    results.append(check("live index untouched", memory.load_index(mmap=False).ntotal == 1))
+
+    print("Resumed run (with transient failures)")
+    stub = StubEmbeddings(fail_every=7)
+    index = reindexer(stub).run()
+    embedded = [text for batch in stub.batches for text in batch]
+    results.append(check(f"resumed: {len(embedded)} docs embedded this run",
+                         len(embedded) == len(expected_ids) - len(partial)))
+    results.append(check(f"transient failures retried: {stub.calls - len(stub.batches)} retries",
+                         stub.calls > len(stub.batches) and index.ntotal == len(expected_ids)))
+    doc_ids = memory.load_doc_ids().tolist()
+    results.append(check("every non-stale doc indexed once, in id order", doc_ids == expected_ids))
+    sample = np.arange(0, len(doc_ids), 97)
+    reference = vectorize([" ".join(corpus[doc_ids[i]].split()) for i in sample])
+    long_docs = {i for i in sample if count_tokens(corpus[doc_ids[i]]) > BATCH_MAX_TOKENS}
+    same = [np.allclose(index.reconstruct(int(i)), reference[n], atol=1e-5) for n, i in enumerate(sample)]
+    results.append(check("vectors match embedding each doc directly",
+                         all(ok for ok, i in zip(same, sample) if i not in long_docs)))
+    results.append(check("checkpoint removed", not index_path.exists() and not ids_path.exists()))
+    results.append(check("live index swapped in", memory.load_index(mmap=False).ntotal == len(expected_ids)))
+
+    print("Limits")
+    sizes = [(len(batch), sum(count_tokens(text) for text in batch)) for batch in stub.batches]
+    results.append(check(f"requests within {BATCH_MAX_DOCS} docs / {BATCH_MAX_TOKENS} tokens: "
+                         f"largest {max(s for s, _ in sizes)} docs / {max(t for _, t in sizes)} tokens",
+                         all(s <= BATCH_MAX_DOCS and t <= BATCH_MAX_TOKENS for s, t in sizes)))
+    results.append(check(f"at most 4 requests in flight: {stub.max_in_flight}", 1 < stub.max_in_flight <= 4))
+    rpm = 1200.0  # 20 requests/s after a burst of rpm / 6
+    stub = StubEmbeddings(latency=0.0)
+    reindexer(stub, requests_per_minute=rpm, batch_max_docs=8).run(resume=False)
+    burst = rpm / 6.0
+    window = stub.started[-1] - stub.started[0]
+    expected = (len(stub.started) - burst) / (rpm / 60.0)
+    results.append(check(f"requests per minute respected: {len(stub.started)} requests in {window:.1f}s "
+                         f"(>= {expected:.1f}s)", window >= expected * 0.95))
+
+    print("Quantized indexes (interrupted, then resumed)")
+    memory.QUANTIZER_TRAIN_SIZE = 500  # train the int8 ranges after a few batches
+    for quantization in ("int8", "binary"):
+        try:
+            reindexer(StubEmbeddings(fail_from=40), quantization=quantization).run(resume=False)
+        except openai.AuthenticationError:
+            pass
+        stub = StubEmbeddings()
+        index = reindexer(stub, quantization=quantization).run()
+        resumed = sum(len(batch) for batch in stub.batches) < len(expected_ids)
+        vectors = memory.load_vectors(index)
+        aligned = (
+            vectors is not None and len(vectors) == index.ntotal == len(expected_ids)
+            and all(np.allclose(vectors[i], reference[n], atol=1e-5) for n, i in enumerate(sample) if i not in long_docs)
+        )
+        # Re-score every doc: the toy vectors share too few words for sign bits to rank them
+        settings.RETRIEVAL_RESCORE_FACTOR, factor = len(expected_ids), settings.RETRIEVAL_RESCORE_FACTOR
+        live = memory.get_index()
+        found = [memory.search("", top_k=1, index=live, query_vector=vectors[i:i + 1])[0][1] for i in sample]
+        settings.RETRIEVAL_RESCORE_FACTOR = factor
+        results.append(check(f"{quantization}: resumed, float vectors aligned, docs find themselves",
+                             resumed and aligned and found == sample.tolist()))
+
+    print("Index snapshots")
+    subset = expected_ids[:300]
+    checks, paired_misses, unpaired_misses = read_while_rewriting(dict(zip(subset, vectorize([corpus[i] for i in subset]))))
+    results.append(check(f"readers racing reordering rewrites see matching index and table: {paired_misses} misses "
+                         f"in {checks} reads ({unpaired_misses} reading the files separately)", paired_misses == 0))
+    memory._save_doc_ids(memory.load_doc_ids()[:-1])
+    try:
+        memory.add_to_index(vectorize(["Late summary"]), [10 ** 9])
+        refused = False
+    except ValueError:
+        refused = True
+    results.append(check("appends refuse a doc id table shorter than the index", refused))
+    results.append(check("a table that doesn't cover the index disables dense retrieval", memory.get_index() is None))
+
+    print("Throughput")
+    rates = {}
+    for concurrency in (1, 4, 8):
+        stub = StubEmbeddings()
+        start = time.perf_counter()
+        reindexer(stub, concurrency=concurrency, checkpoint_seconds=30.0).run(resume=False)
+        rates[concurrency] = len(expected_ids) / (time.perf_counter() - start)
+        print(f"  concurrency {concurrency}: {rates[concurrency]:>6.0f} docs/s "
+              f"({len(stub.batches)} requests, {LATENCY * 1000:.0f} ms each)")
+    results.append(check(f"concurrency 4 is {rates[4] / rates[1]:.1f}x faster than 1", rates[4] > 2 * rates[1]))
+
+    print("=" * 50)
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(*[int(arg) for arg in sys.argv[1:2]]) else 1)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Check the transcript summarizer (episodic memory).
+
+Uses a scratch database and FAISS index, the stub OpenAI client for the
+summaries and deterministic bag-of-words vectors for embeddings, and checks
+that full windows and idle players are summarized into player-scoped
+transcript docs, that progress is kept across passes, that the previous
+summary is passed as context, that summaries are appended to the index
+(and retried after an embedding failure, while later passes only read
+summaries newer than the last one indexed), and that retrieval only surfaces
+a player's own summaries. Then checks what several workers running the
+summarizer at once must not do: write two summaries of one window, or
+interleave their index appends (run from separate processes).
+
+Usage: python scripts/check_summarizer.py
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = Path(tempfile.mkdtemp(prefix="summarizer-check-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+import faiss
+import numpy as np
+
+import ai.memory as memory
+from ai.summarizer import TranscriptSummarizer
+from db.engine import SessionLocal
+from db.json_utils import dumps
+from db.models import MemoryDoc, TranscriptEvent
+from scripts.init_db import init_database
+from scripts.stub_openai import StubOpenAI
+
+# Keep the real data/ index untouched
+memory.INDEX_PATH = _tmp / "faiss.index"
+memory.LEGACY_MAPPING_PATH = _tmp / "faiss_mapping.json"
+memory.DOC_IDS_PATH = _tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = _tmp / "faiss_index.json"
+memory.VECTORS_PATH = _tmp / "faiss_vectors.f32"
+
+DIM = 256
+SUMMARY = "Watson searched the Ten Bells for Finch and found a brass charity token under the bar."
+
+
+def vectorize(texts):
+    """Hashed bag-of-words unit vectors (stand-in for the embeddings API)"""
+    vectors = np.zeros((len(texts), DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 1.0
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+# One worker's appends, run in a child process: (tmp dir, worker number)
+_APPENDS = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {scripts!r})
+import ai.memory as memory
+from check_summarizer import APPENDS, shared_doc_id, vectorize
+tmp = Path({tmp!r})
+memory.INDEX_PATH = tmp / "faiss.index"
+memory.DOC_IDS_PATH = tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = tmp / "faiss_index.json"
+memory.VECTORS_PATH = tmp / "faiss_vectors.f32"
+for i in range(APPENDS):
+    doc_ids = [{worker} * 1000 + i + 1000000, shared_doc_id(i)]
+    memory.add_to_index(vectorize([f"doc {{d}}" for d in doc_ids]), doc_ids)
+"""
+APPENDS = 15
+WORKERS = 4
+
+
+def shared_doc_id(i: int) -> int:
+    """A doc every worker appends (as when two summarizers embed the same pending docs)"""
+    return 2000000 + i
+
+
+def embeddings_down(texts):
+    raise RuntimeError("embeddings API down")
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return ok
+
+
+def add_turns(player_id: str, first_turn: int, count: int, created_at: datetime) -> None:
+    db = SessionLocal()
+    try:
+        for turn in range(first_turn, first_turn + count):
+            db.add(TranscriptEvent(
+                player_id=player_id,
+                turn=turn,
+                kind="narration",
+                payload_json=dumps({"player_intent": f"ask the barman about Finch ({turn})"}),
+                markdown=f"### The Ten Bells\n\n> Turn {turn} narration.\n\n**Next actions:**\n- leave",
+                created_at=created_at,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def transcript_docs():
+    db = SessionLocal()
+    try:
+        return db.query(MemoryDoc).filter(MemoryDoc.kind == "transcript").order_by(MemoryDoc.id).all()
+    finally:
+        db.close()
+
+
+def main() -> bool:
+    init_database()
+    base = [memory.promote_fact("Gaslight flickers on wet cobbles", kind="seed_lore")]
+    memory.build_index(vectorize([doc.text for doc in base]), [doc.id for doc in base])
+    memory.embed = vectorize
+    stub = StubOpenAI(latency=0.0, narration=SUMMARY)
+    summarizer = TranscriptSummarizer(window_turns=8, idle_flush_seconds=600, calls_per_minute=600)
+    now = datetime.utcnow()
+    results = []
+
+    print("First pass")
+    add_turns("alice", 1, 11, now)
+    add_turns("bob", 1, 2, now - timedelta(minutes=20))
+    written = summarizer.run_once(stub, now)
+    docs = transcript_docs()
+    results.append(check(f"full window and idle player summarized: {written} docs", written == 2))
+    results.append(check("docs are player-scoped", sorted(d.player_id for d in docs) == ["alice", "bob"]))
+    alice = next(d for d in docs if d.player_id == "alice")
+    results.append(check(f"alice's doc covers one window: {alice.text[:20]!r}", alice.text.startswith("Turns 1-8: ")))
+    index = memory.load_index()
+    positions = memory.get_doc_id_table().positions_of([d.id for d in docs])
+    results.append(check(f"summaries appended to the index: {index.ntotal} vectors",
+                         index.ntotal == 3 and bool((positions >= 0).all())))
+
+    print("Second pass")
+    calls = stub.calls
+    results.append(check("nothing due: no summaries, no LLM calls",
+                         summarizer.run_once(stub, now) == 0 and stub.calls == calls))
+    memory.embed = embeddings_down
+    written = summarizer.run_once(stub, now + timedelta(hours=1))
+    request = stub.requests[-1]["messages"][-1]["content"]
+    results.append(check("alice's remaining turns summarized once idle", written == 1))
+    results.append(check("previous summary passed as context", "[STORY SO FAR]" in request and SUMMARY in request))
+    results.append(check("turns before the watermark not resent", "Turn 8:" not in request and "Turn 9:" in request))
+    results.append(check("unembedded summary kept for later", memory.load_index().ntotal == 3))
+    memory.embed = vectorize
+    summarizer.run_once(stub, now + timedelta(hours=1))
+    results.append(check("embedded on the next pass", memory.load_index().ntotal == 4))
+    newest = max(d.id for d in transcript_docs())
+    results.append(check(f"later passes only read summaries after doc {summarizer._embedded_through}",
+                         summarizer._embedded_through == newest))
+
+    print("Retrieval")
+    facts = memory.retrieve_facts("brass charity token Finch", top_k=5, player_id="alice")
+    owners = {d.id: d.player_id for d in transcript_docs()}
+    surfaced = [owners[f["id"]] for f in facts if f["id"] in owners]
+    results.append(check(f"alice's summaries surface: {len(surfaced)}", surfaced and set(surfaced) == {"alice"}))
+
+    print("Concurrent workers")
+    add_turns("carol", 1, 8, now)
+    slow = StubOpenAI(latency=0.2, narration=SUMMARY)
+    workers = [TranscriptSummarizer(window_turns=8, calls_per_minute=600) for _ in range(2)]
+
+    def summarize(worker):
+        db = SessionLocal()
+        try:
+            worker.summarize_player(slow, "carol", db, now)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=summarize, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    carol = [d for d in transcript_docs() if d.player_id == "carol"]
+    results.append(check(f"two workers, one window: {len(carol)} summary", len(carol) == 1 and slow.calls == 2))
+
+    before = memory.load_index().ntotal
+    root = Path(__file__).parent.parent
+    children = [
+        subprocess.Popen([sys.executable, "-c", _APPENDS.format(
+            root=str(root), scripts=str(root / "scripts"), tmp=str(_tmp), worker=worker
+        )])
+        for worker in range(WORKERS)
+    ]
+    ok = all(child.wait() == 0 for child in children)
+    index = memory.load_index(mmap=False)
+    doc_ids = memory.load_doc_ids()
+    appended = [(p, int(d)) for p, d in enumerate(doc_ids.tolist()) if d >= 1000000]
+    aligned = all(
+        np.allclose(index.reconstruct(p), vectorize([f"doc {d}"])[0], atol=1e-5) for p, d in appended
+    )
+    expected = before + APPENDS * (WORKERS + 1)
+    results.append(check(f"{WORKERS} processes appending: {index.ntotal} vectors, {len(doc_ids)} ids "
+                         f"(expected {expected}), each id on its own vector",
+                         ok and index.ntotal == len(doc_ids) == expected and aligned))
+
+    print("=" * 50)
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
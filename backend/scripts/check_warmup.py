@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Check the startup warm-up and the /health/ready readiness endpoint.
+
+Starts the app (lifespan included) against a throwaway seeded database and
+checks that readiness is reported per component, that every component is
+warm before the first request is served, and that a failing component keeps
+the worker out of rotation without stopping the others. Then reseeds from
+another process, as scripts/seed_db.py would against a live server, and
+checks that the warm world data caches pick the change up.
+
+Usage: python scripts/check_warmup.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="warmup-check-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+os.environ.setdefault("OPENAI_API_KEY", "sk-warmup-check")
+
+from fastapi.testclient import TestClient
+
+import ai.memory
+from app.main import app
+from app.warmup import COMPONENTS, WarmupState, warm_up, warmup_state
+from db.location_cards import get_location_card
+from db.world_graph import get_world_graph
+from db.world_version import VERSION_CHECK_SECONDS
+from scripts.init_db import init_database
+from scripts.seed_db import seed_database
+
+# Run in a child process against the same database
+_RESEED = (
+    "import sys; sys.path.insert(0, {root!r}); "
+    "from db.engine import SessionLocal; from db.seed import upsert_character, upsert_location; "
+    "db = SessionLocal(); "
+    "upsert_character(db, {{'id': 'finch', 'name': 'Finch', 'last_known_location_id': '221b_baker_street'}}); "
+    "upsert_location(db, {{'id': 'scotland_yard_records', 'name': 'Scotland Yard – Records and Evidence', "
+    "'exits': [{{'to': '221b_baker_street'}}, {{'to': 'whitechapel_streets'}}, {{'to': 'st_bartholomews_theatre'}}]}}); "
+    "db.close()"
+)
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return ok
+
+
+def main() -> bool:
+    init_database()
+    seed_database()
+    results = []
+
+    print("Before startup")
+    report = warmup_state.report()
+    results.append(check("readiness reports warming", report["status"] == "warming" and not report["ready"]))
+
+    print("After startup (lifespan warm-up)")
+    with TestClient(app) as client:
+        response = client.get("/health/ready")
+        body = response.json()
+        results.append(check("/health/ready answers 200", response.status_code == 200))
+        results.append(check(
+            "every component is ready",
+            set(body["components"]) == {name for name, _ in COMPONENTS}
+            and all(c["status"] == "ready" for c in body["components"].values())
+        ))
+        for name, component in body["components"].items():
+            print(f"      {name:<14} {component['seconds'] * 1000:7.1f} ms  {component['detail']}")
+        results.append(check("/health liveness unchanged", client.get("/health/").json() == {"status": "ok"}))
+
+    print("Failing component")
+    key = os.environ.pop("OPENAI_API_KEY")
+    ai.memory._shared_client = None
+    state = WarmupState([name for name, _ in COMPONENTS])
+    ready = warm_up(state)
+    os.environ["OPENAI_API_KEY"] = key
+    report = state.report()
+    results.append(check("warm-up reports not ready", not ready and report["status"] == "failed"))
+    results.append(check("only the OpenAI client failed", [
+        name for name, c in report["components"].items() if c["status"] != "ready"
+    ] == ["openai_client"]))
+
+    print("Reseeding from another process")
+    before = get_location_card("221b_baker_street")
+    was_adjacent = get_world_graph().is_adjacent("scotland_yard_records", "st_bartholomews_theatre")
+    subprocess.run([sys.executable, "-c", _RESEED.format(root=str(Path(__file__).parent.parent))], check=True)
+    time.sleep(VERSION_CHECK_SECONDS)
+    after = get_location_card("221b_baker_street")
+    characters = lambda card: {c["id"] for c in card["characters"]}
+    results.append(check("location card shows the character the other process moved in",
+                         "finch" not in characters(before) and "finch" in characters(after)))
+    results.append(check("world graph has the exit the other process added",
+                         not was_adjacent and get_world_graph().is_adjacent("scotland_yard_records", "st_bartholomews_theatre")))
+
+    print("=" * 50)
+    print("All checks passed" if all(results) else "Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -71,16 +71,16 @@ try:
     print("CONTEXT ENGINE INTEGRATION VERIFICATION")
     print("-"*70)
     
-    from ai.prompts import SYSTEM_PROMPT
+    from ai.prompts import RELEVANT_FACTS_TEMPLATE
     
     # Simulate what retrieve_context would return
     sample_facts = "\n".join([d.text for d in holmes_docs[:3] if holmes_docs])
     if not sample_facts:
         sample_facts = docs[0].text if docs else "(No relevant facts found)"
     
-    formatted_prompt = SYSTEM_PROMPT.format(relevant_facts=sample_facts)
+    formatted_prompt = RELEVANT_FACTS_TEMPLATE.format(relevant_facts=sample_facts)
     
-    print("\n✓ SYSTEM_PROMPT includes [RELEVANT FACTS] section")
+    print("\n✓ Per-turn prompt includes [RELEVANT FACTS] section")
     print("\nExample formatted prompt with relevant facts:")
     print("-"*70)
     
@@ -100,7 +100,7 @@ try:
 Once you run the verification script, you should see:
 
 ✓ FAISS index exists
-✓ Loaded mapping with 6 entries
+✓ Loaded doc id table with 6 entries
 ✓ Found 3 matches for 'Holmes'
 ✓ Top 3 results with similarity scores displayed
 ✓ Retrieved context for test query
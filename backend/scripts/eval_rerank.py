@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of memory re-ranking (importance, recency and MMR).
+
+Builds a scratch memory with clusters of near-duplicate facts, lore rules
+(importance 1) and facts that were superseded by newer ones, indexes it with
+deterministic bag-of-words vectors (no API calls) and runs labeled queries
+through retrieve_facts() with re-ranking off, with weights only, with MMR
+only and with the configured settings. Each configuration is scored on
+
+- coverage@k: distinct relevant facets in the top k (recall that doesn't
+  count a paraphrase twice)
+- redundancy@k: share of the top k that repeats a facet already listed
+- rules@k: queries whose governing lore rule made the top k
+- freshness: queries where the newer of two conflicting facts ranks first
+
+in dense mode (FAISS vectors, embedding diversity) and lexical mode (BM25,
+word-overlap diversity, as when the embeddings API is down).
+
+Usage: python scripts/eval_rerank.py [k]
+"""
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = Path(tempfile.mkdtemp(prefix="rerank-eval-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+import faiss
+import numpy as np
+
+import ai.memory as memory
+from app.config import settings
+from db.engine import SessionLocal
+from db.models import MemoryDoc
+from scripts.init_db import init_database
+
+# Keep the real data/ index untouched
+memory.INDEX_PATH = _tmp / "faiss.index"
+memory.LEGACY_MAPPING_PATH = _tmp / "faiss_mapping.json"
+memory.DOC_IDS_PATH = _tmp / "faiss_doc_ids.npy"
+memory.INDEX_CONFIG_PATH = _tmp / "faiss_index.json"
+memory.VECTORS_PATH = _tmp / "faiss_vectors.f32"
+
+DIM = 512
+
+# (facet, kind, importance, age in hours, text); paraphrases share a facet
+CORPUS = [
+    ("coach_sighting", "known_fact", 0, 200, "A phantom coach was seen in the fog near Miller's Court"),
+    ("coach_sighting", "known_fact", 0, 190, "Witnesses saw a phantom coach in the fog near Miller's Court"),
+    ("coach_sighting", "known_fact", 0, 180, "The phantom coach was seen again in the fog by Miller's Court"),
+    ("coach_driver", "known_fact", 0, 150, "A masked coachman drives the phantom coach"),
+    ("coach_route", "known_fact", 0, 140, "The coach turns down Hanbury Street after midnight"),
+    ("coach_rule", "lore_rule", 1, 400, "The driver of the coach is never unmasked before the second act"),
+    ("finch_old", "known_fact", 0, 480, "Finch was last seen drinking at the Ten Bells"),
+    ("finch_new", "known_fact", 0, 1, "Finch was last seen hiding in a Flower and Dean Street lodging house"),
+    ("finch_bio", "entity_card", 0, 400, "Finch: a nervous cab driver who owes money to everyone in Whitechapel"),
+    ("note_ink", "known_fact", 0, 100, "The note is written in red ink and signed From Hell"),
+    ("note_ink", "known_fact", 0, 90, "The note, signed From Hell, is written in red ink"),
+    ("note_ink", "known_fact", 0, 80, "A note in red ink signed From Hell was delivered"),
+    ("note_blood", "known_fact", 0, 70, "The red ink on the note is iron gall darkened with blood"),
+    ("note_hand", "known_fact", 0, 60, "The handwriting on the note matches the diary margin"),
+    ("laudanum_effect", "known_fact", 0, 300, "Laudanum calms Watson's shaking hands"),
+    ("laudanum_effect", "known_fact", 0, 290, "A dose of laudanum calms Watson's shaking hands"),
+    ("laudanum_rule", "lore_rule", 1, 400, "Every dose of laudanum lowers Watson's stability"),
+    ("laudanum_shop", "known_fact", 0, 250, "The chemist on Commercial Street sells laudanum without questions"),
+    ("saw_ledger", "known_fact", 0, 120, "The tool ledger shows the surgical saw was borrowed on the night of the murder"),
+    ("saw_ledger", "known_fact", 0, 110, "The tool ledger says the surgical saw was borrowed on the murder night"),
+    ("saw_borrower", "known_fact", 0, 100, "Greel signed for the surgical saw under a false name"),
+    ("saw_old", "known_fact", 0, 600, "The surgical saw was reported lost from the anatomy theatre"),
+    ("saw_new", "known_fact", 0, 2, "The surgical saw was found returned to the anatomy theatre, freshly cleaned"),
+    ("holmes_trust", "known_fact", 0, 50, "Watson no longer trusts Holmes after the records office lie"),
+    ("holmes_rule", "lore_rule", 1, 400, "Holmes never lies to Watson about evidence he has seen"),
+    ("yard_records", "known_fact", 0, 40, "The Yard's records office misfiled the witness statement"),
+    ("gaslight", "seed_lore", 0, 400, "Gaslight flickers on wet cobbles all along Whitechapel Road"),
+    ("river", "seed_lore", 0, 400, "The river fog rolls in off the Thames every evening"),
+    ("bells", "seed_lore", 0, 400, "The church bells of Christ Church ring the hours"),
+]
+
+# (query, relevant facets, rule facet or None, (newer facet, older facet) or None)
+QUERIES = [
+    ("who drives the phantom coach in the fog", {"coach_sighting", "coach_driver", "coach_route", "coach_rule"}, "coach_rule", None),
+    ("tell me about the phantom coach", {"coach_sighting", "coach_driver", "coach_route"}, None, None),
+    ("where was Finch last seen", {"finch_old", "finch_new", "finch_bio"}, None, ("finch_new", "finch_old")),
+    ("read the note in red ink", {"note_ink", "note_blood", "note_hand"}, None, None),
+    ("who wrote the note signed From Hell", {"note_ink", "note_hand"}, None, None),
+    ("take a dose of laudanum", {"laudanum_effect", "laudanum_rule", "laudanum_shop"}, "laudanum_rule", None),
+    ("who borrowed the surgical saw", {"saw_ledger", "saw_borrower", "saw_old", "saw_new"}, None, None),
+    ("where is the surgical saw now", {"saw_old", "saw_new", "saw_ledger"}, None, ("saw_new", "saw_old")),
+    ("can Watson trust Holmes", {"holmes_trust", "holmes_rule"}, "holmes_rule", None),
+    ("search the Yard's records office", {"yard_records", "holmes_trust"}, None, None),
+]
+
+
+def vectorize(texts):
+    """Hashed bag-of-words unit vectors (stand-in for the embeddings API)"""
+    vectors = np.zeros((len(texts), DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 1.0
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build_memory():
+    """Insert the corpus and index it; returns (FAISS index, {doc id: facet})"""
+    now = datetime.utcnow()
+    docs = [
+        MemoryDoc(kind=kind, text=text, importance=importance, created_at=now - timedelta(hours=age))
+        for _, kind, importance, age, text in CORPUS
+    ]
+    db = SessionLocal()
+    try:
+        db.add_all(docs)
+        db.commit()
+        facets = {doc.id: facet for doc, (facet, *_) in zip(docs, CORPUS)}
+    finally:
+        db.close()
+    doc_ids = list(facets)
+    index = memory.build_index(vectorize([text for *_, text in CORPUS]), doc_ids)
+    return index, facets
+
+
+CONFIGS = [
+    # (name, overrides)
+    ("no re-ranking", {"RERANK_ENABLED": False}),
+    ("weights only", {"RERANK_MMR_LAMBDA": 1.0}),
+    ("MMR only", {"RERANK_IMPORTANCE_WEIGHT": 0.0, "RERANK_RECENCY_WEIGHT": 0.0}),
+    ("configured", {}),
+]
+
+
+def evaluate(k: int, dense: bool, index, facets, query_vectors) -> dict:
+    """Score the top k of every query"""
+    coverage, redundancy, latencies = [], [], []
+    rules, fresh = [], []
+    for i, (query, relevant, rule, conflict) in enumerate(QUERIES):
+        start = time.perf_counter()
+        facts = memory.retrieve_facts(
+            query, top_k=k, index=index, query_vector=query_vectors[i:i + 1] if dense else None, dense=dense
+        )
+        latencies.append(time.perf_counter() - start)
+        listed = [facets[fact["id"]] for fact in facts]
+
+        coverage.append(len(relevant & set(listed)) / min(k, len(relevant)))
+        redundancy.append(sum(facet in listed[:n] for n, facet in enumerate(listed)) / max(1, len(listed)))
+        if rule:
+            rules.append(rule in listed)
+        if conflict:
+            newer, older = conflict
+            rank = {facet: n for n, facet in reversed(list(enumerate(listed)))}
+            fresh.append(newer in rank and rank[newer] < rank.get(older, k))
+    return {
+        "coverage": statistics.mean(coverage),
+        "redundancy": statistics.mean(redundancy),
+        "rules": statistics.mean(rules),
+        "fresh": statistics.mean(fresh),
+        "p50_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def main(k: int = 3) -> bool:
+    init_database()
+    index, facets = build_memory()
+    query_vectors = vectorize([query for query, *_ in QUERIES])
+    print(f"{len(CORPUS)} memory docs, {len(QUERIES)} labeled queries, top {k} of "
+          f"{max(k, settings.RETRIEVAL_CANDIDATES)} candidates")
+    print(f"Configured: similarity {settings.RERANK_SIMILARITY_WEIGHT}, importance {settings.RERANK_IMPORTANCE_WEIGHT}, "
+          f"recency {settings.RERANK_RECENCY_WEIGHT} (half-life {settings.RERANK_RECENCY_HALF_LIFE_HOURS} h), "
+          f"MMR lambda {settings.RERANK_MMR_LAMBDA}")
+
+    ok = True
+    for mode, dense in (("dense (FAISS)", True), ("lexical (BM25)", False)):
+        print("=" * 78)
+        print(f"{mode:<16} | {'coverage@' + str(k):>11} | {'redundancy':>10} | {'rules':>6} | {'fresh':>6} | {'p50':>8}")
+        results = {}
+        for name, overrides in CONFIGS:
+            saved = {key: getattr(settings, key) for key in overrides}
+            for key, value in overrides.items():
+                setattr(settings, key, value)
+            settings.RETRIEVAL_HYBRID_ENABLED = not dense
+            try:
+                r = results[name] = evaluate(k, dense, index, facets, query_vectors)
+            finally:
+                for key, value in saved.items():
+                    setattr(settings, key, value)
+            print(f"{name:<16} | {r['coverage']:>11.1%} | {r['redundancy']:>10.1%} | {r['rules']:>6.0%} | "
+                  f"{r['fresh']:>6.0%} | {r['p50_ms']:>5.2f} ms")
+
+        base, tuned = results["no re-ranking"], results["configured"]
+        # Coverage is reported rather than checked: importance and recency
+        # may trade a facet for a rule or a newer fact
+        checks = [
+            ("no more near-duplicates than without re-ranking", tuned["redundancy"] <= base["redundancy"]),
+            ("surfaces at least as many rules and fresh facts",
+             tuned["rules"] >= base["rules"] and tuned["fresh"] >= base["fresh"]),
+        ]
+        for label, passed in checks:
+            print(f"  {'✓' if passed else '✗'} {label}")
+            ok = ok and passed
+    settings.RETRIEVAL_HYBRID_ENABLED = True
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
@@ -6,10 +6,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from db.engine import Base, engine
 # Import all models to register them with Base
 from db import models
+from ai.lexical import ensure_lexical_index
 
 def init_database():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    # FTS5 virtual table for lexical memory search (not an ORM model)
+    ensure_lexical_index()
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
@@ -27,7 +27,9 @@ def main():
     try:
         from db.engine import Base, engine
         from db import models  # Import all models to register them
+        from ai.lexical import ensure_lexical_index
         Base.metadata.create_all(bind=engine)
+        ensure_lexical_index()
         print("✓ Database tables created successfully")
     except Exception as e:
         print(f"✗ Failed to create tables: {e}")
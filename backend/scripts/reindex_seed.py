@@ -1,40 +1,39 @@
 #!/usr/bin/env python3
-"""Rebuild FAISS index from all non-stale MemoryDoc entries"""
+"""
+Rebuild the FAISS and lexical (FTS5) indexes from all non-stale MemoryDoc entries.
+
+Embedding is batched, concurrent and rate limited (REINDEX_* and EMBED_*
+settings) and checkpointed: an interrupted rebuild resumes where it
+stopped unless --restart is given.
+
+Usage: python scripts/reindex_seed.py [--restart]
+"""
 import sys
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ai.memory import embed, build_index
-from db.engine import SessionLocal
-from db.models import MemoryDoc
-import numpy as np
+from ai.lexical import rebuild_lexical_index
+from ai.reindex import BulkReindexer
 
 
-def reindex():
+def reindex(resume: bool = True):
     """Rebuild FAISS index from all non-stale memory documents"""
-    db = SessionLocal()
-    try:
-        docs = db.query(MemoryDoc).filter(MemoryDoc.stale == False).order_by(MemoryDoc.id).all()
-        if not docs:
-            print("No memory docs to embed.")
-            return
-        
-        texts = [d.text for d in docs]
-        doc_ids = [d.id for d in docs]
-        
-        print(f"Embedding {len(texts)} memory documents...")
-        
-        vectors = embed(texts)
-        build_index(vectors, doc_ids)
-        
-        print(f"✅ Indexed {len(texts)} memory docs.")
-        print(f"   Vector dimension: {vectors.shape[1]}")
-    finally:
-        db.close()
+    # The lexical index needs no API calls: rebuild it first so search works
+    # even if embedding fails
+    rebuild_lexical_index()
+    print("✅ Rebuilt lexical index.")
+    
+    print("Embedding memory documents...")
+    index = BulkReindexer.from_settings().run(resume=resume)
+    if index is None:
+        print("No memory docs to embed.")
+        return
+    
+    print(f"✅ Indexed {index.ntotal} memory docs.")
+    print(f"   Vector dimension: {index.d}")
 
 
 if __name__ == "__main__":
-    reindex()
-
+    reindex(resume="--restart" not in sys.argv[1:])
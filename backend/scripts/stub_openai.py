@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Local fault-injecting stand-in for the OpenAI client.
+
+Implements just enough of ``client.chat.completions.create`` (plain, JSON
+and streaming) for the planner, narrator and fast turns, with configurable latency,
+slow-tail and error injection. Usage reports simulate provider prompt-prefix
+caching so prompt layouts can be checked for cache hits. Used by the resilience checks and the
+benchmarks so they run deterministically without network access.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+import openai
+
+from ai.prompts import PLAN_MARKER
+
+DEFAULT_PLAN = {
+    "action": "look around",
+    "targets": [],
+    "state_changes": [],
+    "notes": "",
+}
+
+DEFAULT_NARRATION = """### Baker Street, Early Morning
+
+> Grey light seeps through the curtains. Holmes is already at the window, pipe unlit.
+
+_Something in the street has caught his eye._
+
+**Next actions:**
+- look out of the window
+- ask Holmes what he sees
+- examine the letter
+"""
+
+_REQUEST = httpx.Request("POST", "http://stub.local/v1/chat/completions")
+
+
+class StubCompletions:
+    """``client.chat.completions`` replacement"""
+
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, timeout: Optional[float] = None, stream: bool = False, **kwargs):
+        return self._stub._complete(kwargs, timeout=timeout, stream=stream)
+
+
+class StubOpenAI:
+    """
+    Fake OpenAI client.
+
+    Args:
+        latency: Base seconds before the response (or first chunk)
+        jitter: Uniform random extra latency in seconds
+        slow_rate: Fraction of calls that take slow_latency instead
+        slow_latency: Latency of the slow tail in seconds
+        error_rate: Fraction of calls failing with a 500
+        fail_first: Number of initial calls that fail with a 500
+        outage: If True every call fails with a 503
+        chunk_delay: Seconds between streamed chunks
+        plan: JSON object returned for ``response_format=json_object`` calls
+        narration: Markdown returned for other calls
+        seed: Random seed for reproducible runs
+        cache_min_tokens: Shortest prefix the simulated prompt cache serves
+            (the API caches prefixes of 1024+ tokens, in 128-token steps)
+        model_latency: Base latency per model name, overriding ``latency``
+        invalid_plan_models: Models whose plans fail validate_plan()
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 2.0,
+        error_rate: float = 0.0,
+        fail_first: int = 0,
+        outage: bool = False,
+        chunk_delay: float = 0.0,
+        plan: Optional[dict] = None,
+        narration: str = DEFAULT_NARRATION,
+        seed: int = 0,
+        cache_min_tokens: int = 1024,
+        model_latency: Optional[Dict[str, float]] = None,
+        invalid_plan_models: Iterable[str] = (),
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.outage = outage
+        self.chunk_delay = chunk_delay
+        self.plan = plan or DEFAULT_PLAN
+        self.narration = narration
+        self.cache_min_tokens = cache_min_tokens
+        self.model_latency = model_latency or {}
+        self.invalid_plan_models = set(invalid_plan_models)
+        self.calls = 0
+        self.requests: List[dict] = []
+        self._prompts: List[str] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=StubCompletions(self))
+
+    def with_options(self, **_options) -> "StubOpenAI":
+        return self
+
+    def _complete(self, kwargs: dict, timeout: Optional[float], stream: bool):
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+            self.requests.append(kwargs)
+            usage = self._usage(kwargs.get("messages", []))
+            roll = self._random.random()
+            slow = self._random.random() < self.slow_rate
+            base = self.model_latency.get(kwargs.get("model"), self.latency)
+            delay = (self.slow_latency if slow else base) + self._random.uniform(0, self.jitter)
+
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise openai.APITimeoutError(request=_REQUEST)
+        time.sleep(delay)
+
+        if self.outage:
+            raise _status_error(503)
+        if call_number <= self.fail_first or roll < self.error_rate:
+            raise _status_error(500)
+
+        if kwargs.get("response_format", {}).get("type") == "json_object":
+            plan = self.plan
+            if kwargs.get("model") in self.invalid_plan_models:
+                plan = {**plan, "state_changes": [{"entity": "player", "op": "teleport"}]}
+            content = json.dumps(plan)
+        elif any(PLAN_MARKER in message.get("content", "") for message in kwargs.get("messages", [])):
+            # Fast turn: narration followed by the plan block
+            content = f"{self.narration}\n{PLAN_MARKER}\n{json.dumps(self.plan)}"
+        else:
+            content = self.narration
+
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return self._stream(content, usage if include_usage else None)
+        return _completion(content, usage)
+
+    def _usage(self, messages: List[dict]) -> SimpleNamespace:
+        """Token usage with cached_tokens = longest previously seen prompt prefix"""
+        prompt = "".join(message.get("content", "") for message in messages)
+        common = max((len(os.path.commonprefix([prompt, seen])) for seen in self._prompts), default=0)
+        self._prompts.append(prompt)
+
+        prompt_tokens = math.ceil(len(prompt) / 4)
+        cached_tokens = (common // 4) // 128 * 128
+        if cached_tokens < self.cache_min_tokens:
+            cached_tokens = 0
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=0,
+            total_tokens=prompt_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        )
+
+    def _stream(self, content: str, usage: Optional[SimpleNamespace]):
+        for start in range(0, len(content), 16):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + 16]))],
+                usage=None,
+            )
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+def _completion(content: str, usage: SimpleNamespace):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=usage,
+    )
+
+
+def _status_error(status_code: int) -> openai.APIStatusError:
+    response = httpx.Response(status_code, request=_REQUEST)
+    if status_code >= 500:
+        return openai.InternalServerError(f"stub upstream error {status_code}", response=response, body=None)
+    return openai.APIStatusError(f"stub upstream error {status_code}", response=response, body=None)
@@ -6,7 +6,7 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ai.memory import search, retrieve_context, load_mapping
+from ai.memory import search, retrieve_context, get_doc_id_table
 from db.engine import SessionLocal
 from db.models import MemoryDoc
 
@@ -21,9 +21,9 @@ def test_memory():
         print("❌ FAISS index not found. Run 'python scripts/reindex_seed.py' first.")
         return False
     
-    # Check mapping
-    mapping = load_mapping()
-    print(f"✓ Loaded mapping with {len(mapping)} entries")
+    # Check doc id table
+    table = get_doc_id_table()
+    print(f"✓ Loaded doc id table with {len(table)} entries")
     
     # Check memory docs
     db = SessionLocal()
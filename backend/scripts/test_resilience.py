@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Exercise LLM admission, retry, hedging and circuit breaking against the local fault-injecting stub"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings are read at import: point them at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="resilience-check-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/game.db"
+
+from ai.llm import create_chat_completion
+from ai.metrics import metrics
+from ai.planner import plan_turn
+from ai.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_resilience
+from ai.scheduler import LLMAdmissionTimeout, LLMLimiter, llm_limiter
+from app.config import settings
+from scripts.init_db import init_database
+from scripts.stub_openai import StubOpenAI
+
+SYSTEM_PROMPT = "You are the planner."
+SNAPSHOT = {"player": {"id": "demo", "current_location_id": "221b_baker_street"}}
+
+
+def _call(stub, breaker, policy=None, deadline=5.0, attempt_timeout=1.0, hedge_delay=None):
+    def attempt(timeout):
+        return stub.chat.completions.create(
+            timeout=timeout,
+            model="stub",
+            response_format={"type": "json_object"},
+            messages=[{"role": "system", "content": SYSTEM_PROMPT}],
+        )
+    return call_with_resilience(
+        attempt,
+        stage="check",
+        policy=policy or RetryPolicy(max_retries=2, base_delay=0.01, max_delay=0.05),
+        breaker=breaker,
+        deadline_seconds=deadline,
+        attempt_timeout=attempt_timeout,
+        hedge_delay=hedge_delay,
+    )
+
+
+def check_retry_recovers() -> bool:
+    stub = StubOpenAI(latency=0.01, fail_first=2)
+    _call(stub, CircuitBreaker("check", failure_threshold=5))
+    ok = stub.calls == 3
+    print(f"{'✓' if ok else '✗'} Transient 500s are retried: succeeded after {stub.calls} calls")
+    return ok
+
+
+def check_timeout_respects_deadline() -> bool:
+    stub = StubOpenAI(latency=2.0)
+    start = time.monotonic()
+    try:
+        _call(stub, CircuitBreaker("check", failure_threshold=10), deadline=0.6, attempt_timeout=0.25)
+        ok = False
+    except Exception as exc:
+        elapsed = time.monotonic() - start
+        ok = elapsed < 1.0
+        print(f"{'✓' if ok else '✗'} Hung upstream gives up within deadline: "
+              f"{type(exc).__name__} after {elapsed:.2f}s ({stub.calls} attempts)")
+    return ok
+
+
+def check_breaker_fails_fast() -> bool:
+    stub = StubOpenAI(latency=0.01, outage=True)
+    breaker = CircuitBreaker("check", failure_threshold=3, reset_timeout=0.3)
+    try:
+        _call(stub, breaker, policy=RetryPolicy(max_retries=5, base_delay=0.01, max_delay=0.01))
+    except Exception:
+        pass
+    calls_before = stub.calls
+    start = time.monotonic()
+    try:
+        _call(stub, breaker)
+        rejected = False
+    except CircuitOpenError:
+        rejected = True
+    fast = time.monotonic() - start < 0.01
+    opened_ok = breaker.state == "open" and rejected and fast and stub.calls == calls_before
+    print(f"{'✓' if opened_ok else '✗'} Outage opens the circuit after {calls_before} failures; next call rejected instantly")
+
+    stub.outage = False
+    time.sleep(0.35)
+    _call(stub, breaker)
+    closed_ok = breaker.state == "closed"
+    print(f"{'✓' if closed_ok else '✗'} Half-open probe succeeds and closes the circuit")
+    return opened_ok and closed_ok
+
+
+def check_local_errors_leave_breaker_open() -> bool:
+    stub = StubOpenAI(latency=0.01, outage=True)
+    breaker = CircuitBreaker("check", failure_threshold=1, reset_timeout=0.1)
+    try:
+        _call(stub, breaker, policy=RetryPolicy(max_retries=0))
+    except Exception:
+        pass
+    time.sleep(0.15)
+
+    def shed(timeout):
+        raise LLMAdmissionTimeout("LLM rate limit reached", retry_after=1)
+
+    def bug(timeout):
+        raise KeyError("choices")
+
+    still_open = True
+    for attempt in (shed, bug):
+        try:
+            call_with_resilience(attempt, "check", RetryPolicy(max_retries=0), breaker, 1.0, 1.0)
+        except (LLMAdmissionTimeout, KeyError):
+            pass
+        still_open = still_open and breaker.state != "closed"
+    calls = stub.calls
+    stub.outage = False
+    _call(stub, breaker)
+    probed = stub.calls == calls + 1 and breaker.state == "closed"
+    ok = still_open and probed
+    print(f"{'✓' if ok else '✗'} Local admission timeouts and our own errors don't close a half-open circuit; "
+          f"the next real call probes it")
+    return ok
+
+
+def check_hedging_cuts_tail() -> bool:
+    def p99(hedge_delay):
+        stub = StubOpenAI(latency=0.02, slow_rate=0.05, slow_latency=0.5, seed=7)
+        breaker = CircuitBreaker("check", failure_threshold=100)
+        samples = []
+        for _ in range(200):
+            start = time.monotonic()
+            _call(stub, breaker, hedge_delay=hedge_delay)
+            samples.append(time.monotonic() - start)
+        samples.sort()
+        return samples[197], stub.calls
+
+    plain_p99, plain_calls = p99(None)
+    hedged_p99, hedged_calls = p99(0.05)
+    ok = hedged_p99 < plain_p99
+    print(f"{'✓' if ok else '✗'} Hedging after 50ms: p99 {plain_p99 * 1000:.0f}ms -> {hedged_p99 * 1000:.0f}ms "
+          f"({hedged_calls - plain_calls} extra calls)")
+    return ok
+
+
+def check_admission_waits_on_event_loop() -> bool:
+    limiter = LLMLimiter(max_concurrency=1, requests_per_minute=6000, admission_timeout=0.3, slot_timeout=0.1)
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with limiter.slot("check"):
+            held.set()
+            release.wait()
+
+    async def admit_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        start = time.monotonic()
+        try:
+            await limiter.admit("check")
+            shed = None
+        except LLMAdmissionTimeout as exc:
+            shed = exc
+        waited = time.monotonic() - start
+        ticker.cancel()
+        return shed, waited, ticks
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    shed, waited, ticks = asyncio.run(admit_while_ticking())
+    start = time.monotonic()
+    try:
+        with limiter.slot("check"):
+            pass
+        thread_wait = None
+    except LLMAdmissionTimeout:
+        thread_wait = time.monotonic() - start
+    release.set()
+    holder.join()
+    start = time.monotonic()
+    asyncio.run(limiter.admit("check")).release()
+    admitted = time.monotonic() - start
+    ok = (
+        shed is not None and shed.retry_after >= 1 and 0.25 < waited < 0.5 and ticks >= 15
+        and thread_wait is not None and thread_wait < 0.2 and admitted < 0.05
+    )
+    print(f"{'✓' if ok else '✗'} Admission waits on the event loop ({ticks} ticks while waiting) and sheds after "
+          f"{waited:.2f}s with Retry-After {getattr(shed, 'retry_after', None)}; a worker thread waits "
+          f"{thread_wait or 0:.2f}s at most")
+    return ok
+
+
+def check_admission_reserves_slot() -> bool:
+    from fastapi.concurrency import run_in_threadpool
+
+    limiter = LLMLimiter(max_concurrency=1, requests_per_minute=6000, admission_timeout=0.3, slot_timeout=0.1)
+
+    def background_call():
+        """Prefetch-style work on its own thread, outside any request"""
+        outcome = []
+
+        def call():
+            try:
+                with limiter.slot("prefetch"):
+                    outcome.append(True)
+            except LLMAdmissionTimeout:
+                outcome.append(False)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        thread.join()
+        return outcome[0]
+
+    def request_call():
+        start = time.monotonic()
+        with limiter.slot("turn"):
+            return time.monotonic() - start
+
+    async def admitted_turn():
+        with await limiter.admit("turn"):
+            stolen = background_call()
+            waited = await run_in_threadpool(request_call)
+        with await limiter.admit("turn"):
+            pass  # unused reservations are given back
+        return stolen, waited
+
+    stolen, waited = asyncio.run(admitted_turn())
+    freed = background_call()
+    ok = not stolen and waited < 0.05 and freed
+    print(f"{'✓' if ok else '✗'} An admitted turn's slot is reserved: background work can't take it, the turn's "
+          f"worker thread uses it at once ({waited * 1000:.1f} ms), and an unused one is given back")
+    return ok
+
+
+def check_stream_deadline_releases_slot() -> bool:
+    stub = StubOpenAI(latency=0.01)
+    deadline, settings.LLM_DEADLINE_SECONDS = settings.LLM_DEADLINE_SECONDS, 0.3
+    try:
+        stream = create_chat_completion(stub, "check", model="stub", stream=True, messages=[])
+        next(stream)
+        holding = llm_limiter._in_flight == 1
+        time.sleep(0.5)  # the reader stalls past the deadline
+        released = llm_limiter._in_flight == 0
+        try:
+            next(stream)
+            ended = False
+        except TimeoutError:
+            ended = True
+    finally:
+        settings.LLM_DEADLINE_SECONDS = deadline
+    ok = holding and released and ended
+    print(f"{'✓' if ok else '✗'} A stalled stream gives its LLM slot back at the deadline and then ends")
+    return ok
+
+
+def check_planner_end_to_end() -> bool:
+    stub = StubOpenAI(latency=0.01, fail_first=1)
+    plan = plan_turn(stub, "", "look around", SNAPSHOT)
+    ok = plan.action == "look around" and stub.calls == 2
+    print(f"{'✓' if ok else '✗'} plan_turn() retries through the resilience layer ({stub.calls} calls)")
+    return ok
+
+
+def main() -> bool:
+    init_database()
+    print("LLM Resilience Checks\n" + "=" * 50)
+    results = [
+        check_retry_recovers(),
+        check_timeout_respects_deadline(),
+        check_breaker_fails_fast(),
+        check_local_errors_leave_breaker_open(),
+        check_hedging_cuts_tail(),
+        check_admission_waits_on_event_loop(),
+        check_admission_reserves_slot(),
+        check_stream_deadline_releases_slot(),
+        check_planner_end_to_end(),
+    ]
+    print("\n" + "=" * 50)
+    print(f"Metrics: {metrics.snapshot()['counters']}")
+    if all(results):
+        print("✅ All resilience checks passed")
+        return True
+    print(f"❌ {results.count(False)} check(s) failed")
+    return False
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
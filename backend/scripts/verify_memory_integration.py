@@ -6,10 +6,10 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ai.memory import search, retrieve_context, load_mapping, INDEX_PATH
+from ai.memory import search, retrieve_context, get_doc_id_table, INDEX_PATH
 from db.engine import SessionLocal
 from db.models import MemoryDoc
-from ai.prompts import SYSTEM_PROMPT
+from ai.prompts import RELEVANT_FACTS_TEMPLATE
 
 
 def verify_memory_integration():
@@ -27,9 +27,9 @@ def verify_memory_integration():
     
     print("\n✓ FAISS index exists")
     
-    # Load mapping
-    mapping = load_mapping()
-    print(f"✓ Loaded mapping with {len(mapping)} entries")
+    # Load doc id table
+    table = get_doc_id_table()
+    print(f"✓ Loaded doc id table with {len(table)} entries")
     
     # Test search for 'Holmes'
     print("\n" + "-"*70)
@@ -53,8 +53,8 @@ def verify_memory_integration():
         
         results_detail = []
         for i, (score, idx) in enumerate(matches[:3], 1):
-            doc_id = mapping.get(idx)
-            if doc_id:
+            doc_id = int(table.doc_ids_at([idx])[0])
+            if doc_id >= 0:
                 doc = db.query(MemoryDoc).filter(MemoryDoc.id == doc_id).first()
                 if doc:
                     print(f"\n{i}. Score: {score:.4f}")
@@ -95,16 +95,16 @@ def verify_memory_integration():
     print("3. Verifying Context Engine Integration")
     print("-"*70)
     
-    # Check if SYSTEM_PROMPT includes [RELEVANT FACTS]
-    if "[RELEVANT FACTS]" in SYSTEM_PROMPT:
-        print("✓ SYSTEM_PROMPT includes [RELEVANT FACTS] placeholder")
+    # Check the per-turn facts section has its [RELEVANT FACTS] header
+    if "[RELEVANT FACTS]" in RELEVANT_FACTS_TEMPLATE:
+        print("✓ RELEVANT_FACTS_TEMPLATE includes [RELEVANT FACTS] placeholder")
     else:
-        print("❌ SYSTEM_PROMPT missing [RELEVANT FACTS] placeholder")
+        print("❌ RELEVANT_FACTS_TEMPLATE missing [RELEVANT FACTS] placeholder")
         return False
     
     # Test prompt formatting
     sample_facts = "\n".join([r["text"] for r in results_detail])
-    formatted_prompt = SYSTEM_PROMPT.format(relevant_facts=sample_facts)
+    formatted_prompt = RELEVANT_FACTS_TEMPLATE.format(relevant_facts=sample_facts)
     
     if sample_facts in formatted_prompt:
         print("✓ System prompt correctly formats relevant facts")
@@ -125,7 +125,7 @@ def verify_memory_integration():
     print("="*70)
     print("\nSummary:")
     print(f"  • FAISS index: ✓")
-    print(f"  • Memory docs: {len(mapping)} indexed")
+    print(f"  • Memory docs: {len(table)} indexed")
     print(f"  • Search functionality: ✓")
     print(f"  • Retrieval functionality: ✓")
     print(f"  • Context Engine integration: ✓")